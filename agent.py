@@ -1,4 +1,3 @@
-import os
 import discord
 from datetime import datetime
 import asyncio
@@ -7,8 +6,19 @@ import aiohttp
 import traceback
 import pytz
 import urllib.parse
-import logging
-from dotenv import load_dotenv
+import re
+import time
+from config import get_env_variable
+from http_pool import HttpPool
+from token_refresher import TokenRefresher
+from event_cache import EventCache
+from events import parse_events, parse_free_busy, loads
+from metrics import REGISTRY, Gauge, cache_metrics, MISTRAL_SECONDS, MISTRAL_TOKENS, MISTRAL_RESULTS
+from intent_classifier import get_classifier
+from nlp_cache import NLPCache
+from mistral_client import MistralClient
+from mention_router import match_mention
+import tracing
 
 # For URL shortening if available
 try:
@@ -18,24 +28,70 @@ except ImportError:
     HAS_SHORTENER = False
     print("Warning: pyshorteners not found - using full URLs instead")
 
-# Add the AWS Parameter Store function
-def get_env_variable(var_name):
-    # First try AWS Parameter Store if boto3 is available
+# Upstream API base URLs (override to point at standin_server.py or another mock)
+CRONOFY_API_URL = get_env_variable('CRONOFY_API_URL', "https://api.cronofy.com").rstrip("/")
+CRONOFY_APP_URL = get_env_variable('CRONOFY_APP_URL', "https://app.cronofy.com").rstrip("/")
+MISTRAL_API_URL = get_env_variable('MISTRAL_API_URL', "https://api.mistral.ai").rstrip("/")
+
+# Models tried in order for intent parsing; the next one is only used if a reply doesn't fit the schema
+MISTRAL_MODELS = [
+    model.strip()
+    for model in get_env_variable('MISTRAL_MODELS', "mistral-small-latest,mistral-medium-latest").split(",")
+    if model.strip()
+]
+
+INTENTS = ("schedule_meeting", "view_calendar", "check_free_time", "get_help", "register", "unknown")
+
+# Intents that change state; never run on a low-confidence guess while Mistral is unavailable
+NO_FALLBACK_INTENTS = ("register",)
+
+# Compact system prompt; the user's message is sent on its own as the user turn
+INTENT_PROMPT = """You route messages for Skedge, a Discord scheduling bot. Reply with only a JSON object:
+{{"intent": one of {intents},
+"target_users": "author" or a list of the <@id> mentions the request is about,
+"duration_minutes": number or null,
+"days_ahead": number or null,
+"date_reference": day words as written, e.g. "tomorrow", "friday", "next monday", "weekend", or null,
+"time_of_day": "morning", "afternoon", "evening" or null,
+"specific_date": "YYYY-MM-DD" for an explicit date like "May 15th", else null}}
+Today is {today}."""
+
+_CODE_FENCE = re.compile(r"```(?:json)?\s*(.*?)```", re.DOTALL)
+
+
+def parse_intent_json(text):
+    """Intent JSON from a model reply (code fences and chatter tolerated), or None if it doesn't fit"""
+    if not text:
+        return None
+    fenced = _CODE_FENCE.search(text)
+    if fenced:
+        text = fenced.group(1)
+    start, end = text.find("{"), text.rfind("}")
+    if start < 0 or end < start:
+        return None
     try:
-        import boto3
-        ssm = boto3.client('ssm', region_name='us-east-1')  # Change region as needed
-        try:
-            response = ssm.get_parameter(Name=f'/schedge/{var_name}', WithDecryption=True)
-            return response['Parameter']['Value']
-        except Exception as e:
-            logging.warning(f"Could not get parameter from AWS: {e}")
-    except ImportError:
-        logging.info("boto3 not available, using local environment")
+        parsed = json.loads(text[start:end + 1])
+    except ValueError:
+        return None
+    if not isinstance(parsed, dict) or parsed.get("intent") not in INTENTS:
+        return None
     
-    # Fall back to local .env file
-    if os.path.exists('.env'):
-        load_dotenv()
-    return os.environ.get(var_name)
+    # Wrongly typed optional fields are dropped rather than failing the whole reply
+    for field in ("duration_minutes", "days_ahead"):
+        if not isinstance(parsed.get(field), (int, float)) or isinstance(parsed.get(field), bool):
+            parsed.pop(field, None)
+    for field in ("date_reference", "time_of_day", "specific_date"):
+        if not isinstance(parsed.get(field), str) or not parsed.get(field):
+            parsed.pop(field, None)
+    if not isinstance(parsed.get("target_users"), (str, list)):
+        parsed["target_users"] = "author"
+    return parsed
+
+class CronofyError(Exception):
+    """A Cronofy request failed with a non-200 status"""
+    def __init__(self, status, message=""):
+        super().__init__(f"Cronofy error {status}: {message[:100]}")
+        self.status = status
 
 class MistralAgent:
     def __init__(self, bot=None):
@@ -46,35 +102,97 @@ class MistralAgent:
         from database import Database
         self.db = Database()
         
-        # Create session using bot's loop if available
-        self.session = None
+        # Pooled keep-alive HTTP sessions for all upstream calls
+        self.http = HttpPool()
         
         # Registration state tracking
         self.registration_states = {}
         
-        # Get credentials from AWS or .env
+        # Get credentials from AWS or .env (cached by config)
         self.mistral_api_key = get_env_variable('MISTRAL_API_KEY')
         self.cronofy_client_id = get_env_variable('CRONOFY_CLIENT_ID')
         self.cronofy_client_secret = get_env_variable('CRONOFY_CLIENT_SECRET')
         self.cronofy_redirect_uri = get_env_variable('CRONOFY_REDIRECT_URI')
         
-        # User database cache
-        self.user_database = {}
+        # Rate limited, concurrency capped Mistral calls with retries
+        self.mistral = MistralClient(
+            self.http, self.mistral_api_key, MISTRAL_API_URL,
+            rate=float(get_env_variable('MISTRAL_RPS', 5)),
+            max_concurrency=int(get_env_variable('MISTRAL_MAX_CONCURRENCY', 4)),
+            max_queue=int(get_env_variable('MISTRAL_MAX_QUEUE', 50)),
+            queue_timeout=float(get_env_variable('MISTRAL_DEADLINE', 10)),
+            max_retries=int(get_env_variable('MISTRAL_MAX_RETRIES', 3))
+        )
+        
+        # Public URL of oauth_server.py's /notifications route (push notifications are off if unset)
+        self.notifications_callback_url = get_env_variable('NOTIFICATIONS_CALLBACK_URL')
         
         # OAuth polling - will be initialized later
         self.oauth_polling = {}
+        
+        # Background renewal of Cronofy access tokens
+        self.token_refresher = TokenRefresher(self)
+        
+        # Per-user full calendar events for !viewcal
+        event_cache_ttl = int(get_env_variable('EVENT_CACHE_TTL', 120))
+        event_cache_stale_ttl = int(get_env_variable('EVENT_CACHE_STALE_TTL', 900))
+        self.event_cache = EventCache(self.fetch_events, ttl=event_cache_ttl, stale_ttl=event_cache_stale_ttl)
+        
+        # Per-user busy blocks shared by !freetime and !findtime
+        self.free_busy_cache = EventCache(self.fetch_free_busy, ttl=event_cache_ttl, stale_ttl=event_cache_stale_ttl)
+        
+        # Offline intent classifier tried before Mistral
+        self.intent_classifier = get_classifier()
+        self.fallback_confidence = float(get_env_variable('MISTRAL_FALLBACK_CONFIDENCE', 0.15))
+        
+        # Mistral's parses of earlier messages, kept across restarts (off if NLP_CACHE_PATH is empty)
+        nlp_cache_path = get_env_variable('NLP_CACHE_PATH', 'nlp_cache.db')
+        self.nlp_cache = None
+        if nlp_cache_path:
+            self.nlp_cache = NLPCache(
+                nlp_cache_path,
+                maxsize=int(get_env_variable('NLP_CACHE_SIZE', 5000)),
+                ttl=int(get_env_variable('NLP_CACHE_TTL', 7 * 24 * 3600))
+            )
+        
+        # Report cache hit ratios and connection reuse on the metrics endpoint
+        REGISTRY.add_collector(self.collect_metrics)
+
+    def collect_metrics(self):
+        """Cache and connection pool gauges, read at scrape time"""
+        caches = {
+            "events": self.event_cache.stats(),
+            "free_busy": self.free_busy_cache.stats()
+        }
+        for name, stats in self.db.cache_stats().items():
+            caches[f"db_{name}"] = stats
+        if self.nlp_cache:
+            caches["nlp"] = self.nlp_cache.stats()
+        
+        reuse = Gauge("skedge_http_connection_reuse_ratio", "Share of upstream requests on a reused connection", ["host"])
+        for host, stats in self.http.get_stats().items():
+            reuse.set(stats["reuse_rate"], host=host)
+        
+        # "local" mentions are Mistral calls avoided by the offline classifier
+        nlp = Gauge("skedge_nlp_requests", "Mentions classified offline (local) or sent to Mistral", ["source"])
+        nlp.set(self.intent_classifier.stats["local"], source="local")
+        nlp.set(self.intent_classifier.stats["fallback"], source="mistral")
+        
+        client = Gauge("skedge_mistral_client", "Mistral calls queued and in flight, retries and calls turned away", ["stat"])
+        for stat, value in self.mistral.stats().items():
+            client.set(value, stat=stat)
+        
+        return cache_metrics(caches) + [reuse, nlp, client]
 
     async def setup_session(self):
-        """Create the aiohttp session in an async context"""
-        if self.session is None:
-            self.session = aiohttp.ClientSession()
-            print("Created aiohttp session")
+        """Warm up the pooled HTTP connections in an async context"""
+        await self.http.warm_up([CRONOFY_API_URL, MISTRAL_API_URL])
 
     async def get_auth_url(self, discord_id):
         """Get the Cronofy authorization URL for a user"""
-        client_id = os.getenv("CRONOFY_CLIENT_ID")
-        client_secret = os.getenv("CRONOFY_CLIENT_SECRET")
-        redirect_uri = os.getenv("REDIRECT_URI")
+        client_id = get_env_variable("CRONOFY_CLIENT_ID")
+        client_secret = get_env_variable("CRONOFY_CLIENT_SECRET")
+        redirect_uri = get_env_variable("REDIRECT_URI")
         
         if not client_id or not client_secret or not redirect_uri:
             print("ERROR: Missing Cronofy environment variables")
@@ -96,7 +214,7 @@ class MistralAgent:
         query_string = urllib.parse.urlencode(params)
         
         # Use the proper authorization endpoint
-        auth_url = f"https://app.cronofy.com/oauth/authorize?{query_string}"
+        auth_url = f"{CRONOFY_APP_URL}/oauth/authorize?{query_string}"
         
         print(f"Generated auth URL: {auth_url}")
         
@@ -197,22 +315,22 @@ class MistralAgent:
         """Exchange authorization code for access token"""
         try:
             # Make the token exchange request
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    "https://api.cronofy.com/oauth/token",
-                    data={
-                        "client_id": self.cronofy_client_id,
-                        "client_secret": self.cronofy_client_secret,
-                        "grant_type": "authorization_code",
-                        "code": code,
-                        "redirect_uri": self.cronofy_redirect_uri
-                    }
-                ) as response:
-                    if response.status == 200:
-                        return await response.json()
-                    else:
-                        print(f"Error exchanging code: {response.status} - {await response.text()}")
-                        return None
+            async with self.http.request(
+                "POST",
+                f"{CRONOFY_API_URL}/oauth/token",
+                data={
+                    "client_id": self.cronofy_client_id,
+                    "client_secret": self.cronofy_client_secret,
+                    "grant_type": "authorization_code",
+                    "code": code,
+                    "redirect_uri": self.cronofy_redirect_uri
+                }
+            ) as response:
+                if response.status == 200:
+                    return await response.json()
+                else:
+                    print(f"Error exchanging code: {response.status} - {await response.text()}")
+                    return None
         except Exception as e:
             print(f"Exception during token exchange: {e}")
             return None
@@ -244,6 +362,8 @@ class MistralAgent:
             success = await self.db.save_user(user_data)
             
             if success:
+                self.token_refresher.track(user.id, user_data["token_expiry"])
+                await self.create_notification_channel(user.id, user_data["access_token"])
                 print(f"Successfully registered user {user.name} (ID: {user.id})")
                 return True
             else:
@@ -256,11 +376,55 @@ class MistralAgent:
             traceback.print_exc()
             return False
 
+    async def refresh_access_token(self, discord_id, refresh_token):
+        """Exchange a refresh token for a new access token and save it
+        
+        Returns the new expiry timestamp, or None if the refresh failed.
+        """
+        try:
+            payload = {
+                "client_id": self.cronofy_client_id,
+                "client_secret": self.cronofy_client_secret,
+                "grant_type": "refresh_token",
+                "refresh_token": refresh_token
+            }
+            
+            headers = {"Content-Type": "application/json"}
+            
+            async with self.http.request("POST", f"{CRONOFY_API_URL}/oauth/token", headers=headers, json=payload) as response:
+                if response.status != 200:
+                    error_data = await response.text()
+                    print(f"Token refresh error: {error_data}")
+                    return None
+                
+                token_data = await response.json()
+            
+            # Get token expiry time (default to 1 hour if not specified)
+            expires_in = token_data.get("expires_in", 3600)
+            token_expiry = datetime.now(pytz.UTC).timestamp() + expires_in
+            
+            # Update only the token fields; save_user upserts the whole row, so
+            # everything else (name, email, calendar_ids, ...) must be carried over
+            user_data = await self.db.get_user(str(discord_id)) or {"discord_id": str(discord_id)}
+            user_data.update({
+                "access_token": token_data.get("access_token"),
+                # Cronofy may not rotate the refresh token
+                "refresh_token": token_data.get("refresh_token") or refresh_token,
+                "token_expiry": token_expiry  # Using UTC-based timestamp
+            })
+            
+            # Save updated tokens
+            if not await self.db.save_user(user_data):
+                return None
+            return token_expiry
+        except Exception as e:
+            print(f"Exception refreshing token: {e}")
+            return None
+
     async def cronofy_api_call(self, endpoint, method="GET", auth_token=None, params=None, json_data=None):
         """Make an API call to Cronofy with automatic token refresh"""
         try:
-            base_url = "https://api.cronofy.com"
-            url = f"{base_url}/{endpoint}"
+            url = f"{CRONOFY_API_URL}/{endpoint}"
             
             headers = {
                 "Content-Type": "application/json"
@@ -269,34 +433,171 @@ class MistralAgent:
             if auth_token:
                 headers["Authorization"] = f"Bearer {auth_token}"
             
-            async with aiohttp.ClientSession() as session:
-                try:
-                    if method == "GET":
-                        async with session.get(url, headers=headers, params=params) as response:
-                            if response.status == 401:
-                                # Token might be expired - attempt refresh and retry
-                                print(f"Token expired for API call to {endpoint}, attempting refresh")
-                                # You would need to implement a token refresh mechanism here
-                                # For now, we'll just inform the user
-                                return 401, "Authentication expired. Please re-register using !unregister then !register"
-                            return response.status, await response.text()
-                    elif method == "POST":
-                        async with session.post(url, headers=headers, json=json_data) as response:
-                            if response.status == 401:
-                                # Token might be expired - attempt refresh and retry
-                                print(f"Token expired for API call to {endpoint}, attempting refresh")
-                                return 401, "Authentication expired. Please re-register using !unregister then !register"
-                            return response.status, await response.text()
-                    else:
-                        return 400, "Unsupported method"
-                except aiohttp.ClientError as e:
-                    print(f"HTTP error in API call: {e}")
-                    return 500, f"Connection error: {str(e)}"
+            try:
+                if method == "GET":
+                    async with self.http.request("GET", url, headers=headers, params=params) as response:
+                        if response.status == 401:
+                            # Token might be expired - attempt refresh and retry
+                            print(f"Token expired for API call to {endpoint}, attempting refresh")
+                            # You would need to implement a token refresh mechanism here
+                            # For now, we'll just inform the user
+                            return 401, "Authentication expired. Please re-register using !unregister then !register"
+                        return response.status, await response.text()
+                elif method == "POST":
+                    async with self.http.request("POST", url, headers=headers, json=json_data) as response:
+                        if response.status == 401:
+                            # Token might be expired - attempt refresh and retry
+                            print(f"Token expired for API call to {endpoint}, attempting refresh")
+                            return 401, "Authentication expired. Please re-register using !unregister then !register"
+                        return response.status, await response.text()
+                else:
+                    return 400, "Unsupported method"
+            except aiohttp.ClientError as e:
+                print(f"HTTP error in API call: {e}")
+                return 500, f"Connection error: {str(e)}"
                     
         except Exception as e:
             print(f"API call error: {e}")
             return 500, str(e)
 
+    async def fetch_events(self, access_token, start, end):
+        """Fetch all Cronofy events between two datetimes (whole UTC days)
+        
+        Follows every page. Returns a (status, events) tuple of parsed Event
+        records; events is empty on error.
+        """
+        return await self._collect_pages(self.iter_event_pages(access_token, start, end))
+
+    async def fetch_free_busy(self, access_token, start, end, calendar_ids=None):
+        """Fetch busy blocks between two datetimes (whole UTC days)
+        
+        Uses v1/free_busy, which only returns start/end/status per block
+        instead of full event bodies. Returns (status, events) like fetch_events.
+        """
+        return await self._collect_pages(self.iter_free_busy_pages(access_token, start, end, calendar_ids))
+
+    async def _collect_pages(self, pages):
+        """Gather every page of a stream into one (status, events) tuple"""
+        events = []
+        with tracing.span("cronofy collect_pages") as span:
+            page_count = 0
+            try:
+                async for page in pages:
+                    events.extend(page)
+                    page_count += 1
+            except CronofyError as e:
+                print(f"Error fetching events: {e.status}")
+                span.fail(e.status)
+                return e.status, []
+            except Exception as e:
+                print(f"Error parsing events response: {e}")
+                span.fail(e)
+                return 500, []
+            finally:
+                span.set(pages=page_count, events=len(events))
+        
+        return 200, events
+
+    async def _fetch_event_page(self, url, access_token, params=None):
+        """Fetch one page of v1/events or v1/free_busy; returns (status, decoded body or error text)"""
+        headers = {"Authorization": f"Bearer {access_token}"}
+        try:
+            async with self.http.request("GET", url, headers=headers, params=params) as response:
+                body = await response.read()
+                if response.status != 200:
+                    return response.status, body.decode(errors="replace")
+                return 200, loads(body)
+        except aiohttp.ClientError as e:
+            print(f"HTTP error in API call: {e}")
+            return 500, f"Connection error: {str(e)}"
+
+    def _range_params(self, start, end):
+        """Query parameters shared by v1/events and v1/free_busy (always UTC)"""
+        return {
+            "tzid": "UTC",
+            "from": start.astimezone(pytz.UTC).strftime("%Y-%m-%d"),
+            "to": end.astimezone(pytz.UTC).strftime("%Y-%m-%d")
+        }
+
+    def iter_event_pages(self, access_token, start, end):
+        """Stream full Cronofy events page by page as lists of Event records"""
+        params = self._range_params(start, end)
+        params["include_managed"] = "true"
+        return self._iter_pages(f"{CRONOFY_API_URL}/v1/events", access_token, params, parse_events)
+
+    def iter_free_busy_pages(self, access_token, start, end, calendar_ids=None):
+        """Stream Cronofy busy blocks page by page, optionally for some calendars only"""
+        params = list(self._range_params(start, end).items())
+        for calendar_id in calendar_ids or []:
+            params.append(("calendar_ids[]", calendar_id))
+        return self._iter_pages(f"{CRONOFY_API_URL}/v1/free_busy", access_token, params, parse_free_busy)
+
+    async def _iter_pages(self, url, access_token, params, parse):
+        """Stream a paginated Cronofy endpoint as lists of Event records
+        
+        The next page is requested while the caller processes the current
+        one. Breaking out of the loop cancels any pending prefetch. Raises
+        CronofyError if a page can't be fetched.
+        """
+        status, data = await self._fetch_event_page(url, access_token, params=params)
+        prefetch = None
+        
+        try:
+            while True:
+                if status != 200:
+                    raise CronofyError(status, data)
+                
+                # Start downloading the next page before handing this one over
+                next_page = data.get("pages", {}).get("next_page")
+                prefetch = asyncio.ensure_future(self._fetch_event_page(next_page, access_token)) if next_page else None
+                
+                yield parse(data)
+                
+                if prefetch is None:
+                    return
+                status, data = await prefetch
+                prefetch = None
+        finally:
+            if prefetch is not None and not prefetch.done():
+                prefetch.cancel()
+
+    async def list_calendars(self, access_token):
+        """List the user's calendars as (status, [calendar dicts])"""
+        status, response_text = await self.cronofy_api_call(endpoint="v1/calendars", auth_token=access_token)
+        if status != 200:
+            return status, []
+        try:
+            return 200, loads(response_text).get("calendars", [])
+        except Exception as e:
+            print(f"Error parsing calendars response: {e}")
+            return 500, []
+
+    async def create_notification_channel(self, discord_id, access_token):
+        """Ask Cronofy to push change notifications for this user's calendars"""
+        if not self.notifications_callback_url:
+            return False
+        
+        callback_url = f"{self.notifications_callback_url}?{urllib.parse.urlencode({'discord_id': str(discord_id)})}"
+        status, response_text = await self.cronofy_api_call(
+            endpoint="v1/channels",
+            method="POST",
+            auth_token=access_token,
+            json_data={"callback_url": callback_url}
+        )
+        
+        if status != 200:
+            print(f"Could not create notification channel for user {discord_id}: {status} - {response_text[:100]}")
+            return False
+        
+        print(f"Created notification channel for user {discord_id}")
+        return True
+
+    def handle_calendar_change(self, discord_id, changes_since=None):
+        """Drop a user's cached events after Cronofy reports a change"""
+        print(f"Calendar changed for user {discord_id} (since {changes_since}), invalidating cached events")
+        self.event_cache.invalidate(discord_id)
+        self.free_busy_cache.invalidate(discord_id)
+
     def shorten_url(self, url):
         """Safely shorten a URL or return the original if shortening fails"""
         try:
@@ -316,60 +617,42 @@ class MistralAgent:
             return url
 
     async def close(self):
-        """Close the session properly when the bot shuts down"""
-        if self.session is not None:
-            await self.session.close()
-            self.session = None
-            print("Closed aiohttp session")
-
-    async def call_mistral_api(self, prompt, max_tokens=500, temperature=0.7, timeout=30):
-        """Call Mistral API with a prompt and return the generated text"""
-        if not self.mistral_api_key:
-            print("ERROR: Mistral API key not found in environment variables.")
-            return "Mistral API key not found in environment variables."
-        
-        try:
-            print(f"Calling Mistral API with prompt of {len(prompt)} characters")
-            url = "https://api.mistral.ai/v1/chat/completions"
-            headers = {
-                "Content-Type": "application/json",
-                "Authorization": f"Bearer {self.mistral_api_key}"
-            }
-            
-            payload = {
-                "model": "mistral-medium",  # Use the appropriate model
-                "messages": [
-                    {"role": "user", "content": prompt}
-                ],
-                "max_tokens": max_tokens,
-                "temperature": temperature
-            }
-            
-            print(f"Request payload: {json.dumps(payload)[:200]}...")
-            
-            async with aiohttp.ClientSession() as session:
-                # Add timeout to the request
-                async with session.post(url, headers=headers, json=payload, timeout=timeout) as response:
-                    status_code = response.status
-                    print(f"Mistral API response status: {status_code}")
-                    
-                    if status_code == 200:
-                        data = await response.json()
-                        content = data["choices"][0]["message"]["content"]
-                        print(f"Received content of length: {len(content)}")
-                        return content
-                    else:
-                        error_text = await response.text()
-                        print(f"Mistral API error: {status_code} - {error_text}")
-                        return f"API error: {status_code} - {error_text[:100]}"
-        except asyncio.TimeoutError:
-            print("Mistral API request timed out after 30 seconds")
-            return "ERROR: The AI service timed out. Please try again."
-        except Exception as e:
-            print(f"Exception calling Mistral API: {e}")
-            import traceback
-            traceback.print_exc()
-            return f"Error: {str(e)}"
+        """Close the pooled sessions properly when the bot shuts down"""
+        await self.token_refresher.stop()
+        await self.http.close()
+        print("Closed HTTP pool")
+        if self.nlp_cache:
+            self.nlp_cache.close()
+
+    async def call_mistral_api(self, prompt, model="mistral-medium", max_tokens=500, temperature=0.7, timeout=30,
+                               system=None, json_mode=False):
+        """Call Mistral API with a prompt; returns a MistralReply or a MistralError"""
+        print(f"Calling {model} with prompt of {len(prompt)} characters")
+        messages = [{"role": "user", "content": prompt}]
+        if system:
+            messages.insert(0, {"role": "system", "content": system})
+        payload = {
+            "model": model,
+            "messages": messages,
+            "max_tokens": max_tokens,
+            "temperature": temperature
+        }
+        if json_mode:
+            # Ask for a bare JSON object instead of prose or a fenced block
+            payload["response_format"] = {"type": "json_object"}
+        
+        began = time.perf_counter()
+        result = await self.mistral.chat(payload, timeout=timeout)
+        MISTRAL_SECONDS.observe(time.perf_counter() - began, model=model)
+        
+        if not result.ok:
+            print(f"Mistral API error: {result}")
+            return result
+        
+        MISTRAL_TOKENS.inc(result.usage.get("prompt_tokens", 0), model=model, kind="prompt")
+        MISTRAL_TOKENS.inc(result.usage.get("completion_tokens", 0), model=model, kind="completion")
+        print(f"Received content of length: {len(result.content)} ({result.usage.get('total_tokens', '?')} tokens)")
+        return result
 
     def get_cronofy_auth_url(self, discord_user_id):
         """Generate a Cronofy authorization URL for a user"""
@@ -378,7 +661,7 @@ class MistralAgent:
         state = str(discord_user_id)  # Use Discord user ID as state parameter
         
         auth_url = (
-            f"https://app.cronofy.com/oauth/authorize"
+            f"{CRONOFY_APP_URL}/oauth/authorize"
             f"?client_id={self.cronofy_client_id}"
             f"&response_type=code"
             f"&redirect_uri={self.cronofy_redirect_uri}"
@@ -389,74 +672,120 @@ class MistralAgent:
         return auth_url
 
     async def process_natural_language(self, message_content, author, mentioned_users):
-        """Process natural language using Mistral API to understand intent and extract entities"""
+        """Process natural language using Mistral API to understand intent and extract entities
+
+        Returns a bot command, None if the request wasn't understood, or a
+        MistralError if Mistral couldn't be reached in time.
+        """
         # Filter out the bot itself from mentioned_users before processing
         mentioned_users = [user for user in mentioned_users if user.id != self.bot.user.id]
         
-        # Prepare more comprehensive prompt for Mistral with stronger emphasis on date detection
-        prompt = f"""
-        You are a scheduling assistant for a Discord bot called Skedge. Analyze this message and determine:
-        1. What is the user's intent? (schedule_meeting, view_calendar, check_free_time, get_help, register)
-        2. Who is involved? (the message author or mentioned people)
-        3. IMPORTANT: Look for ANY time and date parameters mentioned:
-           - Duration (e.g., 30 minutes, 1 hour)
-           - Specific dates/day references (e.g., tomorrow, next Monday, this weekend, May 15th)
-           - Days ahead (e.g., next 3 days)
-           - Time of day references (morning, afternoon, evening)
-        
-        Message: {message_content}
-        
-        Respond in JSON format:
-        {{
-            "intent": "one of [schedule_meeting, view_calendar, check_free_time, get_help, register, unknown]",
-            "target_users": "list of user mentions or 'author' if about the message sender",
-            "duration_minutes": optional number,
-            "days_ahead": optional number,
-            "date_reference": optional string (e.g., "tomorrow", "next Monday", "weekend"),
-            "time_of_day": optional string (e.g., "morning", "afternoon", "evening"),
-            "specific_date": optional date in YYYY-MM-DD format if a specific date was mentioned
-        }}
-        
-        Be particularly thorough in identifying date references. For example, if the message mentions "Friday", that should be included in date_reference. If it mentions a specific date like "May 15th", convert it to YYYY-MM-DD format in specific_date.
-        """
+        # Same phrasing seen before (with any users mentioned): reuse Mistral's answer
+        if self.nlp_cache:
+            parsed_response = self.nlp_cache.get(message_content)
+            if parsed_response is not None:
+                print(f"Mistral parse from cache: {parsed_response}")
+                return self.command_for_intent(parsed_response, author, mentioned_users)
         
-        # Call Mistral API
-        response = await self.call_mistral_api(prompt)
+        system = INTENT_PROMPT.format(
+            intents=", ".join(INTENTS),
+            today=datetime.now(pytz.timezone(get_env_variable('TIMEZONE', 'America/Los_Angeles'))).strftime("%A %Y-%m-%d")
+        )
         
         try:
-            # Parse the JSON response
-            parsed_response = json.loads(response)
-            print(f"Mistral parsed: {parsed_response}")  # Add logging to see what Mistral detected
-            
-            # Route to appropriate command based on intent
-            if parsed_response["intent"] == "schedule_meeting":
-                # Create findtime command
-                return self.create_findtime_command(parsed_response, author, mentioned_users)
-                
-            elif parsed_response["intent"] == "view_calendar":
-                # Create viewcal command
-                return self.create_viewcal_command(parsed_response, author, mentioned_users)
-                
-            elif parsed_response["intent"] == "check_free_time":
-                # Create freetime command
-                return self.create_freetime_command(parsed_response, author, mentioned_users)
-                
-            elif parsed_response["intent"] == "get_help":
-                # Create help command
-                return "!help"
-                
-            elif parsed_response["intent"] == "register":
-                # Create register command
-                return "!register"
+            # Cheapest model first; escalate only when the reply doesn't fit the schema
+            parsed_response = None
+            for model in MISTRAL_MODELS:
+                result = await self.call_mistral_api(
+                    message_content, model=model, max_tokens=150, temperature=0, system=system, json_mode=True
+                )
+                if not result.ok:
+                    # The call itself failed; a bigger model won't fix that, so let the caller fall back
+                    MISTRAL_RESULTS.inc(model=model, outcome=result.kind)
+                    return result
                 
-            else:
-                # Unknown intent
+                parsed_response = parse_intent_json(result.content)
+                if parsed_response is not None:
+                    MISTRAL_RESULTS.inc(model=model, outcome="ok")
+                    break
+                MISTRAL_RESULTS.inc(model=model, outcome="parse_failure")
+                print(f"{model} reply didn't fit the intent schema: {result.content[:200]!r}")
+            
+            if parsed_response is None:
                 return None
+            print(f"Mistral parsed: {parsed_response}")  # Add logging to see what Mistral detected
+            
+            if self.nlp_cache:
+                self.nlp_cache.set(message_content, parsed_response)
+            
+            return self.command_for_intent(parsed_response, author, mentioned_users)
                 
         except Exception as e:
             print(f"Error processing Mistral response: {e}")
             return None
 
+    def command_for_intent(self, parsed_response, author, mentioned_users):
+        """Bot command for a parsed request (from Mistral or the local classifier), or None"""
+        # Route to appropriate command based on intent
+        if parsed_response["intent"] == "schedule_meeting":
+            # Create findtime command
+            return self.create_findtime_command(parsed_response, author, mentioned_users)
+            
+        elif parsed_response["intent"] == "view_calendar":
+            # Create viewcal command
+            return self.create_viewcal_command(parsed_response, author, mentioned_users)
+            
+        elif parsed_response["intent"] == "check_free_time":
+            # Create freetime command
+            return self.create_freetime_command(parsed_response, author, mentioned_users)
+            
+        elif parsed_response["intent"] == "get_help":
+            # Create help command
+            return "!help"
+            
+        elif parsed_response["intent"] == "register":
+            # Create register command
+            return "!register"
+            
+        else:
+            # Unknown intent
+            return None
+
+    def classify_locally(self, message_content, author, mentioned_users):
+        """Mistral-style parse from the offline classifier, or None if it isn't confident enough"""
+        intent, confidence = self.intent_classifier.predict(message_content)
+        if intent is None:
+            print(f"Local classifier unsure ({confidence:.2f}), asking Mistral")
+            return None
+        return self._local_parse(intent, confidence, message_content, mentioned_users)
+
+    def best_local_guess(self, message_content, author, mentioned_users):
+        """Local classifier's parse at the lower MISTRAL_FALLBACK_CONFIDENCE, for when Mistral is unavailable
+
+        The guess still has to beat the runner-up by the classifier's margin,
+        and is never used for NO_FALLBACK_INTENTS.
+        """
+        intent, confidence, margin = self.intent_classifier.classify(message_content)
+        if intent is None or intent in NO_FALLBACK_INTENTS:
+            return None
+        if confidence < self.fallback_confidence or margin < self.intent_classifier.margin:
+            return None
+        return self._local_parse(intent, confidence, message_content, mentioned_users)
+
+    def _local_parse(self, intent, confidence, message_content, mentioned_users):
+        # Parameters come from the same matcher as keyword routing
+        matched = match_mention(message_content)
+        parsed_response = {
+            "intent": intent,
+            "confidence": round(confidence, 3),
+            "target_users": [user.mention for user in mentioned_users] if mentioned_users else "author",
+            "duration_minutes": matched.duration,
+            "days_ahead": matched.days_ahead,
+            "date_reference": matched.date
+        }
+        print(f"Local classifier parsed: {parsed_response} ({self.intent_classifier.llm_calls_avoided} Mistral calls avoided)")
+        return parsed_response
+
     def create_findtime_command(self, parsed_response, author, mentioned_users):
         """Create a !findtime command from parsed Mistral response with time references"""
         # Make sure we don't include the bot itself
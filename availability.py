@@ -0,0 +1,102 @@
+from bisect import bisect_left, bisect_right
+from datetime import datetime, time, timedelta
+
+from events import EventColumns
+
+# Default daily window used by !freetime and !findtime (6AM-9PM)
+DEFAULT_WINDOW_START_HOUR = 6
+DEFAULT_WINDOW_END_HOUR = 21
+
+
+def localize(tz, naive):
+    """Attach tz to a naive datetime (works for pytz and zoneinfo timezones)"""
+    if hasattr(tz, "localize"):
+        return tz.localize(naive)
+    return naive.replace(tzinfo=tz)
+
+
+def format_hour(hour):
+    """Format an hour of the day like 6AM or 9PM"""
+    return datetime.combine(datetime.min.date(), time(hour % 24)).strftime("%-I%p")
+
+
+def window_label(window_start_hour=DEFAULT_WINDOW_START_HOUR, window_end_hour=DEFAULT_WINDOW_END_HOUR):
+    """Human readable window, e.g. "6AM-9PM" """
+    return f"{format_hour(window_start_hour)}-{format_hour(window_end_hour)}"
+
+
+def busy_periods_from_events(events, tz):
+    """Turn parsed Events into busy periods as columnar epoch arrays
+
+    All-day events block their whole day(s) in tz. Events marked as
+    transparent (e.g. "show as free") don't block anything.
+    """
+    return EventColumns.from_events(events, tz)
+
+
+def _at_hour(tz, day, hour):
+    """Local time `hour` hours after midnight on day (hour may be 24)"""
+    return localize(tz, datetime.combine(day, time()) + timedelta(hours=hour))
+
+
+def _merge_busy(busy_periods):
+    """Sort busy periods and merge overlaps into disjoint epoch-second intervals
+
+    Accepts (start, end) pairs as epoch seconds or datetimes.
+    """
+    starts = []
+    ends = []
+    pairs = (
+        (s.timestamp(), e.timestamp()) if isinstance(s, datetime) else (s, e)
+        for s, e in busy_periods
+    )
+    for start, end in sorted(pairs):
+        if end <= start:
+            continue
+        if ends and start <= ends[-1]:
+            ends[-1] = max(ends[-1], end)
+        else:
+            starts.append(start)
+            ends.append(end)
+    return starts, ends
+
+
+def compute_free_periods(busy_periods, start, days, tz,
+                         window_start_hour=DEFAULT_WINDOW_START_HOUR,
+                         window_end_hour=DEFAULT_WINDOW_END_HOUR):
+    """Free periods inside the daily window for `days` days starting at `start`
+
+    Busy periods are sorted and merged once; each day's window then finds the
+    busy intervals it overlaps with two bisects, so the cost is
+    O(events log events + days log events). Events spanning several days are
+    handled like any other interval. Returned periods are in tz.
+    """
+    starts, ends = _merge_busy(busy_periods)
+    local_start = start.astimezone(tz)
+    start_ts = start.timestamp()
+    free_periods = []
+
+    for day_offset in range(days):
+        day = local_start.date() + timedelta(days=day_offset)
+        window_start_ts = max(_at_hour(tz, day, window_start_hour).timestamp(), start_ts)
+        window_end_ts = _at_hour(tz, day, window_end_hour).timestamp()
+
+        if window_start_ts >= window_end_ts:
+            continue
+
+        # Busy intervals overlapping the window: end after its start, start before its end
+        first = bisect_right(ends, window_start_ts)
+        last = bisect_left(starts, window_end_ts)
+
+        cursor = window_start_ts
+        for i in range(first, last):
+            if starts[i] > cursor:
+                free_periods.append((cursor, starts[i]))
+            cursor = max(cursor, ends[i])
+        if cursor < window_end_ts:
+            free_periods.append((cursor, window_end_ts))
+
+    return [
+        (datetime.fromtimestamp(s, tz), datetime.fromtimestamp(e, tz))
+        for s, e in free_periods
+    ]
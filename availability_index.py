@@ -0,0 +1,172 @@
+from datetime import timedelta
+
+from intersection import merge_periods, DEFAULT_MERGE_GAP
+
+# Default bitmap horizon: one week
+WEEK_MINUTES = 7 * 24 * 60
+
+
+def popcount(value):
+    """Number of set bits in a non-negative int"""
+    try:
+        return value.bit_count()
+    except AttributeError:
+        # Python < 3.10
+        return bin(value).count("1")
+
+
+class AvailabilityBitmap:
+    """Free/busy for one user as a bitmap of fixed-size time slots.
+
+    Bit i is set when the user is free for the whole slot starting at
+    start + i * slot_minutes. The bits live in a single Python int, so group
+    availability is a bitwise AND and counting free slots is a popcount.
+    """
+
+    __slots__ = ("start", "slot_minutes", "slots", "bits")
+
+    def __init__(self, start, slot_minutes=1, slots=None, bits=0):
+        self.start = start
+        self.slot_minutes = slot_minutes
+        self.slots = slots if slots is not None else WEEK_MINUTES // slot_minutes
+        self.bits = bits & self.mask
+
+    @property
+    def mask(self):
+        return (1 << self.slots) - 1
+
+    @classmethod
+    def from_periods(cls, periods, start, slot_minutes=1, slots=None):
+        """Build a bitmap from (start, end) free periods
+
+        Only slots fully inside a free period are marked free, so partial
+        slots at the edges are treated as busy.
+        """
+        bitmap = cls(start, slot_minutes, slots)
+        origin = start.timestamp()
+        slot_seconds = slot_minutes * 60
+        bits = 0
+
+        for period_start, period_end in periods:
+            first = max(0, -int((origin - period_start.timestamp()) // slot_seconds))
+            last = min(bitmap.slots, int((period_end.timestamp() - origin) // slot_seconds))
+            if last > first:
+                bits |= ((1 << (last - first)) - 1) << first
+
+        bitmap.bits = bits
+        return bitmap
+
+    def _like(self, bits):
+        return AvailabilityBitmap(self.start, self.slot_minutes, self.slots, bits)
+
+    def _check_compatible(self, other):
+        if (self.start, self.slot_minutes, self.slots) != (other.start, other.slot_minutes, other.slots):
+            raise ValueError("Bitmaps must share start, slot size and length")
+
+    def __and__(self, other):
+        self._check_compatible(other)
+        return self._like(self.bits & other.bits)
+
+    def __or__(self, other):
+        self._check_compatible(other)
+        return self._like(self.bits | other.bits)
+
+    def __invert__(self):
+        return self._like(~self.bits)
+
+    def free_minutes(self):
+        """Total free time in minutes"""
+        return popcount(self.bits) * self.slot_minutes
+
+    def runs(self):
+        """Yield (first_slot, length) for each run of consecutive free slots"""
+        bits = self.bits
+        while bits:
+            low = (bits & -bits).bit_length() - 1
+            shifted = bits >> low
+            # Length of the run of trailing ones
+            length = (shifted ^ (shifted + 1)).bit_length() - 1
+            yield low, length
+            bits &= ~(((1 << length) - 1) << low)
+
+    def to_periods(self, tz=None, min_duration=0):
+        """Convert back to a sorted list of (start, end) free periods"""
+        periods = []
+        slot = timedelta(minutes=self.slot_minutes)
+        min_slots = -(-min_duration // self.slot_minutes) if min_duration else 1
+
+        for first, length in self.runs():
+            if length < min_slots:
+                continue
+            period_start = self.start + first * slot
+            period_end = period_start + length * slot
+            if tz is not None:
+                period_start = period_start.astimezone(tz)
+                period_end = period_end.astimezone(tz)
+            periods.append((period_start, period_end))
+
+        return periods
+
+
+def intersect_all(bitmaps):
+    """Slots where every user is free"""
+    result = bitmaps[0]
+    for bitmap in bitmaps[1:]:
+        result = result & bitmap
+    return result
+
+
+def at_least(bitmaps, required):
+    """Slots where at least `required` users are free
+
+    Counts free users per slot with bit-sliced adders (one int per bit of the
+    count), then compares every slot's count with `required` at once.
+    """
+    if required <= 0:
+        return ~bitmaps[0] | bitmaps[0]
+    if required > len(bitmaps):
+        return bitmaps[0]._like(0)
+
+    # counters[i] holds bit i of each slot's free count
+    counters = []
+    for bitmap in bitmaps:
+        carry = bitmap.bits
+        for i in range(len(counters)):
+            if not carry:
+                break
+            counters[i], carry = counters[i] ^ carry, counters[i] & carry
+        if carry:
+            counters.append(carry)
+
+    # Bitwise "count >= required", from the most significant bit down
+    mask = bitmaps[0].mask
+    greater = 0
+    equal = mask
+    for i in reversed(range(max(len(counters), required.bit_length()))):
+        counter = counters[i] if i < len(counters) else 0
+        if (required >> i) & 1:
+            equal &= counter
+        else:
+            greater |= equal & counter
+            equal &= ~counter & mask
+
+    return bitmaps[0]._like(greater | equal)
+
+
+def find_common_free_periods_bitset(free_period_lists, min_duration, start, end,
+                                    slot_minutes=1, merge_gap=DEFAULT_MERGE_GAP):
+    """Bitmap counterpart of intersection.find_common_free_periods
+
+    Periods are snapped to the slot grid starting at `start`.
+    """
+    if not free_period_lists:
+        return []
+
+    slots = -(-int((end - start).total_seconds()) // (slot_minutes * 60))
+    bitmaps = [
+        AvailabilityBitmap.from_periods(periods, start, slot_minutes, slots)
+        for periods in free_period_lists
+    ]
+
+    common = intersect_all(bitmaps).to_periods(tz=start.tzinfo, min_duration=min_duration)
+    return merge_periods(common, merge_gap)
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Compare v1/events against v1/free_busy for availability lookups.
+
+Starts a local mock of the two Cronofy endpoints, serving the same synthetic
+calendar as full events (summaries, descriptions, attendees) and as bare
+busy blocks, then fetches both through MistralAgent and reports payload size
+and latency. The mock adds a fixed round trip plus transfer time at a given
+bandwidth so size differences show up in latency.
+
+Run from the repository root:
+    python benchmarks/bench_free_busy.py
+    python benchmarks/bench_free_busy.py --events 2000 --bandwidth 5
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+from aiohttp import web
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import agent as agent_module
+from agent import MistralAgent
+
+BASE = datetime(2025, 1, 6, tzinfo=timezone.utc)
+PAGE_SIZE = 100  # Cronofy's default page size
+
+
+def make_events(rng, count, days):
+    """Synthetic full Cronofy events spread over `days` days"""
+    events = []
+    for i in range(count):
+        start = BASE + timedelta(days=rng.randrange(days), hours=rng.randint(6, 19), minutes=rng.choice([0, 15, 30, 45]))
+        end = start + timedelta(minutes=rng.choice([15, 30, 45, 60, 90]))
+        attendees = [
+            {"email": f"person{rng.randrange(500)}@example.com", "display_name": f"Person {j}", "status": "accepted"}
+            for j in range(rng.randint(1, 8))
+        ]
+        events.append({
+            "calendar_id": f"cal_{i % 3}",
+            "event_uid": f"evt_external_{i:06d}",
+            "summary": f"Meeting {i} about project {rng.randrange(50)}",
+            "description": "Agenda:\n" + "\n".join(f"- item {k}" for k in range(rng.randint(2, 10))),
+            "start": start.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "end": end.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "deleted": False,
+            "created": "2024-12-01T10:00:00Z",
+            "updated": "2024-12-02T10:00:00Z",
+            "location": {"description": f"Room {rng.randrange(40)}"},
+            "participation_status": "accepted",
+            "attendees": attendees,
+            "organizer": {"email": "organizer@example.com", "display_name": "Organizer"},
+            "transparency": "opaque",
+            "status": "confirmed",
+            "categories": [],
+            "recurring": False,
+            "event_private": False,
+            "options": {"delete": True, "update": True, "change_participation_status": True}
+        })
+    events.sort(key=lambda event: event["start"])
+    return events
+
+
+def to_free_busy(events):
+    """The same calendar as v1/free_busy blocks"""
+    return [
+        {
+            "calendar_id": event["calendar_id"],
+            "start": event["start"],
+            "end": event["end"],
+            "free_busy_status": "busy"
+        }
+        for event in events
+    ]
+
+
+def make_app(events, rtt, bandwidth):
+    """Mock Cronofy with paginated v1/events and v1/free_busy"""
+    bytes_per_second = bandwidth * 1_000_000 / 8
+    bodies = {"events": events, "free_busy": to_free_busy(events)}
+    served = {"events": 0, "free_busy": 0}
+
+    def handler(key, path):
+        async def handle(request):
+            items = bodies[key]
+            calendar_ids = request.query.getall("calendar_ids[]", [])
+            if calendar_ids:
+                items = [item for item in items if item["calendar_id"] in calendar_ids]
+
+            page = int(request.query.get("page", 1))
+            total_pages = max(1, -(-len(items) // PAGE_SIZE))
+            pages = {"current": page, "total": total_pages}
+            if page < total_pages:
+                pages["next_page"] = f"{request.url.origin()}{path}?page={page + 1}" + "".join(
+                    f"&calendar_ids[]={calendar_id}" for calendar_id in calendar_ids
+                )
+
+            body = json.dumps({"pages": pages, key: items[(page - 1) * PAGE_SIZE:page * PAGE_SIZE]}).encode()
+            served[key] += len(body)
+            await asyncio.sleep(rtt + len(body) / bytes_per_second)
+            return web.Response(body=body, content_type="application/json")
+        return handle
+
+    app = web.Application()
+    app.router.add_get("/v1/events", handler("events", "/v1/events"))
+    app.router.add_get("/v1/free_busy", handler("free_busy", "/v1/free_busy"))
+    return app, served
+
+
+async def measure(fetch, repeat):
+    """Median latency in ms and the number of records returned"""
+    timings = []
+    count = 0
+    for _ in range(repeat):
+        began = time.perf_counter()
+        status, records = await fetch()
+        timings.append((time.perf_counter() - began) * 1000)
+        assert status == 200, status
+        count = len(records)
+    return statistics.median(timings), count
+
+
+async def run(args):
+    rng = random.Random(42)
+    events = make_events(rng, args.events, args.days)
+    app, served = make_app(events, args.rtt / 1000, args.bandwidth)
+
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    agent_module.CRONOFY_API_URL = f"http://127.0.0.1:{port}"
+
+    agent = MistralAgent()
+    end = BASE + timedelta(days=args.days)
+    cases = [
+        ("v1/events", lambda: agent.fetch_events("token", BASE, end), "events"),
+        ("v1/free_busy", lambda: agent.fetch_free_busy("token", BASE, end), "free_busy"),
+        ("v1/free_busy (1 calendar)", lambda: agent.fetch_free_busy("token", BASE, end, ["cal_0"]), "free_busy"),
+    ]
+
+    try:
+        print(f"{args.events} events over {args.days} days, {args.rtt}ms round trip, {args.bandwidth} Mbit/s\n")
+        print(f"{'endpoint':<26} {'records':>8} {'KB/lookup':>10} {'median (ms)':>12}")
+        for name, fetch, key in cases:
+            served[key] = 0
+            latency, count = await measure(fetch, args.repeat)
+            print(f"{name:<26} {count:>8} {served[key] / args.repeat / 1024:>10.1f} {latency:>12.1f}")
+    finally:
+        await agent.close()
+        await runner.cleanup()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare v1/events and v1/free_busy payloads")
+    parser.add_argument("--events", type=int, default=500, help="Events in the synthetic calendar")
+    parser.add_argument("--days", type=int, default=14, help="Days the calendar spans")
+    parser.add_argument("--rtt", type=float, default=30, help="Simulated round trip per page in ms")
+    parser.add_argument("--bandwidth", type=float, default=20, help="Simulated bandwidth in Mbit/s")
+    parser.add_argument("--repeat", type=int, default=5, help="Lookups per endpoint")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
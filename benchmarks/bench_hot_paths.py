@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+Microbenchmarks for the scheduling hot paths:
+
+    free_periods   get_user_free_periods with a warm free/busy cache
+    intersection   !findtime intersection + merge (sweep and bitset engines)
+    format_events  !viewcal formatting
+    route_mention  keyword routing of bot mentions
+
+Calendars come from synthetic_calendar.py and vary by number of users,
+meetings per day, horizon and how many timezones the users are spread over.
+
+Run from the repository root:
+    python benchmarks/bench_hot_paths.py
+    python benchmarks/bench_hot_paths.py --quick --json results.json
+    python benchmarks/bench_hot_paths.py --baseline results.json --threshold 1.25
+
+With --baseline, each case's median is compared with the saved run and the
+script exits with status 1 if any case got slower than the threshold ratio.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+import pytz
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import synthetic_calendar
+from events import parse_events
+from event_cache import EventCache
+from intersection import find_common_free_periods
+from availability_index import find_common_free_periods_bitset
+from mention_router import route_mention
+
+# Importing bot builds the Discord client and agent, but nothing connects
+import bot
+
+BASE = datetime(2025, 1, 6)
+TIMEZONES = [
+    "America/Los_Angeles", "America/New_York", "Europe/London",
+    "Europe/Berlin", "Asia/Kolkata", "Asia/Tokyo"
+]
+MENTIONS = [
+    "when can we meet <@2> for 30 minutes in the next 5 days",
+    "show calendar",
+    "what's on my calendar this week",
+    "when am i free",
+    "check their availability <@2>",
+    "help",
+    "how do i connect my calendar",
+    "register",
+    "can you move my dentist appointment to friday",
+    "what do i have tomorrow",
+    "is <@2> around later",
+    "find time with <@2> <@3> for 1 hour",
+]
+
+
+class FakeUser:
+    """Just enough of discord.User for routing"""
+
+    def __init__(self, user_id):
+        self.id = user_id
+        self.mention = f"<@{user_id}>"
+
+
+def make_user_events(user_index, days, meetings_per_day, tz_spread):
+    """Parsed Events for one user whose working day is in one of tz_spread timezones"""
+    tz = pytz.timezone(TIMEZONES[user_index % tz_spread])
+    raw = synthetic_calendar.make_events(
+        f"bench{user_index}", BASE.date(), (BASE + timedelta(days=days + 1)).date(),
+        tz, meetings_per_day
+    )
+    return parse_events({"events": raw})
+
+
+def measure(func, min_runs, min_time):
+    """Run func until both min_runs and min_time are reached; timings in ms"""
+    timings = []
+    began = time.perf_counter()
+    while len(timings) < min_runs or time.perf_counter() - began < min_time:
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return {
+        "runs": len(timings),
+        "median_ms": statistics.median(timings),
+        "min_ms": timings[0],
+        "p95_ms": timings[min(len(timings) - 1, int(len(timings) * 0.95))],
+    }
+
+
+def free_period_cases(config):
+    """get_user_free_periods served from a warm free/busy cache"""
+    loop = asyncio.new_event_loop()
+    tz = pytz.timezone(bot.DEFAULT_TIMEZONE)
+    start = tz.localize(BASE)
+
+    for days in config["days"]:
+        for meetings_per_day in config["meetings_per_day"]:
+            events = make_user_events(0, days, meetings_per_day, 1)
+
+            async def fetch(access_token, range_start, range_end, **options):
+                return 200, events
+
+            bot.agent.free_busy_cache = EventCache(fetch, ttl=3600, stale_ttl=7200)
+            end = start + timedelta(days=days)
+            call = lambda end=end, days=days: loop.run_until_complete(bot.get_user_free_periods("1", "token", start, end, days))
+            call()  # fill the cache
+            yield f"free_periods/days={days}/meetings={meetings_per_day}", call
+
+    loop.close()
+
+
+def intersection_cases(config):
+    """!findtime intersection and merge over per-user free periods"""
+    tz = pytz.timezone(bot.DEFAULT_TIMEZONE)
+    start = tz.localize(BASE)
+
+    for users in config["users"]:
+        for days in config["days"]:
+            for tz_spread in config["tz_spread"]:
+                free_lists = []
+                for user_index in range(users):
+                    events = make_user_events(user_index, days, config["meetings_per_day"][-1], tz_spread)
+                    busy = bot.busy_periods_from_events(events, tz)
+                    free_lists.append(bot.compute_free_periods(busy, start, days, tz))
+                end = start + timedelta(days=days)
+                name = f"users={users}/days={days}/tz_spread={tz_spread}"
+                yield f"intersection_sweep/{name}", lambda lists=free_lists: find_common_free_periods(lists, 30)
+                yield f"intersection_bitset/{name}", lambda lists=free_lists, end=end: find_common_free_periods_bitset(lists, 30, start, end)
+
+
+def format_cases(config):
+    """!viewcal formatting of a week of events"""
+    tz = pytz.timezone(bot.DEFAULT_TIMEZONE)
+    for meetings_per_day in config["meetings_per_day"]:
+        events = make_user_events(0, 7, meetings_per_day, 1)
+        yield f"format_events/meetings={meetings_per_day}", lambda events=events: bot.format_events(events, tz)
+
+
+def routing_cases(config):
+    """Keyword routing for a mix of mention texts"""
+    author = FakeUser(1)
+    mentioned = [FakeUser(2), FakeUser(3)]
+
+    def route_all():
+        for content in MENTIONS:
+            route_mention(content, mentioned if "<@" in content else [], author)
+
+    yield f"route_mention/{len(MENTIONS)}_messages", route_all
+
+
+CONFIGS = {
+    "full": {"users": [2, 10, 50], "days": [3, 14], "meetings_per_day": [3, 8, 20], "tz_spread": [1, 3, 6]},
+    "quick": {"users": [2, 10], "days": [3], "meetings_per_day": [5], "tz_spread": [1, 3]},
+}
+
+
+def compare(results, baseline, threshold):
+    """Print median ratios against a baseline; returns names that regressed"""
+    regressions = []
+    print(f"\n{'case':<60} {'baseline':>10} {'now':>10} {'ratio':>7}")
+    for name, result in results.items():
+        before = baseline.get(name)
+        if not before:
+            print(f"{name:<60} {'-':>10} {result['median_ms']:>10.3f}     new")
+            continue
+        ratio = result["median_ms"] / before["median_ms"] if before["median_ms"] else float("inf")
+        flag = "  REGRESSION" if ratio > threshold else ""
+        print(f"{name:<60} {before['median_ms']:>10.3f} {result['median_ms']:>10.3f} {ratio:>6.2f}x{flag}")
+        if ratio > threshold:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark scheduling hot paths")
+    parser.add_argument("--quick", action="store_true", help="Smaller parameter grid")
+    parser.add_argument("--filter", default="", help="Only run cases whose name contains this")
+    parser.add_argument("--min-runs", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.2, help="Minimum seconds per case")
+    parser.add_argument("--json", help="Write results to this file")
+    parser.add_argument("--baseline", help="Compare against results saved with --json")
+    parser.add_argument("--threshold", type=float, default=1.2, help="Slowdown ratio counted as a regression")
+    args = parser.parse_args()
+
+    config = CONFIGS["quick" if args.quick else "full"]
+    results = {}
+
+    print(f"{'case':<60} {'runs':>6} {'median (ms)':>12} {'p95 (ms)':>10}")
+    for cases in (free_period_cases, intersection_cases, format_cases, routing_cases):
+        for name, func in cases(config):
+            if args.filter not in name:
+                continue
+            result = measure(func, args.min_runs, args.min_time)
+            results[name] = result
+            print(f"{name:<60} {result['runs']:>6} {result['median_ms']:>12.3f} {result['p95_ms']:>10.3f}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({
+                "meta": {
+                    "created": datetime.now().isoformat(timespec="seconds"),
+                    "python": platform.python_version(),
+                    "machine": platform.machine(),
+                    "config": "quick" if args.quick else "full",
+                },
+                "results": results,
+            }, f, indent=2)
+        print(f"\nWrote {len(results)} results to {args.json}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} case(s) slower than {args.threshold}x baseline")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
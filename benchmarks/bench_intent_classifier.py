@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Accuracy, coverage and speed of the offline intent classifier.
+
+Each bundled example is classified by a model trained on all the others
+(leave-one-out), at a range of confidence thresholds. For each threshold:
+
+    answered   share of messages handled locally (Mistral calls avoided)
+    precision  share of those answers with the right intent
+
+Then times predict() on the example messages.
+
+Run from the repository root:
+    python benchmarks/bench_intent_classifier.py
+    python benchmarks/bench_intent_classifier.py --margin 0.15 --examples my_examples.json
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from intent_classifier import IntentClassifier, load_examples, EXAMPLES_PATH
+
+THRESHOLDS = [0.1, 0.2, 0.25, 0.3, 0.35, 0.4, 0.5]
+
+
+def leave_one_out(examples, threshold, margin):
+    """(right, wrong, fallback) counts over every example"""
+    right = wrong = fallback = 0
+    for intent, texts in examples.items():
+        for position, text in enumerate(texts):
+            rest = dict(examples)
+            rest[intent] = texts[:position] + texts[position + 1:]
+            predicted, _ = IntentClassifier(rest, threshold, margin).predict(text)
+            if predicted is None:
+                fallback += 1
+            elif predicted == intent:
+                right += 1
+            else:
+                wrong += 1
+    return right, wrong, fallback
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate the offline intent classifier")
+    parser.add_argument("--examples", default=EXAMPLES_PATH)
+    parser.add_argument("--margin", type=float, default=0.1, help="Required lead over the runner-up intent")
+    parser.add_argument("--runs", type=int, default=20, help="Timing passes over the examples")
+    args = parser.parse_args()
+
+    examples = load_examples(args.examples)
+    total = sum(len(texts) for texts in examples.values())
+    print(f"{total} examples across {len(examples)} intents, margin {args.margin}\n")
+
+    print(f"{'threshold':>9} {'answered':>9} {'precision':>10} {'wrong':>6}")
+    for threshold in THRESHOLDS:
+        right, wrong, fallback = leave_one_out(examples, threshold, args.margin)
+        answered = right + wrong
+        precision = right / answered if answered else 0.0
+        print(f"{threshold:>9.2f} {answered / total:>9.1%} {precision:>10.1%} {wrong:>6}")
+
+    classifier = IntentClassifier(examples, margin=args.margin)
+    texts = [text for texts in examples.values() for text in texts]
+    began = time.perf_counter()
+    for _ in range(args.runs):
+        for text in texts:
+            classifier.predict(text)
+    per_message = (time.perf_counter() - began) / (args.runs * len(texts))
+    print(f"\npredict(): {per_message * 1e6:.1f} us per message")
+
+
+if __name__ == "__main__":
+    main()
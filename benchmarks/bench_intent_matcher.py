@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Compiled mention matcher vs the keyword chain it replaced.
+
+The old chain ran one `any(keyword in content ...)` scan per intent, then
+separate regex searches for duration and day count. match_mention() does all
+of it (plus date phrases) in one pass of a precompiled prefix-trie regex.
+
+Before timing, both are run over a generated corpus and the script exits
+with status 1 if they ever disagree on intent, duration or day count.
+
+Run from the repository root:
+    python benchmarks/bench_intent_matcher.py
+    python benchmarks/bench_intent_matcher.py --corpus 20000 --min-time 1
+"""
+
+import argparse
+import os
+import random
+import re
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import mention_router
+from mention_router import (
+    FIND_TIME_KEYWORDS, VIEW_CAL_KEYWORDS, FREE_TIME_KEYWORDS, HELP_KEYWORDS,
+    REGISTER_KEYWORDS, DATE_PHRASES, MAX_DAYS_AHEAD, match_mention
+)
+
+MENTIONS = [
+    "when can we meet <@2> for 30 minutes in the next 5 days",
+    "show calendar",
+    "what's on my calendar this week",
+    "when am i free tomorrow",
+    "check their availability <@2>",
+    "help",
+    "how do i connect my calendar",
+    "register",
+    "can you move my dentist appointment to friday",
+    "what do i have tomorrow",
+    "is <@2> around later",
+    "find time with <@2> <@3> for 1 hour",
+    "could you please look at whether <@2> and i could grab lunch sometime next week, ideally not too early",
+]
+
+FILLER = ["could", "you", "please", "maybe", "the", "team", "lunch", "sync", "later", "<@2>", "ok", "thanks"]
+EXTRAS = ["30 min", "1 hour", "45 minutes", "2 hrs", "3 days", "10 days", "their", "them"]
+
+
+def chain_intent(content, has_mentions):
+    """The keyword chain as it was in on_message"""
+    if has_mentions and any(keyword in content for keyword in FIND_TIME_KEYWORDS):
+        return "findtime"
+    if any(keyword in content for keyword in VIEW_CAL_KEYWORDS):
+        return "viewcal"
+    if any(keyword in content for keyword in FREE_TIME_KEYWORDS):
+        return "freetime"
+    if any(keyword in content for keyword in HELP_KEYWORDS):
+        return "help"
+    if any(keyword in content for keyword in REGISTER_KEYWORDS):
+        return "register"
+    return None
+
+
+def chain_duration(content):
+    duration_match = re.search(r'(\d+)\s*(min|minute|minutes|hour|hours|hr|hrs)', content)
+    if not duration_match:
+        return None
+    amount = int(duration_match.group(1))
+    unit = duration_match.group(2)
+    if unit.startswith('hour') or unit.startswith('hr'):
+        return amount * 60
+    return amount
+
+
+def chain_days(content):
+    days_match = re.search(r'(\d+)\s*(day|days)', content)
+    if not days_match:
+        return None
+    return min(int(days_match.group(1)), MAX_DAYS_AHEAD)
+
+
+def chain(content):
+    """Everything the old chain worked out for a findtime mention"""
+    return chain_intent(content, True), chain_duration(content), chain_days(content)
+
+
+def compiled(content):
+    matched = match_mention(content)
+    return matched.intent(True), matched.duration, matched.days_ahead
+
+
+def make_corpus(size, seed):
+    """Mentions built from keywords, date phrases, numbers and filler words
+
+    Keywords are sometimes cut or glued to their neighbours so overlapping
+    and partial matches get exercised too.
+    """
+    rng = random.Random(seed)
+    phrases = [keyword for _, keywords in mention_router.INTENT_KEYWORDS for keyword in keywords] + DATE_PHRASES
+    corpus = list(MENTIONS)
+    while len(corpus) < size:
+        parts = []
+        for _ in range(rng.randint(1, 8)):
+            pool = rng.choice((phrases, FILLER, EXTRAS))
+            part = rng.choice(pool)
+            if rng.random() < 0.2:
+                part = part[rng.randrange(len(part)):]
+            parts.append(part)
+        corpus.append(rng.choice((" ", " ", "")).join(parts))
+    return corpus
+
+
+def check(corpus):
+    """Messages where the two disagree"""
+    mismatches = []
+    for content in corpus:
+        for has_mentions in (True, False):
+            old = (chain_intent(content, has_mentions), chain_duration(content), chain_days(content))
+            matched = match_mention(content)
+            new = (matched.intent(has_mentions), matched.duration, matched.days_ahead)
+            if old != new:
+                mismatches.append((content, has_mentions, old, new))
+    return mismatches
+
+
+def measure(func, corpus, min_runs, min_time):
+    """Microseconds per message over the corpus"""
+    timings = []
+    began = time.perf_counter()
+    while len(timings) < min_runs or time.perf_counter() - began < min_time:
+        start = time.perf_counter()
+        for content in corpus:
+            func(content)
+        timings.append((time.perf_counter() - start) * 1e6 / len(corpus))
+    return statistics.median(timings), min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the compiled mention matcher")
+    parser.add_argument("--corpus", type=int, default=5000, help="Generated messages to check and time")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--min-runs", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.5, help="Minimum seconds per case")
+    args = parser.parse_args()
+
+    corpus = make_corpus(args.corpus, args.seed)
+    mismatches = check(corpus)
+    print(f"Checked {len(corpus)} messages: {len(mismatches)} mismatches")
+    for content, has_mentions, old, new in mismatches[:10]:
+        print(f"  {content!r} (mentions={has_mentions}): chain {old} vs compiled {new}")
+
+    print(f"\n{'case':<28} {'median (us/msg)':>16} {'min (us/msg)':>13}")
+    results = {}
+    for name, func, messages in (
+        ("chain/sample", chain, MENTIONS),
+        ("compiled/sample", compiled, MENTIONS),
+        ("chain/corpus", chain, corpus),
+        ("compiled/corpus", compiled, corpus),
+    ):
+        median, best = measure(func, messages, args.min_runs, args.min_time)
+        results[name] = median
+        print(f"{name:<28} {median:>16.2f} {best:>13.2f}")
+
+    for corpus_name in ("sample", "corpus"):
+        speedup = results[f"chain/{corpus_name}"] / results[f"compiled/{corpus_name}"]
+        print(f"speedup on {corpus_name}: {speedup:.2f}x")
+
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Benchmark the !findtime intersection: the old nested-loop version against the
+heap-based sweep in intersection.py and the slot bitmaps in availability_index.py.
+
+Run from the repository root:
+    python benchmarks/bench_intersection.py
+"""
+
+import os
+import random
+import sys
+import timeit
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from intersection import find_common_free_periods, merge_periods
+from availability_index import AvailabilityBitmap, find_common_free_periods_bitset, intersect_all
+
+DAYS = 14
+BASE = datetime(2025, 1, 6, tzinfo=timezone.utc)
+MIN_DURATION = 30
+
+
+def make_free_periods(rng, days):
+    """Build a plausible free list: 6AM-9PM each day with random meetings removed"""
+    base = BASE
+    free_periods = []
+
+    for day in range(days):
+        cursor = base + timedelta(days=day, hours=6)
+        day_end = base + timedelta(days=day, hours=21)
+
+        while cursor < day_end:
+            # A free gap followed by a meeting
+            gap_end = min(cursor + timedelta(minutes=rng.choice([60, 90, 120, 180, 240])), day_end)
+            free_periods.append((cursor, gap_end))
+            cursor = gap_end + timedelta(minutes=rng.choice([15, 30, 45, 60]))
+
+    return free_periods
+
+
+def nested_loop_intersection(free_period_lists, min_duration):
+    """The intersection + merge previously inlined in find_time"""
+    common_free_periods = free_period_lists[0]
+
+    for user_free_periods in free_period_lists[1:]:
+        new_common_periods = []
+        for period1 in common_free_periods:
+            for period2 in user_free_periods:
+                overlap_start = max(period1[0], period2[0])
+                overlap_end = min(period1[1], period2[1])
+                if overlap_start < overlap_end:
+                    duration = (overlap_end - overlap_start).total_seconds() / 60
+                    if duration >= min_duration:
+                        new_common_periods.append((overlap_start, overlap_end))
+        common_free_periods = new_common_periods
+        if not common_free_periods:
+            break
+
+    common_free_periods.sort(key=lambda x: x[0])
+    return merge_periods(common_free_periods)
+
+
+def main():
+    rng = random.Random(42)
+
+    print(
+        f"{'participants':>12} {'periods':>8} {'nested (ms)':>12} {'sweep (ms)':>11} {'speedup':>8} "
+        f"{'bitset (ms)':>12} {'AND only (ms)':>14}"
+    )
+    for participants in (2, 10, 50):
+        lists = [make_free_periods(rng, DAYS) for _ in range(participants)]
+        total_periods = sum(len(periods) for periods in lists)
+
+        repeat = 20 if participants < 50 else 5
+        nested = min(timeit.repeat(lambda: nested_loop_intersection(lists, MIN_DURATION), number=1, repeat=repeat))
+        sweep = min(timeit.repeat(lambda: find_common_free_periods(lists, MIN_DURATION), number=1, repeat=repeat))
+
+        # Bitmaps including conversion, and the AND alone once bitmaps are built
+        end = BASE + timedelta(days=DAYS)
+        bitset = min(timeit.repeat(lambda: find_common_free_periods_bitset(lists, MIN_DURATION, BASE, end), number=1, repeat=repeat))
+        bitmaps = [AvailabilityBitmap.from_periods(periods, BASE, 1, DAYS * 1440) for periods in lists]
+        and_only = min(timeit.repeat(lambda: intersect_all(bitmaps), number=1, repeat=repeat))
+
+        print(
+            f"{participants:>12} {total_periods:>8} {nested * 1000:>12.3f} {sweep * 1000:>11.3f} {nested / sweep:>7.1f}x "
+            f"{bitset * 1000:>12.3f} {and_only * 1000:>14.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,385 @@
+#!/usr/bin/env python3
+"""
+Synthetic Discord load against bot.on_message.
+
+Builds fake messages (mentions, !findtime with N participants, !viewcal,
+!freetime and mentions that fall through to Mistral) and feeds them to the
+bot's on_message handler at a fixed arrival rate, with no Discord connection.
+Upstream calls go to standin_server.py, which is started as a subprocess
+unless --standin points at one that's already running.
+
+Reports throughput, p50/p95/p99 latency per intent and event-loop lag for
+each rate step, so you can see where one process stops keeping up.
+
+Commands catch upstream failures and answer with an error message instead
+of raising, so a message only counts as answered when its replies include
+a result (an embed, a calendar listing or "no common time") and no "❌" or
+"⚠️" message. Exceptions, error replies and missing results are counted
+separately per intent; latency percentiles cover answered messages only.
+
+Run from the repository root:
+    python benchmarks/load_discord.py
+    python benchmarks/load_discord.py --rates 5,20,50,100 --duration 15 --participants 4
+    python benchmarks/load_discord.py --mix findtime=1,nlp=1 --standin http://127.0.0.1:8090 --users 50
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import itertools
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Same IDs standin_server.py gives its pre-registered users
+FIRST_USER_ID = 100000000000000000
+BOT_USER_ID = 999999999999999999
+
+# Commands catch upstream failures and reply with one of these instead of raising
+ERROR_PREFIXES = ("❌", "⚠️")
+# Text replies that answer a request; anything sent as an embed does too
+RESULT_PREFIXES = ("📅", "⛔")
+
+DEFAULT_MIX = "mention_findtime=2,findtime=3,viewcal=2,mention_viewcal=1,freetime=2,nlp=1"
+NLP_TEXTS = [
+    "is {mention} available friday?",
+    "could you check if {mention} is available tomorrow",
+    "any availability for {mention} on monday",
+]
+
+
+class FakeUser:
+    """Just enough of discord.User/Member for the bot's handlers"""
+
+    def __init__(self, user_id, name):
+        self.id = user_id
+        self.name = name
+        self.display_name = name
+        self.nick = None
+        self.bot = False
+        self.mention = f"<@{user_id}>"
+
+    def __eq__(self, other):
+        return isinstance(other, FakeUser) and other.id == self.id
+
+    def __hash__(self):
+        return hash(self.id)
+
+
+class FakeSentMessage:
+    def __init__(self, content, embed=None):
+        self.content = content
+        self.embed = embed
+        self.deleted = False
+
+    async def edit(self, **kwargs):
+        self.content = kwargs.get("content", self.content)
+        self.embed = kwargs.get("embed", self.embed)
+
+    async def delete(self):
+        # Loading messages are deleted once the answer is out
+        self.deleted = True
+
+
+class FakeChannel:
+    """Collects what the bot sends instead of posting it"""
+
+    def __init__(self, channel_id):
+        self.id = channel_id
+        self.replies = []
+
+    async def send(self, content=None, **kwargs):
+        reply = FakeSentMessage(content, kwargs.get("embed"))
+        self.replies.append(reply)
+        return reply
+
+    @contextlib.asynccontextmanager
+    async def typing(self):
+        yield
+
+
+class FakeGuild:
+    def __init__(self, members):
+        self.id = 1
+        self.members = members
+
+    def get_member(self, user_id):
+        return next((member for member in self.members if member.id == user_id), None)
+
+
+class FakeMessage:
+    _ids = itertools.count(1)
+
+    def __init__(self, content, author, channel, guild, mentions):
+        self.id = next(self._ids)
+        self.content = content
+        self.author = author
+        self.channel = channel
+        self.guild = guild
+        self.mentions = mentions
+        self.attachments = []
+        self._state = None
+
+
+def parse_mix(spec):
+    mix = {}
+    for part in spec.split(","):
+        intent, _, weight = part.partition("=")
+        mix[intent.strip()] = float(weight or 1)
+    return mix
+
+
+def build_message(intent, rng, users, bot_user, guild, participants):
+    """A fake guild message for one intent"""
+    author = rng.choice(users)
+    others = rng.sample([user for user in users if user != author], min(participants, len(users) - 1))
+    mention_text = " ".join(user.mention for user in others)
+    channel = FakeChannel(rng.randrange(1, 20))
+
+    if intent == "findtime":
+        content, mentions = f"!findtime {mention_text} duration=30 days=3", others
+    elif intent == "mention_findtime":
+        content, mentions = f"{bot_user.mention} when can we meet {mention_text} for 30 minutes", [bot_user] + others
+    elif intent == "viewcal":
+        content, mentions = "!viewcal", []
+    elif intent == "mention_viewcal":
+        content, mentions = f"{bot_user.mention} show calendar", [bot_user]
+    elif intent == "freetime":
+        content, mentions = "!freetime", []
+    elif intent == "nlp":
+        content = f"{bot_user.mention} " + rng.choice(NLP_TEXTS).format(mention=others[0].mention)
+        mentions = [bot_user, others[0]]
+    else:
+        raise ValueError(f"Unknown intent in mix: {intent}")
+
+    return FakeMessage(content, author, channel, guild, mentions)
+
+
+def reply_failure(replies):
+    """("error_replies" or "no_result", description) if the replies didn't answer the request, else None"""
+    for reply in replies:
+        if reply.content and reply.content.startswith(ERROR_PREFIXES):
+            return "error_replies", reply.content[:120]
+    for reply in replies:
+        if reply.embed is not None:
+            return None
+        if not reply.deleted and reply.content and reply.content.startswith(RESULT_PREFIXES):
+            return None
+    sent = [reply.content[:60] for reply in replies if reply.content]
+    return "no_result", f"no result in {len(replies)} replies {sent}"
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+async def monitor_loop_lag(samples, interval=0.01):
+    """Record how late the event loop wakes up a sleeper, in ms"""
+    loop = asyncio.get_running_loop()
+    while True:
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        samples.append(max(0.0, (loop.time() - expected) * 1000))
+
+
+async def run_step(bot_module, rate, duration, mix, rng, users, bot_user, guild, participants, quiet):
+    """Send Poisson arrivals at `rate` msgs/sec for `duration` seconds"""
+    latencies = {intent: [] for intent in mix}
+    counts = {intent: 0 for intent in mix}
+    failures = {intent: {"exceptions": 0, "error_replies": 0, "no_result": 0} for intent in mix}
+    first_errors = {}
+    lag = []
+    in_flight = set()
+    max_in_flight = 0
+    intents = list(mix)
+    weights = [mix[intent] for intent in intents]
+
+    async def handle(intent, message):
+        began = time.perf_counter()
+        try:
+            await bot_module.on_message(message)
+            failure = reply_failure(message.channel.replies)
+        except Exception as e:
+            failure = "exceptions", repr(e)
+        elapsed_ms = (time.perf_counter() - began) * 1000
+        counts[intent] += 1
+        if failure:
+            # Failures are often fast; keep them out of the latency percentiles
+            kind, description = failure
+            failures[intent][kind] += 1
+            first_errors.setdefault(intent, description)
+        else:
+            latencies[intent].append(elapsed_ms)
+
+    monitor = asyncio.create_task(monitor_loop_lag(lag))
+    output = io.StringIO() if quiet else None
+    began = time.perf_counter()
+
+    with contextlib.redirect_stdout(output) if quiet else contextlib.nullcontext():
+        next_arrival = began
+        while time.perf_counter() - began < duration:
+            intent = rng.choices(intents, weights)[0]
+            message = build_message(intent, rng, users, bot_user, guild, participants)
+            task = asyncio.create_task(handle(intent, message))
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
+            max_in_flight = max(max_in_flight, len(in_flight))
+
+            next_arrival += rng.expovariate(rate)
+            await asyncio.sleep(max(0.0, next_arrival - time.perf_counter()))
+
+        if in_flight:
+            await asyncio.wait(set(in_flight))
+
+    elapsed = time.perf_counter() - began
+    monitor.cancel()
+
+    completed = sum(counts.values())
+    return {
+        "target_rate": rate,
+        "throughput": completed / elapsed,
+        "completed": completed,
+        "max_in_flight": max_in_flight,
+        "loop_lag_ms": {"p50": percentile(lag, 0.5), "p99": percentile(lag, 0.99), "max": max(lag, default=0.0)},
+        "intents": {
+            intent: {
+                "count": counts[intent],
+                "answered": len(values),
+                "errors": sum(failures[intent].values()),
+                **failures[intent],
+                "p50_ms": percentile(values, 0.5),
+                "p95_ms": percentile(values, 0.95),
+                "p99_ms": percentile(values, 0.99),
+                "mean_ms": statistics.fmean(values) if values else 0.0,
+            }
+            for intent, values in latencies.items()
+        },
+        "first_errors": first_errors,
+    }
+
+
+def print_step(result):
+    lag = result["loop_lag_ms"]
+    print(
+        f"\n== {result['target_rate']:g} msg/s target: {result['throughput']:.1f} msg/s handled, "
+        f"{result['completed']} messages, max {result['max_in_flight']} in flight, "
+        f"loop lag p50 {lag['p50']:.1f}ms p99 {lag['p99']:.1f}ms max {lag['max']:.1f}ms"
+    )
+    print(
+        f"{'intent':<18} {'count':>6} {'answered':>8} {'raised':>7} {'err reply':>9} {'no result':>9} "
+        f"{'p50 (ms)':>9} {'p95 (ms)':>9} {'p99 (ms)':>9}"
+    )
+    for intent, stats in result["intents"].items():
+        print(
+            f"{intent:<18} {stats['count']:>6} {stats['answered']:>8} {stats['exceptions']:>7} "
+            f"{stats['error_replies']:>9} {stats['no_result']:>9} "
+            f"{stats['p50_ms']:>9.1f} {stats['p95_ms']:>9.1f} {stats['p99_ms']:>9.1f}"
+        )
+    for intent, error in result["first_errors"].items():
+        print(f"first {intent} error: {error}")
+
+
+def start_standin(args):
+    """Launch standin_server.py and wait until it answers"""
+    port = args.standin_port
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, "standin_server.py"), "--port", str(port), "--users", str(args.users)]
+        + args.standin_arg,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    url = f"http://127.0.0.1:{port}"
+    for _ in range(50):
+        try:
+            urllib.request.urlopen(f"{url}/_standin/stats", timeout=1)
+            return process, url
+        except Exception:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError("Stand-in server did not start")
+
+
+async def run(args, url):
+    # Point every upstream at the stand-in before the bot reads its config
+    os.environ.update({
+        "CRONOFY_API_URL": url,
+        "CRONOFY_APP_URL": url,
+        "MISTRAL_API_URL": url,
+        "SUPABASE_URL": url,
+        "SUPABASE_KEY": "standin.standin.standin",
+        "MISTRAL_API_KEY": os.environ.get("MISTRAL_API_KEY", "standin"),
+        "NOTIFY_LISTENER_PORT": "",
+    })
+    from discord.ext import commands
+    import bot as bot_module
+
+    # Replies go to the fake channel instead of the Discord API
+    commands.Context.send = lambda ctx, *send_args, **send_kwargs: ctx.channel.send(*send_args, **send_kwargs)
+
+    bot = bot_module.bot
+    await bot._async_setup_hook()
+    bot_user = FakeUser(BOT_USER_ID, "Skedge")
+    bot._connection.user = bot_user
+
+    users = [FakeUser(FIRST_USER_ID + i, f"standin{i}") for i in range(args.users)]
+    guild = FakeGuild(users)
+    mix = parse_mix(args.mix)
+    rng = random.Random(args.seed)
+
+    results = []
+    try:
+        for rate in [float(rate) for rate in args.rates.split(",")]:
+            result = await run_step(
+                bot_module, rate, args.duration, mix, rng, users, bot_user, guild, args.participants, not args.verbose
+            )
+            print_step(result)
+            results.append(result)
+    finally:
+        await bot_module.agent.close()
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"args": vars(args), "steps": results}, f, indent=2)
+        print(f"\nWrote {len(results)} steps to {args.json}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Drive bot.on_message with synthetic guild traffic")
+    parser.add_argument("--rates", default="5,10,20", help="Comma separated arrival rates (msg/s), one step each")
+    parser.add_argument("--duration", type=float, default=10, help="Seconds per rate step")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="intent=weight,... from findtime, mention_findtime, viewcal, mention_viewcal, freetime, nlp")
+    parser.add_argument("--participants", type=int, default=2, help="Users mentioned per !findtime")
+    parser.add_argument("--users", type=int, default=30, help="Registered users in the stand-in")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--standin", help="URL of a running stand-in server (otherwise one is started)")
+    parser.add_argument("--standin-port", type=int, default=8090)
+    parser.add_argument("--standin-arg", action="append", default=[], help="Extra argument for the started stand-in, e.g. --standin-arg=--fail=429=0.05")
+    parser.add_argument("--json", help="Write results to this file")
+    parser.add_argument("--verbose", action="store_true", help="Keep the bot's own output")
+    args = parser.parse_args()
+
+    process = None
+    url = args.standin
+    if not url:
+        process, url = start_standin(args)
+    try:
+        asyncio.run(run(args, url))
+    finally:
+        if process:
+            process.terminate()
+
+
+if __name__ == "__main__":
+    main()
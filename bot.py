@@ -1,42 +1,45 @@
-import os
 import discord
 import logging
+import asyncio
 from discord.ext import commands, tasks
-from dotenv import load_dotenv
+from config import get_env_variable
 from agent import MistralAgent
+from intersection import find_common_free_periods
+from availability_index import find_common_free_periods_bitset
+from availability import compute_free_periods, busy_periods_from_events, localize, window_label
+from notifications import NotificationListener
+from mention_router import route_mention
+from mistral_client import MistralError
+from metrics import MetricsServer, track_command
+import tracing
 from datetime import datetime, timedelta
-import json
 import pytz
 import copy
-import re
 
 # Setup logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger('discord')
 
-# Setup for both local development and AWS deployment
-def get_env_variable(var_name):
-    # First try AWS Parameter Store if boto3 is available
-    try:
-        import boto3
-        ssm = boto3.client('ssm', region_name='us-east-1')  # Change region as needed
-        try:
-            response = ssm.get_parameter(Name=f'/schedge/{var_name}', WithDecryption=True)
-            return response['Parameter']['Value']
-        except Exception as e:
-            logging.warning(f"Could not get parameter from AWS: {e}")
-    except ImportError:
-        logging.info("boto3 not available, using local environment")
-    
-    # Fall back to local .env file
-    if os.path.exists('.env'):
-        load_dotenv()
-    return os.environ.get(var_name)
-
-# Load environment variables using the new function
+# Load configuration (AWS Parameter Store or .env, loaded once)
 DISCORD_TOKEN = get_env_variable('DISCORD_TOKEN')
 MISTRAL_API_KEY = get_env_variable('MISTRAL_API_KEY')
 
+# How many participant calendars !findtime loads at once, and how long each may take
+FINDTIME_CONCURRENCY = int(get_env_variable('FINDTIME_CONCURRENCY', 5))
+FINDTIME_PARTICIPANT_TIMEOUT = float(get_env_variable('FINDTIME_PARTICIPANT_TIMEOUT', 10))
+
+# Default timezone for scheduling and display
+DEFAULT_TIMEZONE = get_env_variable('TIMEZONE', 'America/Los_Angeles')
+
+# Daily window and horizon for !freetime
+FREE_TIME_WINDOW_START = int(get_env_variable('FREE_TIME_WINDOW_START', 6))
+FREE_TIME_WINDOW_END = int(get_env_variable('FREE_TIME_WINDOW_END', 21))
+FREE_TIME_DAYS = 3
+
+# Group availability engine for !findtime: "sweep" (sorted interval merge) or "bitset" (slot bitmaps)
+AVAILABILITY_ENGINE = get_env_variable('AVAILABILITY_ENGINE', 'sweep')
+AVAILABILITY_SLOT_MINUTES = int(get_env_variable('AVAILABILITY_SLOT_MINUTES', 1))
+
 # Load environment variables and setup bot
 PREFIX = "!"
 intents = discord.Intents.all()
@@ -44,6 +47,26 @@ bot = commands.Bot(command_prefix=PREFIX, intents=intents)
 agent = MistralAgent(bot)
 bot.remove_command('help')
 
+# Listener for calendar change notifications forwarded by oauth_server.py
+NOTIFY_LISTENER_PORT = get_env_variable('NOTIFY_LISTENER_PORT')
+notification_listener = None
+if NOTIFY_LISTENER_PORT:
+    notification_listener = NotificationListener(
+        agent,
+        host=get_env_variable('NOTIFY_LISTENER_HOST', '127.0.0.1'),
+        port=int(NOTIFY_LISTENER_PORT),
+        api_key=get_env_variable('OAUTH_SERVER_API_KEY')
+    )
+
+# Prometheus-style metrics endpoint (off unless METRICS_PORT is set)
+METRICS_PORT = get_env_variable('METRICS_PORT')
+metrics_server = None
+if METRICS_PORT:
+    metrics_server = MetricsServer(
+        host=get_env_variable('METRICS_HOST', '127.0.0.1'),
+        port=int(METRICS_PORT)
+    )
+
 # Admin users list - CHANGE THIS before public release
 ADMIN_USERS = ["your_discord_username"]  # Replace with generic placeholder
 
@@ -59,6 +82,13 @@ def is_admin(member):
 # Store processed message IDs
 PROCESSED_MESSAGES = set()
 
+# Shown when a keyword-routed command can't be run
+ROUTE_ERRORS = {
+    "findtime": "❌ I couldn't run the findtime command. Try using `!findtime @user` directly.",
+    "viewcal": "❌ I couldn't run the viewcal command. Try using `!viewcal` directly.",
+    "freetime": "❌ I couldn't run the freetime command. Try using `!freetime` directly.",
+}
+
 @bot.event
 async def on_ready():
     """Called when the bot is ready"""
@@ -68,11 +98,28 @@ async def on_ready():
     # Set up the agent's session
     await agent.setup_session()
     
+    # Start the background token refresher
+    agent.token_refresher.start()
+    
+    # Start receiving calendar change notifications
+    if notification_listener:
+        await notification_listener.start()
+    
+    # Start serving metrics
+    if metrics_server:
+        await metrics_server.start()
+    
     # Start the cleanup task
-    cleanup_processed_messages.start()
+    if not cleanup_processed_messages.is_running():
+        cleanup_processed_messages.start()
 
 @bot.event
 async def on_message(message):
+    """Process messages and catch mentions, traced for a sample of messages"""
+    async with tracing.get_tracer().trace("on_message", message_id=message.id, dm=message.guild is None):
+        await handle_message(message)
+
+async def handle_message(message):
     """Process messages and catch mentions"""
     # Skip messages from the bot itself
     if message.author == bot.user:
@@ -135,158 +182,54 @@ async def on_message(message):
     # Extract mentions (except the bot)
     mentioned_users = [user for user in message.mentions if user.id != bot.user.id]
     
-    # Parse duration if mentioned
-    duration_match = re.search(r'(\d+)\s*(min|minute|minutes|hour|hours|hr|hrs)', content)
-    duration = None
-    if duration_match:
-        amount = int(duration_match.group(1))
-        unit = duration_match.group(2)
-        if unit.startswith('hour') or unit.startswith('hr'):
-            duration = amount * 60
-        else:
-            duration = amount
-    
-    # Parse days ahead if mentioned
-    days_match = re.search(r'(\d+)\s*(day|days)', content)
-    days_ahead = None
-    if days_match:
-        days_ahead = int(days_match.group(1))
-        if days_ahead > 14:
-            days_ahead = 14
-    
-    # FIND TIME INTENT - detects various ways to ask about finding time
-    find_time_keywords = [
-        "when can", "when are", "when is", "schedule", "meeting", "meet", 
-        "find time", "common time", "available time", "free time", "free slot",
-        "when are we free", "when are you free", "when can we meet", 
-        "set up a meeting", "setup a meeting", "arrange a meeting",
-        "time to meet", "time to talk", "time slot"
-    ]
+    # Keyword routing for the common intents, before falling back to Mistral
+    with tracing.span("route_mention") as route_span:
+        intent, command = route_mention(content, mentioned_users, message.author)
+        route_span.set(intent=intent)
     
-    if any(keyword in content for keyword in find_time_keywords) and mentioned_users:
-        await message.channel.send(f"🔍 Looking for common free time...")
+    if intent:
+        if intent == "findtime":
+            await message.channel.send(f"🔍 Looking for common free time...")
         
-        # Create a command message
+        # Create and execute the command
         fake_message = copy.copy(message)
-        mention_text = " ".join([user.mention for user in mentioned_users if user.id != bot.user.id])
-        
-        if not mention_text:
-            await message.channel.send("❌ Please mention at least one other user to find common free time.")
-            return
-        
-        # Build the command with any extracted parameters
-        command = f"!findtime {mention_text}"
-        if duration:
-            command += f" duration={duration}"
-        if days_ahead:
-            command += f" days={days_ahead}"
-            
         fake_message.content = command
         PROCESSED_MESSAGES.add(fake_message.id)
         
-        # Execute the command
         ctx = await bot.get_context(fake_message)
-        if ctx.valid:
-            await bot.process_commands(fake_message)
+        if ctx.valid or intent in ("help", "register"):
+            async with tracing.span("process_commands", command=command.split()[0]):
+                await bot.process_commands(fake_message)
         else:
-            await message.channel.send(f"❌ I couldn't run the findtime command. Try using `!findtime @user` directly.")
+            await message.channel.send(ROUTE_ERRORS[intent])
         return
     
-    # VIEW CALENDAR INTENT
-    view_cal_keywords = [
-        "show calendar", "view calendar", "see calendar", "check calendar",
-        "what's on my calendar", "what is on my calendar", "my schedule",
-        "my appointments", "my events", "what do i have", "what events",
-        "calendar for", "schedule for", "what's happening", "what is happening"
-    ]
+    # Offline classifier next; Mistral is only called when it isn't confident
+    with tracing.span("classify_intent") as classify_span:
+        parsed_response = agent.classify_locally(content, message.author, mentioned_users)
+        classify_span.set(intent=parsed_response and parsed_response["intent"])
     
-    if any(keyword in content for keyword in view_cal_keywords):
-        target_user = None
-        
-        # Check if asking about someone else's calendar
-        if mentioned_users and any(word in content for word in ["their", "his", "her", "them"]):
-            target_user = mentioned_users[0]
-        else:
-            # Default to the requester if no specific target
-            target_user = message.author
+    if parsed_response:
+        command = agent.command_for_intent(parsed_response, message.author, mentioned_users)
+        if command:
+            if command.startswith("!findtime"):
+                await message.channel.send(f"🔍 Looking for common free time...")
             
-        # Create and execute viewcal command
-        fake_message = copy.copy(message)
-        if target_user != message.author:
-            fake_message.content = f"!viewcal {target_user.mention}"
-        else:
-            fake_message.content = "!viewcal"
+            # Create and execute the command
+            fake_message = copy.copy(message)
+            fake_message.content = command
+            PROCESSED_MESSAGES.add(fake_message.id)
             
-        PROCESSED_MESSAGES.add(fake_message.id)
-        ctx = await bot.get_context(fake_message)
-        if ctx.valid:
-            await bot.process_commands(fake_message)
-        else:
-            await message.channel.send("❌ I couldn't run the viewcal command. Try using `!viewcal` directly.")
-        return
-    
-    # FREE TIME INTENT
-    free_time_keywords = [
-        "when am i free", "my free time", "my availability", "free slots",
-        "available slots", "when are they free", "their availability",
-        "their free time", "check availability", "check free time"
-    ]
-    
-    if any(keyword in content for keyword in free_time_keywords):
-        target_user = None
-        
-        # Check if asking about someone else's free time
-        if mentioned_users and any(word in content for word in ["their", "his", "her", "them"]):
-            target_user = mentioned_users[0]
-        else:
-            # Default to the requester if no specific target
-            target_user = message.author
-            
-        # Create and execute freetime command
-        fake_message = copy.copy(message)
-        if target_user != message.author:
-            fake_message.content = f"!freetime {target_user.mention}"
-        else:
-            fake_message.content = "!freetime"
-            
-        PROCESSED_MESSAGES.add(fake_message.id)
-        ctx = await bot.get_context(fake_message)
-        if ctx.valid:
-            await bot.process_commands(fake_message)
-        else:
-            await message.channel.send("❌ I couldn't run the freetime command. Try using `!freetime` directly.")
-        return
-    
-    # HELP INTENT
-    help_keywords = [
-        "help", "commands", "how do i", "how to", "what can you do",
-        "features", "capabilities", "instructions", "guide me"
-    ]
-    
-    if any(keyword in content for keyword in help_keywords):
-        fake_message = copy.copy(message)
-        fake_message.content = "!help"
-        PROCESSED_MESSAGES.add(fake_message.id)
-        ctx = await bot.get_context(fake_message)
-        await bot.process_commands(fake_message)
-        return
-    
-    # REGISTRATION INTENT
-    register_keywords = [
-        "register", "connect", "setup calendar", "set up calendar", 
-        "link calendar", "connect calendar"
-    ]
-    
-    if any(keyword in content for keyword in register_keywords):
-        fake_message = copy.copy(message)
-        fake_message.content = "!register"
-        PROCESSED_MESSAGES.add(fake_message.id)
-        ctx = await bot.get_context(fake_message)
-        await bot.process_commands(fake_message)
-        return
+            ctx = await bot.get_context(fake_message)
+            if ctx.valid or command in ("!help", "!register"):
+                async with tracing.span("process_commands", command=command.split()[0]):
+                    await bot.process_commands(fake_message)
+            else:
+                await message.channel.send("❌ I understood your request but couldn't execute the command properly.")
+            return
     
-    # When bot is mentioned
-    if is_mentioned:
+    # When bot is mentioned and the local classifier wasn't sure
+    if is_mentioned and not parsed_response:
         # Send a typing indicator to show the bot is working
         async with message.channel.typing():
             # First let the user know we're using Mistral API
@@ -296,14 +239,28 @@ async def on_message(message):
             filtered_mentions = [user for user in mentioned_users if user.id != bot.user.id]
             
             # Call Mistral NLP processing
-            command = await agent.process_natural_language(content, message.author, filtered_mentions)
+            async with track_command("nlp_fallback"), tracing.span("nlp_fallback"):
+                command = await agent.process_natural_language(content, message.author, filtered_mentions)
             
             # Delete the loading message
             await loading_msg.delete()
             
+            # Let the user know we're using Mistral AI to process their request
+            mistral_msg = f"✨ *Powered by Mistral AI* ✨\n\n"
+            
+            if isinstance(command, MistralError):
+                # Mistral is busy or down: go with the offline classifier's best guess, if it has one
+                print(f"Mistral unavailable ({command.kind}), falling back to the local classifier")
+                parsed_response = agent.best_local_guess(content, message.author, filtered_mentions)
+                command = parsed_response and agent.command_for_intent(parsed_response, message.author, filtered_mentions)
+                if not command:
+                    await message.channel.send(
+                        "⚠️ The AI service is busy right now. Try a command directly, e.g. `!findtime @user`, `!freetime` or `!help`."
+                    )
+                    return
+                mistral_msg = "⚠️ The AI service is busy, so this is my best guess.\n\n"
+            
             if command:
-                # Let the user know we're using Mistral AI to process their request
-                mistral_msg = f"✨ *Powered by Mistral AI* ✨\n\n"
                 
                 # Execute the generated command
                 fake_message = copy.copy(message)
@@ -315,7 +272,8 @@ async def on_message(message):
                 
                 ctx = await bot.get_context(fake_message)
                 if ctx.valid:
-                    await bot.process_commands(fake_message)
+                    async with tracing.span("process_commands", command=command.split()[0]):
+                        await bot.process_commands(fake_message)
                     return
                 else:
                     await message.channel.send("❌ I understood your request but couldn't execute the command properly.")
@@ -336,6 +294,27 @@ async def on_message(message):
     response += "\n".join([f"• {suggestion}" for suggestion in suggestions])
     await message.channel.send(response)
 
+@bot.before_invoke
+async def start_command_metrics(ctx):
+    """Start timing a command for the metrics endpoint and the current trace"""
+    ctx.metrics_tracker = track_command(ctx.command.name).__enter__()
+    ctx.trace_span = tracing.span(f"command.{ctx.command.name}").__enter__()
+
+@bot.after_invoke
+async def finish_command_metrics(ctx):
+    """Record a command's latency, and whether it failed"""
+    tracker = getattr(ctx, "metrics_tracker", None)
+    if tracker:
+        if ctx.command_failed:
+            tracker.fail()
+        tracker.__exit__(None, None, None)
+    
+    trace_span = getattr(ctx, "trace_span", None)
+    if trace_span:
+        if ctx.command_failed:
+            trace_span.fail()
+        trace_span.__exit__(None, None, None)
+
 @tasks.loop(minutes=10)
 async def cleanup_processed_messages():
     """Clear the processed messages set periodically"""
@@ -358,7 +337,9 @@ async def help_command(ctx):
         value=(
             "`!register` - Connect your Google Calendar to Skedge\n"
             "`!unregister` - Remove your calendar connection\n"
-            "`!status` - Check if your calendar is connected"
+            "`!status` - Check if your calendar is connected\n"
+            "`!calendars` - List your calendars and which ones count as busy\n"
+            "`!calendars <id> ...` - Only use these calendars for free time (`!calendars all` to reset)"
         ),
         inline=False
     )
@@ -404,7 +385,8 @@ async def help_command(ctx):
             name="Admin Commands",
             value=(
                 "`!users` - List all registered users\n"
-                "`!dbtest` - Test database connection"
+                "`!dbtest` - Test database connection\n"
+                "`!httpstats` - Show HTTP connection reuse per upstream host"
             ),
             inline=False
         )
@@ -460,63 +442,27 @@ async def view_calendar(ctx, username=None):
     loading_message = await ctx.send(f"📅 Fetching calendar for {target_user.mention}...")
     
     try:
+        # Refresh the token if it has expired (shared with any refresh already in flight)
+        user_data = await agent.token_refresher.ensure_fresh(target_user.id, user_data)
+        if not user_data:
+            await ctx.send(f"❌ Could not refresh the calendar token for {target_user.mention}. Please `!unregister` and `!register` again.")
+            await loading_message.delete()
+            return
+        
         # Access token for API call
         access_token = user_data.get("access_token")
-        
-        # Check if token is expired and needs refresh
-        token_expiry = user_data.get("token_expiry", 0)
-        
-        # Fix for token_expiry handling - handle both timestamp and ISO format
-        current_time = datetime.now(pytz.UTC).timestamp()
-        
-        # If token_expiry is a string, try to handle it properly
-        if isinstance(token_expiry, str):
-            try:
-                # First try direct float conversion (for legacy timestamps)
-                token_expiry = float(token_expiry)
-            except ValueError:
-                try:
-                    # If that fails, try parsing as ISO datetime with timezone
-                    expiry_dt = datetime.fromisoformat(token_expiry.replace('Z', '+00:00'))
-                    token_expiry = expiry_dt.timestamp()
-                except Exception:
-                    # If all parsing fails, assume token is expired
-                    token_expiry = 0
-                    print(f"Could not parse token expiry: {token_expiry}")
-        
-        if current_time > token_expiry:
-            # Try to refresh the token
-            refresh_success = await refresh_token_for_user(
-                target_user.id, user_data.get("refresh_token")
-            )
-            
-            if refresh_success:
-                # Get the updated user data with new token
-                user_data = await agent.db.get_user(str(target_user.id))
-                access_token = user_data.get("access_token")
-            else:
-                await ctx.send(f"❌ Could not refresh the calendar token for {target_user.mention}. Please `!unregister` and `!register` again.")
-                await loading_message.delete()
-                return
                 
         # Get user's timezone or use Pacific by default
-        user_tz = user_data.get("timezone", "America/Los_Angeles")
+        user_tz = user_data.get("timezone", DEFAULT_TIMEZONE)
         display_timezone = pytz.timezone(user_tz)
         
         # Get calendar events for the next 7 days
-        start_date = datetime.now().date()
+        start_date = display_timezone.localize(datetime.combine(datetime.now(display_timezone).date(), datetime.min.time()))
         end_date = start_date + timedelta(days=7)
         
-        # Fetch events from Cronofy
-        status, response_text = await agent.cronofy_api_call(
-            endpoint="v1/events",
-            auth_token=access_token,
-            params={
-                "tzid": user_tz,
-                "from": start_date.isoformat(),
-                "to": end_date.isoformat(),
-                "include_managed": "true"
-            }
+        # Fetch events from Cronofy (served from the shared event cache when possible)
+        status, events = await agent.event_cache.get_events(
+            target_user.id, access_token, start_date, end_date, tz=display_timezone
         )
         
         if status != 200:
@@ -527,11 +473,8 @@ async def view_calendar(ctx, username=None):
             await loading_message.delete()
             return
         
-        # Parse the events
+        # Format the events
         try:
-            response_data = json.loads(response_text)
-            events = response_data.get("events", [])
-            
             if not events:
                 await ctx.send(f"📅 No events found in {target_user.mention}'s calendar for the next week.")
                 await loading_message.delete()
@@ -554,37 +497,19 @@ async def view_calendar(ctx, username=None):
         print(f"Calendar view error: {e}")
 
 def format_events(events, display_timezone):
-    """Format events into a readable text format"""
+    """Format parsed Event records into a readable text format"""
     days = {}
     
     for event in events:
         try:
-            # Get basic event info
-            summary = event.get("summary", "Untitled Event")
-            
-            # Handle different time formats from the API
-            start_str = event.get("start", "")
-            end_str = event.get("end", "")
-            
-            # Default time string
-            time_str = "All day"
-            day_str = ""
-            
-            # Handle event times
-            if isinstance(start_str, str) and "T" in start_str:
-                # Parse start time - assume UTC since we requested UTC times
-                event_start = datetime.fromisoformat(start_str.replace("Z", "+00:00"))
-                if event_start.tzinfo is None:
-                    event_start = event_start.replace(tzinfo=pytz.UTC)
-                
+            if event.all_day:
+                # All-day events keep their calendar date
+                day_str = datetime.fromtimestamp(event.start, pytz.UTC).strftime("%Y-%m-%d")
+                time_str = "All day"
+            else:
                 # Always convert to the display timezone
-                local_start = event_start.astimezone(display_timezone)
-                
-                # Parse end time with the same approach
-                event_end = datetime.fromisoformat(end_str.replace("Z", "+00:00"))
-                if event_end.tzinfo is None:
-                    event_end = event_end.replace(tzinfo=pytz.UTC)
-                local_end = event_end.astimezone(display_timezone)
+                local_start = datetime.fromtimestamp(event.start, display_timezone)
+                local_end = datetime.fromtimestamp(event.end, display_timezone)
                 
                 # Format times
                 day_str = local_start.strftime("%Y-%m-%d")
@@ -600,8 +525,9 @@ def format_events(events, display_timezone):
                 days[day_str] = []
             
             days[day_str].append({
+                "start": event.start,
                 "time": time_str,
-                "summary": summary
+                "summary": event.summary
             })
         except Exception as e:
             print(f"Error parsing event: {e}")
@@ -617,8 +543,8 @@ def format_events(events, display_timezone):
         
         formatted_events += f"{day_name}:\n"
         
-        # Sort events by time
-        days[day_str].sort(key=lambda x: x["time"])
+        # Sort events by time (all-day events first)
+        days[day_str].sort(key=lambda x: (x["time"] != "All day", x["start"]))
         
         for event in days[day_str]:
             formatted_events += f"  • {event['time']}: {event['summary']}\n"
@@ -628,48 +554,6 @@ def format_events(events, display_timezone):
     formatted_events += "```"
     return formatted_events
 
-async def refresh_token_for_user(user_id, refresh_token):
-    """Attempt to refresh an expired token"""
-    try:
-        token_url = "https://api.cronofy.com/oauth/token"
-        payload = {
-            "client_id": agent.cronofy_client_id,
-            "client_secret": os.getenv("CRONOFY_CLIENT_SECRET"),
-            "grant_type": "refresh_token",
-            "refresh_token": refresh_token
-        }
-        
-        headers = {"Content-Type": "application/json"}
-        
-        async with agent.session.post(token_url, headers=headers, json=payload) as response:
-            if response.status == 200:
-                token_data = await response.json()
-                
-                # Get token expiry time (default to 1 hour if not specified)
-                expires_in = token_data.get("expires_in", 3600)
-                token_expiry = datetime.now(pytz.UTC).timestamp() + expires_in
-                
-                # Update the user data with the new token
-                user_data = {
-                    "discord_id": str(user_id),
-                    "access_token": token_data.get("access_token"),
-                    "refresh_token": token_data.get("refresh_token"),
-                    "token_expiry": token_expiry  # Using UTC-based timestamp
-                }
-                
-                # Save updated tokens
-                await agent.db.save_user(user_data)
-                return True
-            else:
-                error_data = await response.text()
-                print(f"Token refresh error: {error_data}")
-                return False
-    except Exception as e:
-        print(f"Exception refreshing token: {e}")
-        return False
-    
-    return False
-
 @bot.command(name="register", help="Connect your Google Calendar to Skedge")
 async def register(ctx):
     """Start the registration process"""
@@ -725,12 +609,11 @@ async def unregister(ctx):
         message = f"{user.mention}, your registration process has been canceled and any existing data has been removed."
     
     # Clean up all user data
-    if user.id in agent.user_database:
-        del agent.user_database[user.id]
     if user.id in agent.registration_states:
         del agent.registration_states[user.id]
     if user.id in agent.oauth_polling:
         del agent.oauth_polling[user.id]
+    agent.token_refresher.forget(user.id)
     
     # Delete from database
     await agent.db.delete_user(str(user.id))
@@ -752,10 +635,62 @@ async def status(ctx):
     else:
         await ctx.send(f"{ctx.author.mention}, your registration is pending. Please complete the process by following the DM instructions.")
 
+@bot.command(name="calendars", help="Choose which calendars count towards your free time")
+async def calendars(ctx, *calendar_ids):
+    """List calendars, or set which ones are used for free/busy"""
+    user_data = await agent.db.get_user(str(ctx.author.id))
+    
+    if not user_data or not user_data.get("access_token"):
+        await ctx.send(f"{ctx.author.mention}, you need to connect your calendar first. Use `!register`.")
+        return
+    
+    # Refresh the token if it has expired (shared with any refresh already in flight)
+    user_data = await agent.token_refresher.ensure_fresh(str(ctx.author.id), user_data)
+    if not user_data:
+        await ctx.send(f"❌ Could not refresh your calendar token. Please `!unregister` and `!register` again.")
+        return
+    
+    status, available = await agent.list_calendars(user_data["access_token"])
+    if status != 200:
+        await ctx.send(f"❌ Could not load your calendars (status {status}).")
+        return
+    
+    if calendar_ids:
+        known = {calendar.get("calendar_id") for calendar in available}
+        if calendar_ids == ("all",):
+            user_data.pop("calendar_ids", None)
+        else:
+            unknown = [calendar_id for calendar_id in calendar_ids if calendar_id not in known]
+            if unknown:
+                await ctx.send(f"❌ Unknown calendar ID(s): {', '.join(unknown)}")
+                return
+            user_data["calendar_ids"] = list(calendar_ids)
+        
+        if not await agent.db.save_user(user_data):
+            await ctx.send("❌ Could not save your calendar selection.")
+            return
+        # Busy blocks cached for the old selection are no longer valid
+        agent.free_busy_cache.invalidate(str(ctx.author.id))
+    
+    selected = set(user_data.get("calendar_ids") or [])
+    lines = [f"📅 **Calendars for {ctx.author.display_name}**"]
+    for calendar in available:
+        used = not selected or calendar.get("calendar_id") in selected
+        lines.append(
+            f"{'✅' if used else '▫️'} {calendar.get('calendar_name', 'Unnamed')} "
+            f"({calendar.get('profile_name', '')}) - `{calendar.get('calendar_id')}`"
+        )
+    lines.append("All calendars are used for free time." if not selected else "Only ✅ calendars are used for free time.")
+    await ctx.send("\n".join(lines))
+
 @bot.event
 async def on_close():
     """Called when the bot is shutting down"""
     print("Bot is shutting down, closing sessions...")
+    if notification_listener:
+        await notification_listener.stop()
+    if metrics_server:
+        await metrics_server.stop()
     await agent.close()
 
 @bot.command(name="users")
@@ -823,127 +758,123 @@ async def list_users(ctx):
     
     await ctx.send(embed=embed)
 
+@bot.command(name="httpstats")
+async def http_stats(ctx):
+    """Show HTTP connection pool reuse per upstream host (admin only)"""
+    if not is_admin(ctx.author):
+        await ctx.send("❌ This command is only available to admins.")
+        return
+    
+    stats = agent.http.get_stats()
+    if not stats:
+        await ctx.send("No upstream requests have been made yet.")
+        return
+    
+    lines = []
+    for host, counts in stats.items():
+        lines.append(
+            f"{host}: {counts['requests']} requests, "
+            f"{counts['new_connections']} new / {counts['reused_connections']} reused connections "
+            f"({counts['reuse_rate']:.0%} reuse)"
+        )
+    await ctx.send("```\n" + "\n".join(lines) + "\n```")
+
 @bot.command(name="dbtest")
 async def db_test(ctx):
     """Test database connection"""
     try:
         user_count = len(await agent.db.get_all_users())
-        await ctx.send(f"✅ Database connection successful. Found {user_count} users.")
+        user_cache = agent.db.cache_stats()["users"]
+        await ctx.send(
+            f"✅ Database connection successful. Found {user_count} users.\n"
+            f"User cache: {user_cache['size']} entries, {user_cache['hits']} hits / "
+            f"{user_cache['misses']} misses ({user_cache['hit_ratio']:.0%} hit ratio)"
+        )
     except Exception as e:
         await ctx.send(f"❌ Database error: {type(e).__name__}: {str(e)}")
 
 # First, let's create a helper function to get a user's free time
-async def get_user_free_periods(user_id, access_token, start_date, end_date, days_ahead):
+async def get_user_free_periods(user_id, access_token, start_date, end_date, days_ahead, calendar_ids=None):
     """Get free time periods for a user"""
-    # Format dates for Cronofy
-    from_str = start_date.strftime("%Y-%m-%dT%H:%M:%SZ")
-    to_str = end_date.strftime("%Y-%m-%dT%H:%M:%SZ")
-    
-    # Get events from Cronofy
-    status, response_text = await agent.cronofy_api_call(
-        endpoint="v1/events",
-        auth_token=access_token,
-        params={
-            "tzid": "UTC",
-            "from": from_str,
-            "to": to_str,
-            "include_managed": "true"
-        }
+    # Get busy blocks from Cronofy (served from the shared free/busy cache when possible)
+    # Free time inside the daily window, in the bot's default timezone
+    display_timezone = pytz.timezone(DEFAULT_TIMEZONE)
+    status, events = await agent.free_busy_cache.get_events(
+        user_id, access_token, start_date, end_date, tz=display_timezone, calendar_ids=calendar_ids
     )
     
     if status != 200:
         print(f"Error getting events for user {user_id}: {status}")
         return []
     
-    # Parse response
-    response_data = json.loads(response_text)
-    events = response_data.get("events", [])
-    
-    # Create a list of busy periods with start and end times
-    busy_periods = []
-    for event in events:
-        try:
-            start_str = event.get("start", "")
-            end_str = event.get("end", "")
-            
-            # Parse ISO times to datetime objects
-            start_time = datetime.fromisoformat(start_str.replace("Z", "+00:00"))
-            end_time = datetime.fromisoformat(end_str.replace("Z", "+00:00"))
-            
-            busy_periods.append((start_time, end_time))
-        except Exception as e:
-            print(f"Error parsing event time: {e}")
-    
-    # Sort busy periods by start time
-    busy_periods.sort(key=lambda x: x[0])
+    return compute_free_periods(
+        busy_periods_from_events(events, display_timezone),
+        start_date,
+        max(days_ahead, 1),
+        display_timezone
+    )
+
+async def load_participant_free_periods(user, user_data, start_date, end_date, days_ahead):
+    """Refresh if needed and fetch free periods for a single participant
     
-    # Calculate free periods between busy periods
-    free_periods = []
+    Returns None if the user isn't registered or their token can't be refreshed.
+    """
+    if not user_data or not user_data.get("access_token"):
+        return None
     
-    # Set time boundaries
-    pacific = pytz.timezone("America/Los_Angeles")
+    # Refresh token if needed
+    user_data = await agent.token_refresher.ensure_fresh(user.id, user_data)
+    if not user_data:
+        return None
+    
+    return await get_user_free_periods(
+        str(user.id),
+        user_data.get("access_token"),
+        start_date,
+        end_date,
+        days_ahead,
+        user_data.get("calendar_ids")
+    )
+
+async def gather_participant_free_periods(participants, start_date, end_date, days_ahead):
+    """Fetch free periods for all participants concurrently
+    
+    All participants are looked up in a single database query. After that at
+    most FINDTIME_CONCURRENCY participants are loaded at once, and each one
+    gets FINDTIME_PARTICIPANT_TIMEOUT seconds. Returns a tuple of
+    (free periods by user id, unregistered mentions, failed mentions).
+    """
+    users_data = await agent.db.get_users([str(user.id) for user in participants])
+    semaphore = asyncio.Semaphore(FINDTIME_CONCURRENCY)
+    
+    async def load(user):
+        async with semaphore, tracing.span("load_participant", user_id=str(user.id)):
+            return await asyncio.wait_for(
+                load_participant_free_periods(
+                    user, users_data.get(str(user.id)), start_date, end_date, days_ahead
+                ),
+                timeout=FINDTIME_PARTICIPANT_TIMEOUT
+            )
     
-    # Get current time in Pacific
-    now = datetime.now(pacific)
+    results = await asyncio.gather(*(load(user) for user in participants), return_exceptions=True)
     
-    # Loop through each day
-    for day_offset in range(days_ahead):
-        # Calculate the day we're looking at
-        target_day = (now + timedelta(days=day_offset)).replace(
-            hour=0, minute=0, second=0, microsecond=0
-        )
-        
-        # For today, start at current time or 6AM, whichever is later
-        if day_offset == 0:
-            current_hour = now.hour
-            current_minute = now.minute
-            
-            if current_hour < 6:
-                time_start = target_day.replace(hour=6, minute=0)
-            else:
-                time_start = now
+    all_free_periods = {}
+    unregistered_users = []
+    failed_users = []
+    
+    for user, result in zip(participants, results):
+        if isinstance(result, asyncio.TimeoutError):
+            print(f"Timed out loading calendar for user {user.id}")
+            failed_users.append(user.mention)
+        elif isinstance(result, Exception):
+            print(f"Error loading calendar for user {user.id}: {result}")
+            failed_users.append(user.mention)
+        elif result is None:
+            unregistered_users.append(user.mention)
         else:
-            # For future days, start at 6AM
-            time_start = target_day.replace(hour=6, minute=0)
-        
-        # End at 9PM
-        time_end = target_day.replace(hour=21, minute=0)
-        
-        # Filter busy periods for this day
-        day_busy_periods = [
-            (s, e) for s, e in busy_periods 
-            if s.date() == target_day.date() or e.date() == target_day.date()
-        ]
-        
-        # If no busy periods for this day, the whole day is free
-        if not day_busy_periods:
-            free_periods.append((time_start, time_end))
-            continue
-        
-        # Calculate free time between busy periods for this day
-        last_end_time = time_start
-        
-        for busy_start, busy_end in day_busy_periods:
-            # Convert to Pacific time for comparison
-            busy_start_local = busy_start.astimezone(pacific)
-            busy_end_local = busy_end.astimezone(pacific)
-            
-            # Skip events outside our 6AM-9PM window
-            if busy_end_local <= time_start or busy_start_local >= time_end:
-                continue
-            
-            # If busy period starts after our last endpoint, we have free time
-            if busy_start_local > last_end_time:
-                free_periods.append((last_end_time, busy_start_local))
-            
-            # Update the last end time, taking the maximum
-            last_end_time = max(last_end_time, busy_end_local)
-        
-        # Add any remaining time at the end of the day
-        if last_end_time < time_end:
-            free_periods.append((last_end_time, time_end))
+            all_free_periods[str(user.id)] = result
     
-    return free_periods
+    return all_free_periods, unregistered_users, failed_users
 
 # Now let's update the find_time command to use this function
 @bot.command(name="findtime", aliases=["schedule", "meet"])
@@ -1035,45 +966,18 @@ async def find_time(ctx, *args):
         await ctx.send("❌ Please mention at least one other user to find meeting times with.")
         return
     
-    # Check that all participants are registered
-    unregistered_users = []
-    participant_tokens = {}
-    
     # Loading message
     loading_msg = await ctx.send(f"🔍 Finding common free time for {len(participants)} participants...")
     
-    # Get tokens for all participants
-    for user in participants:
-        user_data = await agent.db.get_user(str(user.id))
-        if not user_data or not user_data.get("access_token"):
-            unregistered_users.append(user.mention)
-        else:
-            # Handle token expiry
-            token_expiry = user_data.get("token_expiry", 0)
-            current_time = datetime.now(pytz.UTC).timestamp()
-            
-            # Parse token_expiry properly
-            if isinstance(token_expiry, str):
-                try:
-                    token_expiry = float(token_expiry)
-                except ValueError:
-                    try:
-                        expiry_dt = datetime.fromisoformat(token_expiry)
-                        token_expiry = expiry_dt.timestamp()
-                    except Exception:
-                        token_expiry = 0
-            
-            # Refresh token if needed
-            if current_time > token_expiry:
-                refreshed = await refresh_token_for_user(user.id, user_data.get("refresh_token"))
-                if refreshed:
-                    user_data = await agent.db.get_user(str(user.id))
-                else:
-                    unregistered_users.append(user.mention)
-                    continue
-            
-            # Store the access token
-            participant_tokens[str(user.id)] = user_data.get("access_token")
+    # Set start and end dates for the search period
+    now = datetime.now(pytz.timezone(DEFAULT_TIMEZONE))
+    start_date = now
+    end_date = now + timedelta(days=days_ahead)
+    
+    # Look up, refresh and fetch every participant's calendar concurrently
+    all_free_periods, unregistered_users, failed_users = await gather_participant_free_periods(
+        participants, start_date, end_date, days_ahead
+    )
     
     # If any users aren't registered, notify and exit
     if unregistered_users:
@@ -1085,24 +989,18 @@ async def find_time(ctx, *args):
         await loading_msg.delete()
         return
     
-    # Set start and end dates for the search period
-    now = datetime.now(pytz.timezone("America/Los_Angeles"))
-    start_date = now
-    end_date = now + timedelta(days=days_ahead)
+    # Slow or failing calendars are left out instead of stalling the whole command
+    if failed_users:
+        users_list = ", ".join(failed_users)
+        if len(all_free_periods) < 2:
+            await ctx.send(f"❌ Couldn't load calendars for {users_list}. Please try again in a moment.")
+            await loading_msg.delete()
+            return
+        await ctx.send(f"⚠️ Couldn't load calendars for {users_list} in time - showing results for everyone else.")
     
-    # Get free periods for each participant
-    all_free_periods = {}
-    for user in participants:
-        user_id = str(user.id)
-        if user_id in participant_tokens:
-            free_periods = await get_user_free_periods(
-                user_id, 
-                participant_tokens[user_id],
-                start_date,
-                end_date,
-                days_ahead
-            )
-            all_free_periods[user_id] = free_periods
+    # Results only speak for the participants whose calendars were loaded
+    included = [user for user in participants if str(user.id) in all_free_periods]
+    excluded = [user for user in participants if str(user.id) not in all_free_periods]
     
     # Find overlapping free time between all participants
     user_ids = list(all_free_periods.keys())
@@ -1112,68 +1010,30 @@ async def find_time(ctx, *args):
         await ctx.send("❌ No free time found for participants.")
         await loading_msg.delete()
         return
-        
-    common_free_periods = all_free_periods[user_ids[0]]
     
-    # Intersect with each subsequent user's free periods
-    for i in range(1, len(user_ids)):
-        user_id = user_ids[i]
-        user_free_periods = all_free_periods.get(user_id, [])
-        
-        # Calculate intersection with previous common free periods
-        new_common_periods = []
-        
-        for period1 in common_free_periods:
-            for period2 in user_free_periods:
-                # Find overlap between periods
-                overlap_start = max(period1[0], period2[0])
-                overlap_end = min(period1[1], period2[1])
-                
-                # If there's a valid overlap, add it
-                if overlap_start < overlap_end:
-                    # Check if the overlap is long enough
-                    duration = (overlap_end - overlap_start).total_seconds() / 60
-                    if duration >= min_duration:
-                        new_common_periods.append((overlap_start, overlap_end))
-        
-        # Update common free periods
-        common_free_periods = new_common_periods
-        
-        # If no common periods found, exit early
-        if not common_free_periods:
-            break
+    # Intersect all participants' free periods at once; the result is already
+    # filtered by min_duration, sorted and merged
+    free_period_lists = [all_free_periods[user_id] for user_id in user_ids]
+    with tracing.span("intersect", engine=AVAILABILITY_ENGINE, participants=len(free_period_lists)):
+        if AVAILABILITY_ENGINE == "bitset":
+            grid_start = start_date.replace(second=0, microsecond=0)
+            grid_end = max(periods[-1][1] for periods in free_period_lists if periods)
+            merged_periods = find_common_free_periods_bitset(
+                free_period_lists, min_duration, grid_start, grid_end, AVAILABILITY_SLOT_MINUTES
+            )
+        else:
+            merged_periods = find_common_free_periods(free_period_lists, min_duration)
     
     # Format results
-    if not common_free_periods:
-        await ctx.send(f"⛔ No common free time found for all {len(participants)} participants.")
+    if not merged_periods:
+        await ctx.send(f"⛔ No common free time found for all {len(included)} participants.")
         await loading_msg.delete()
         return
     
-    # Sort by start time
-    common_free_periods.sort(key=lambda x: x[0])
-    
-    # Merge adjacent or overlapping periods
-    merged_periods = []
-    if common_free_periods:
-        current_start, current_end = common_free_periods[0]
-        
-        for start, end in common_free_periods[1:]:
-            # If this period starts after current_end (with a small buffer)
-            if start > current_end + timedelta(minutes=5):
-                # Add the current period and start a new one
-                merged_periods.append((current_start, current_end))
-                current_start, current_end = start, end
-            else:
-                # Extend the current period
-                current_end = max(current_end, end)
-        
-        # Add the last period
-        merged_periods.append((current_start, current_end))
-    
     # Create embed for display
     embed = discord.Embed(
         title=f"📅 Common Free Time",
-        description=f"Found times when all {len(participants)} participants are available:",
+        description=f"Found times when all {len(included)} participants are available:",
         color=discord.Color.green()
     )
     
@@ -1213,13 +1073,21 @@ async def find_time(ctx, *args):
         slots_text += slot_text + "\n"
     
     # Add participants field
-    participants_text = "\n".join([f"• {user.display_name}" for user in participants])
+    participants_text = "\n".join([f"• {user.display_name}" for user in included])
     embed.add_field(
         name="Participants",
         value=participants_text,
         inline=False
     )
     
+    # Name anyone whose calendar couldn't be loaded, so nobody reads them as free
+    if excluded:
+        embed.add_field(
+            name="⚠️ Not included (calendar couldn't be loaded)",
+            value="\n".join([f"• {user.display_name}" for user in excluded]),
+            inline=False
+        )
+    
     # Add available slots field
     embed.add_field(
         name="📆 Available Meeting Times",
@@ -1289,9 +1157,13 @@ async def free_time(ctx, username=None, date=None, time=None):
         await ctx.send(f"⚠️ Looking too far ahead! Limited to {max_days_ahead} days maximum.")
         days_to_add = max_days_ahead
     
-    # Calculate dates
-    start_date = datetime.now() + timedelta(days=days_to_add)
-    end_date = start_date + timedelta(days=1)  # Look at just the specified day
+    # Calculate dates in the user's timezone: today starts now, later days at midnight
+    display_timezone = pytz.timezone(user_data.get("timezone", DEFAULT_TIMEZONE))
+    start_date = datetime.now(display_timezone)
+    if days_to_add > 0:
+        start_date = localize(display_timezone, datetime.combine(start_date.date() + timedelta(days=days_to_add), datetime.min.time()))
+    end_date = start_date + timedelta(days=FREE_TIME_DAYS)
+    hours_label = window_label(FREE_TIME_WINDOW_START, FREE_TIME_WINDOW_END)
     
     # Get free/busy directly
     access_token = user_data.get("access_token")
@@ -1300,110 +1172,28 @@ async def free_time(ctx, username=None, date=None, time=None):
     loading_msg = await ctx.send(f"🔍 Finding free time for {target_user.mention}...")
     
     try:
-        # Use the events endpoint for calendar data
-        status, response_text = await agent.cronofy_api_call(
-            endpoint="v1/events",
-            auth_token=access_token,
-            params={
-                "tzid": "UTC",
-                "from": start_date.isoformat(),
-                "to": end_date.isoformat(),
-                "include_managed": "true"
-            }
+        # Use the free/busy endpoint (served from the shared free/busy cache when possible)
+        status, events = await agent.free_busy_cache.get_events(
+            target_user.id, access_token, start_date, end_date, tz=display_timezone,
+            calendar_ids=user_data.get("calendar_ids")
         )
         
         if status == 200:
-            response_data = json.loads(response_text)
-            events = response_data.get("events", [])
-            
-            # Create a list of busy periods with start and end times
-            busy_periods = []
-            for event in events:
-                try:
-                    start_str = event.get("start", "")
-                    end_str = event.get("end", "")
-                    
-                    # Parse ISO times to datetime objects
-                    start_time = datetime.fromisoformat(start_str.replace("Z", "+00:00"))
-                    end_time = datetime.fromisoformat(end_str.replace("Z", "+00:00"))
-                    
-                    busy_periods.append((start_time, end_time))
-                except Exception as e:
-                    print(f"Error parsing event time: {e}")
-            
-            # Sort busy periods by start time
-            busy_periods.sort(key=lambda x: x[0])
-            
-            # Calculate free periods between busy periods
-            free_periods = []
-            
-            # Set time boundaries for the day (9AM to 5PM)
-            pacific = pytz.timezone("America/Los_Angeles")
-            
-            # Start with current time or beginning of day if we're before 9AM
-            current_time = start_date.astimezone(pacific)
-            day_start = current_time.replace(hour=9, minute=0, second=0, microsecond=0)
-            
-            # If it's already past 9AM, use current time as start
-            if current_time.hour >= 9:
-                day_start = current_time
-            
-            # Loop through each of the next 3 days
-            for day_offset in range(3):
-                # Calculate the day we're looking at
-                target_day = (current_time + timedelta(days=day_offset)).replace(
-                    hour=0, minute=0, second=0, microsecond=0
-                )
-                
-                # For today, start at current time or 9AM, whichever is later
-                if day_offset == 0:
-                    time_start = day_start
-                else:
-                    # For future days, start at 9AM
-                    time_start = target_day.replace(hour=6, minute=0)
-                
-                # End at 5PM
-                time_end = target_day.replace(hour=21, minute=0)
-                
-                # Filter busy periods for this day
-                day_busy_periods = [
-                    (s, e) for s, e in busy_periods 
-                    if s.date() == target_day.date() or e.date() == target_day.date()
-                ]
-                
-                # If no busy periods for this day, the whole day is free
-                if not day_busy_periods:
-                    free_periods.append((time_start, time_end))
-                    continue
-                
-                # Calculate free time between busy periods for this day
-                last_end_time = time_start
-                
-                for busy_start, busy_end in day_busy_periods:
-                    # Convert to Pacific time for comparison
-                    busy_start_local = busy_start.astimezone(pacific)
-                    busy_end_local = busy_end.astimezone(pacific)
-                    
-                    # Skip events outside our 9-5 window
-                    if busy_end_local <= time_start or busy_start_local >= time_end:
-                        continue
-                    
-                    # If busy period starts after our last endpoint, we have free time
-                    if busy_start_local > last_end_time:
-                        free_periods.append((last_end_time, busy_start_local))
-                    
-                    # Update the last end time, taking the maximum
-                    last_end_time = max(last_end_time, busy_end_local)
-                
-                # Add any remaining time at the end of the day
-                if last_end_time < time_end:
-                    free_periods.append((last_end_time, time_end))
+            # Free periods inside the daily window for the next few days
+            free_periods = compute_free_periods(
+                busy_periods_from_events(events, display_timezone),
+                start_date,
+                FREE_TIME_DAYS,
+                display_timezone,
+                FREE_TIME_WINDOW_START,
+                FREE_TIME_WINDOW_END
+            )
             
             # Count free time slots
             slot_count = len(free_periods)
             
             if slot_count == 0:
-                await ctx.send(f"❌ No free time found for {target_user.mention} in the next 3 days during business hours (9AM-5PM).")
+                await ctx.send(f"❌ No free time found for {target_user.mention} in the next {FREE_TIME_DAYS} days during business hours ({hours_label}).")
                 await loading_msg.delete()
                 return
                 
@@ -1414,7 +1204,7 @@ async def free_time(ctx, username=None, date=None, time=None):
             )
             
             # Create description with the count
-            embed.description = f"Found {slot_count} free time slots in the next 3 days:"
+            embed.description = f"Found {slot_count} free time slots in the next {FREE_TIME_DAYS} days:"
             
             # Format free time slots for display - match viewcal style
             free_times_text = ""
@@ -1457,7 +1247,7 @@ async def free_time(ctx, username=None, date=None, time=None):
             # Use calendar emoji to match viewcal
             calendar_emoji = "📆"
             embed.add_field(
-                name=f"{calendar_emoji} Available Time Slots (9AM-5PM)",
+                name=f"{calendar_emoji} Available Time Slots ({hours_label})",
                 value=free_times_text if free_times_text else "No qualifying free time slots found.",
                 inline=False
             )
@@ -1465,7 +1255,7 @@ async def free_time(ctx, username=None, date=None, time=None):
             await ctx.send(embed=embed)
             
         else:
-            await ctx.send(f"❌ Error checking calendar: {status} - {response_text[:100]}")
+            await ctx.send(f"❌ Error checking calendar: {status}")
     except Exception as e:
         await ctx.send(f"❌ Error finding free time: {str(e)}")
         print(f"Free time error: {e}")
@@ -0,0 +1,69 @@
+import time
+from collections import OrderedDict
+
+# Marker for "looked up, but doesn't exist" entries
+MISSING = object()
+
+
+class TTLCache:
+    """Small in-process LRU cache whose entries expire after a TTL.
+
+    get() returns MISSING on a miss so that None can be cached as a
+    negative result (e.g. an unregistered user).
+    """
+
+    def __init__(self, maxsize=1024, ttl=300, negative_ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.entries = OrderedDict()
+
+        # Counters for cache_stats()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """Return the cached value for key, or MISSING if absent or expired"""
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return MISSING
+
+        value, expires_at = entry
+        if expires_at <= time.monotonic():
+            del self.entries[key]
+            self.misses += 1
+            return MISSING
+
+        # Mark as most recently used
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key, value):
+        """Store a value; None is stored as a negative entry with negative_ttl"""
+        ttl = self.negative_ttl if value is None else self.ttl
+        self.entries[key] = (value, time.monotonic() + ttl)
+        self.entries.move_to_end(key)
+
+        # Evict least recently used entries
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def invalidate(self, key):
+        """Drop a single key"""
+        self.entries.pop(key, None)
+
+    def clear(self):
+        """Drop everything"""
+        self.entries.clear()
+
+    def stats(self):
+        """Return hit/miss counters and the current size"""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0
+        }
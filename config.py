@@ -0,0 +1,58 @@
+import os
+import logging
+import threading
+from dotenv import load_dotenv
+
+# All Skedge settings live under this AWS Parameter Store path
+PARAMETER_PATH = "/schedge/"
+AWS_REGION = os.environ.get("AWS_REGION", "us-east-1")
+
+# Parameters loaded once per process
+_parameters = None
+_lock = threading.Lock()
+
+
+def _load_ssm_parameters():
+    """Fetch every /schedge/* parameter with one paginated by-path call"""
+    try:
+        import boto3
+    except ImportError:
+        logging.info("boto3 not available, using local environment")
+        return {}
+
+    try:
+        ssm = boto3.client('ssm', region_name=AWS_REGION)
+        paginator = ssm.get_paginator('get_parameters_by_path')
+
+        parameters = {}
+        for page in paginator.paginate(Path=PARAMETER_PATH, Recursive=True, WithDecryption=True):
+            for parameter in page.get('Parameters', []):
+                parameters[parameter['Name'][len(PARAMETER_PATH):]] = parameter['Value']
+
+        logging.info(f"Loaded {len(parameters)} parameters from AWS Parameter Store")
+        return parameters
+    except Exception as e:
+        logging.warning(f"Could not load parameters from AWS, using local environment: {e}")
+        return {}
+
+
+def load_config(reload=False):
+    """Load configuration from AWS Parameter Store and .env (cached after the first call)"""
+    global _parameters
+
+    with _lock:
+        if _parameters is None or reload:
+            # Local .env values back up anything missing from Parameter Store
+            if os.path.exists('.env'):
+                load_dotenv()
+            _parameters = _load_ssm_parameters()
+
+    return _parameters
+
+
+def get_env_variable(var_name, default=None):
+    """Get a setting from Parameter Store, falling back to the environment"""
+    parameters = load_config()
+    if var_name in parameters:
+        return parameters[var_name]
+    return os.environ.get(var_name, default)
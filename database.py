@@ -1,40 +1,42 @@
-import os
 import json
 from datetime import datetime
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, List
 from supabase import create_client
 import asyncio
-from dotenv import load_dotenv
+from config import get_env_variable
 import uuid
-import logging
+from cache import TTLCache, MISSING
+from recorder import get_recorder
+from metrics import track_upstream
+from token_refresher import parse_token_expiry
+import tracing
 
-def get_env_variable(var_name):
-    # First try AWS Parameter Store if boto3 is available
-    try:
-        import boto3
-        ssm = boto3.client('ssm', region_name='us-east-1')  # Change region as needed
-        try:
-            response = ssm.get_parameter(Name=f'/schedge/{var_name}', WithDecryption=True)
-            return response['Parameter']['Value']
-        except Exception as e:
-            logging.warning(f"Could not get parameter from AWS: {e}")
-    except ImportError:
-        logging.info("boto3 not available, using local environment")
-    
-    # Fall back to local .env file
-    if os.path.exists('.env'):
-        load_dotenv()
-    return os.environ.get(var_name)
+# Columns of the users table; anything else in user_data goes into the "data" JSON column
+USER_COLUMNS = ["discord_id", "discord_name", "auth_code", "access_token", "refresh_token", "email", "token_expiry"]
+# Set by Supabase, or the JSON column itself when a row from get_user() is saved back
+ROW_ONLY_KEYS = ["data", "id", "created_at", "updated_at"]
 
 class Database:
     """Database class using Supabase as the backend."""
     
-    def __init__(self):
+    def __init__(self, cache_size: int = 1024, cache_ttl: int = 300, negative_cache_ttl: int = 60):
         """Initialize Supabase connection."""
+        # Read-through cache of user rows; unregistered users are cached as None
+        self.user_cache = TTLCache(cache_size, cache_ttl, negative_cache_ttl)
+        # Separate single-entry cache for get_all_users
+        self.all_users_cache = TTLCache(1, cache_ttl, negative_cache_ttl)
+        
         self.supabase_url = get_env_variable("SUPABASE_URL")
         self.supabase_key = get_env_variable("SUPABASE_KEY")
         
-        if not self.supabase_url or not self.supabase_key:
+        # Optional capture/replay of queries (off unless configured)
+        self.recorder = get_recorder()
+        
+        if self.recorder.replaying:
+            # Queries are answered from the recording, so no real client is needed
+            print("Supabase queries will be replayed from recordings")
+            self.client = self.recorder
+        elif not self.supabase_url or not self.supabase_key:
             print(f"ERROR: Supabase credentials not found in environment variables.")
             print(f"Looking for: SUPABASE_URL and SUPABASE_KEY")
             print(f"URL found: {'Yes' if self.supabase_url else 'No'}")
@@ -54,10 +56,29 @@ class Database:
         print("Using Supabase - tables should be created in the Supabase dashboard")
         pass
     
-    async def _run_sync(self, func):
-        """Run a synchronous function in an executor to make it async-compatible"""
+    def cache_stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters for the user caches."""
+        return {
+            "users": self.user_cache.stats(),
+            "all_users": self.all_users_cache.stats()
+        }
+    
+    def _invalidate_user(self, discord_id: str):
+        """Drop a user from the caches after a write."""
+        self.user_cache.invalidate(str(discord_id))
+        self.all_users_cache.clear()
+    
+    async def _run_sync(self, func, operation, params=None):
+        """Run a synchronous function in an executor to make it async-compatible
+        
+        operation and params describe the query for the upstream recorder.
+        """
         loop = asyncio.get_event_loop()
-        return await loop.run_in_executor(None, func) 
+        with track_upstream("supabase", operation), tracing.span(f"supabase {operation}"):
+            return await self.recorder.run_db(
+                operation, params,
+                lambda: loop.run_in_executor(None, func)
+            )
     
     async def save_user(self, user_data: Dict[str, Any]) -> bool:
         """Save user data to Supabase."""
@@ -78,14 +99,12 @@ class Database:
                 "access_token": user_data.get("access_token", ""),
                 "refresh_token": user_data.get("refresh_token", ""),
                 "email": user_data.get("email", ""),
-                # Convert timestamp to ISO string if it exists
-                "token_expiry": datetime.fromtimestamp(user_data.get("token_expiry", 0)).isoformat() 
+                # Convert timestamp (or an ISO string read back from get_user) to ISO string if it exists
+                "token_expiry": datetime.fromtimestamp(parse_token_expiry(user_data.get("token_expiry"))).isoformat() 
                 if user_data.get("token_expiry") else None,
                 # Store additional data as JSON
                 "data": json.dumps({k: v for k, v in user_data.items() 
-                                if k not in ["discord_id", "discord_name", "auth_code", 
-                                             "access_token", "refresh_token", "email", 
-                                             "token_expiry"]})
+                                if k not in USER_COLUMNS + ROW_ONLY_KEYS})
             }
             
             # Define a regular function (not async!)
@@ -93,12 +112,13 @@ class Database:
                 return self.client.table("users").upsert(insert_data).execute()
             
             # Call _run_sync with the function object
-            response = await self._run_sync(_do_upsert)
+            response = await self._run_sync(_do_upsert, "upsert", insert_data)
             
             if hasattr(response, 'error') and response.error:
                 print(f"Error saving user: {response.error}")
                 return False
                 
+            self._invalidate_user(discord_id)
             print(f"User saved successfully: {discord_id}")
             return True
             
@@ -107,10 +127,16 @@ class Database:
             return False
     
     async def get_user(self, discord_id: str) -> Optional[Dict[str, Any]]:
-        """Get user data from Supabase."""
+        """Get user data from Supabase (served from cache when fresh)."""
         if not self.client:
             print("Supabase client not initialized - cannot get user data")
             return None
+        
+        discord_id = str(discord_id)
+        cached = self.user_cache.get(discord_id)
+        if cached is not MISSING:
+            # Hand out a copy so callers can't mutate the cached row
+            return dict(cached) if cached is not None else None
             
         try:
             # Define a regular function to pass to run_sync
@@ -118,7 +144,7 @@ class Database:
                 return self.client.table("users").select("*").eq("discord_id", discord_id).execute()
             
             # Run the synchronous function in an executor
-            response = await self._run_sync(_do_select)
+            response = await self._run_sync(_do_select, "select", {"discord_id": discord_id})
             
             if hasattr(response, 'error') and response.error:
                 print(f"Error getting user: {response.error}")
@@ -127,6 +153,8 @@ class Database:
             data = response.data
             
             if not data or len(data) == 0:
+                # Negative cache so unregistered users don't hit Supabase every time
+                self.user_cache.set(discord_id, None)
                 return None
                 
             user_data = data[0]
@@ -138,13 +166,68 @@ class Database:
                     user_data.update(extra_data)
                 except:
                     pass
-                    
-            return user_data
+            
+            self.user_cache.set(discord_id, user_data)
+            return dict(user_data)
             
         except Exception as e:
             print(f"Error getting user from Supabase: {e}")
             return None
     
+    async def get_users(self, discord_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Get several users from Supabase in one query, keyed by discord_id."""
+        if not self.client:
+            print("Supabase client not initialized - cannot get user data")
+            return {}
+        
+        # Deduplicate while keeping the request small
+        discord_ids = list(dict.fromkeys(str(discord_id) for discord_id in discord_ids))
+        
+        # Serve what we can from the cache and only query the rest
+        users = {}
+        missing_ids = []
+        for discord_id in discord_ids:
+            cached = self.user_cache.get(discord_id)
+            if cached is MISSING:
+                missing_ids.append(discord_id)
+            elif cached is not None:
+                users[discord_id] = dict(cached)
+        
+        if not missing_ids:
+            return users
+            
+        try:
+            def _do_select_in():
+                return self.client.table("users").select("*").in_("discord_id", missing_ids).execute()
+            
+            response = await self._run_sync(_do_select_in, "select_in", {"discord_id": missing_ids})
+            
+            if hasattr(response, 'error') and response.error:
+                print(f"Error getting users: {response.error}")
+                return users
+            
+            # Decode every row's extra data in a single pass
+            for user_data in response.data or []:
+                if user_data.get("data"):
+                    try:
+                        user_data.update(json.loads(user_data["data"]))
+                    except:
+                        pass
+                discord_id = str(user_data.get("discord_id"))
+                self.user_cache.set(discord_id, user_data)
+                users[discord_id] = dict(user_data)
+            
+            # Remember the ids that aren't registered
+            for discord_id in missing_ids:
+                if discord_id not in users:
+                    self.user_cache.set(discord_id, None)
+            
+            return users
+            
+        except Exception as e:
+            print(f"Error getting users from Supabase: {e}")
+            return users
+    
     async def delete_user(self, discord_id: str) -> bool:
         """Delete user from Supabase."""
         if not self.client:
@@ -155,12 +238,14 @@ class Database:
             def _do_delete():
                 return self.client.table("users").delete().eq("discord_id", discord_id).execute()
             
-            response = await self._run_sync(_do_delete)
+            response = await self._run_sync(_do_delete, "delete", {"discord_id": discord_id})
             
             if hasattr(response, 'error') and response.error:
                 print(f"Error deleting user: {response.error}")
                 return False
-                
+            
+            self._invalidate_user(discord_id)
+            self.user_cache.set(str(discord_id), None)
             return True
             
         except Exception as e:
@@ -172,12 +257,16 @@ class Database:
         if not self.client:
             print("Supabase client not initialized - cannot get users")
             return []
+        
+        cached = self.all_users_cache.get("all")
+        if cached is not MISSING:
+            return [dict(user) for user in cached]
             
         try:
             def _do_select_all():
                 return self.client.table("users").select("*").execute()
             
-            response = await self._run_sync(_do_select_all)
+            response = await self._run_sync(_do_select_all, "select_all")
             
             if hasattr(response, 'error') and response.error:
                 print(f"Error getting all users: {response.error}")
@@ -193,8 +282,11 @@ class Database:
                         user.update(extra_data)
                     except:
                         pass
+                # Warm the per-user cache as well
+                self.user_cache.set(str(user.get("discord_id")), user)
             
-            return users
+            self.all_users_cache.set("all", users)
+            return [dict(user) for user in users]
             
         except Exception as e:
             print(f"Error getting all users from Supabase: {e}")
@@ -0,0 +1,185 @@
+import asyncio
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+DAY = 86400
+
+
+class _UserEvents:
+    """Cached coverage and events for one user"""
+
+    def __init__(self):
+        # Sorted, non-overlapping [start, end, fetched_at] ranges we hold events for
+        self.segments = []
+        # event uid -> Event
+        self.events = {}
+        # Background revalidation currently running for this user
+        self.revalidating = None
+
+
+class EventCache:
+    """Per-user Cronofy event cache keyed by time range.
+
+    Any sub-range of an already fetched range is answered from memory; only
+    the uncovered gaps are fetched (aligned to whole UTC days). Ranges older
+    than `ttl` are still served but refreshed in the background
+    (stale-while-revalidate); ranges older than `stale_ttl` are refetched.
+
+    `fetch(access_token, start, end, **fetch_options)` must return
+    (status, events) where events are parsed events.Event records.
+    """
+
+    def __init__(self, fetch, ttl=120, stale_ttl=900, max_users=512):
+        self.fetch = fetch
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_users = max_users
+        self.users = OrderedDict()
+
+        # Counters for stats()
+        self.hits = 0
+        self.misses = 0
+
+    def _entry(self, discord_id):
+        entry = self.users.get(discord_id)
+        if entry is None:
+            entry = self.users[discord_id] = _UserEvents()
+            while len(self.users) > self.max_users:
+                self.users.popitem(last=False)
+        self.users.move_to_end(discord_id)
+        return entry
+
+    def _gaps(self, entry, start, end, now):
+        """Split [start, end) into parts not covered, and parts covered by stale data"""
+        missing = []
+        stale = []
+        cursor = start
+
+        for seg_start, seg_end, fetched_at in entry.segments:
+            if seg_end <= cursor or now - fetched_at >= self.stale_ttl:
+                continue
+            if seg_start >= end:
+                break
+            if seg_start > cursor:
+                missing.append((cursor, seg_start))
+            if now - fetched_at >= self.ttl:
+                stale.append((max(cursor, seg_start), min(end, seg_end)))
+            cursor = max(cursor, seg_end)
+            if cursor >= end:
+                break
+
+        if cursor < end:
+            missing.append((cursor, end))
+        return missing, stale
+
+    def _store(self, entry, start, end, events, fetched_at):
+        """Replace everything we know about [start, end) with a fresh fetch"""
+        # Drop events in the range; the fetch is authoritative for it
+        for uid, event in list(entry.events.items()):
+            if event.start < end and event.end > start:
+                del entry.events[uid]
+
+        for event in events:
+            entry.events[event.uid] = event
+
+        # Cut the fetched range out of the old segments and insert it
+        segments = []
+        for seg_start, seg_end, seg_fetched in entry.segments:
+            if seg_end <= start or seg_start >= end:
+                segments.append([seg_start, seg_end, seg_fetched])
+                continue
+            if seg_start < start:
+                segments.append([seg_start, start, seg_fetched])
+            if seg_end > end:
+                segments.append([end, seg_end, seg_fetched])
+        segments.append([start, end, fetched_at])
+        segments.sort()
+        entry.segments = segments
+
+    async def _fetch_ranges(self, entry, access_token, ranges, fetch_options):
+        """Fetch several ranges concurrently; returns the first error status or 200"""
+        async def fetch_one(range_start, range_end):
+            status, events = await self.fetch(
+                access_token,
+                datetime.fromtimestamp(range_start, timezone.utc),
+                datetime.fromtimestamp(range_end, timezone.utc),
+                **fetch_options
+            )
+            if status == 200:
+                self._store(entry, range_start, range_end, events, time.monotonic())
+            return status
+
+        statuses = await asyncio.gather(*(fetch_one(s, e) for s, e in ranges))
+        return next((status for status in statuses if status != 200), 200)
+
+    def _revalidate(self, entry, access_token, ranges, fetch_options):
+        """Refresh stale ranges in the background (one job per user at a time)"""
+        if entry.revalidating is not None and not entry.revalidating.done():
+            return
+
+        async def run():
+            try:
+                await self._fetch_ranges(entry, access_token, ranges, fetch_options)
+            except Exception as e:
+                print(f"Error revalidating cached events: {e}")
+
+        entry.revalidating = asyncio.ensure_future(run())
+
+    async def get_events(self, discord_id, access_token, start, end, tz=None, **fetch_options):
+        """Return (status, Events) for events overlapping [start, end)
+
+        All-day events are matched on the day they fall on in `tz` (by
+        default start's timezone). fetch_options (e.g. calendar_ids) are
+        passed through to fetch and should stay the same for a given user.
+        """
+        discord_id = str(discord_id)
+        entry = self._entry(discord_id)
+        tz = tz or start.tzinfo or timezone.utc
+
+        # Align to whole UTC days so later sub-range requests are covered.
+        # All-day events are stored on their UTC date, which can be a day
+        # either side of the local day, so one more day is fetched each way.
+        range_start = start.timestamp() // DAY * DAY - DAY
+        range_end = -(-end.timestamp() // DAY) * DAY + DAY
+        now = time.monotonic()
+
+        missing, stale = self._gaps(entry, range_start, range_end, now)
+
+        if missing:
+            self.misses += 1
+            status = await self._fetch_ranges(entry, access_token, missing, fetch_options)
+            if status != 200:
+                return status, []
+        else:
+            self.hits += 1
+
+        if stale:
+            self._revalidate(entry, access_token, stale, fetch_options)
+
+        start_ts = start.timestamp()
+        end_ts = end.timestamp()
+
+        def overlaps(event):
+            event_start, event_end = event.local_bounds(tz)
+            return event_start < end_ts and event_end > start_ts
+
+        events = sorted(
+            (event for event in entry.events.values() if overlaps(event)),
+            key=lambda event: event.start
+        )
+        return 200, events
+
+    def invalidate(self, discord_id):
+        """Forget everything cached for a user"""
+        self.users.pop(str(discord_id), None)
+
+    def stats(self):
+        """Return hit/miss counters and how many users are cached"""
+        lookups = self.hits + self.misses
+        return {
+            "users": len(self.users),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0
+        }
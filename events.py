@@ -0,0 +1,146 @@
+import json
+from array import array
+from datetime import datetime, timezone
+
+# Use a faster JSON decoder when one is installed
+try:
+    import orjson
+
+    def loads(data):
+        return orjson.loads(data)
+except ImportError:
+    def loads(data):
+        return json.loads(data)
+
+
+class Event:
+    """Compact calendar event parsed once from a Cronofy response.
+
+    start and end are epoch seconds. All-day events (plain dates) are stored
+    as UTC midnights with all_day set; use local_bounds() to place them in a
+    user's timezone.
+    """
+
+    __slots__ = ("uid", "summary", "start", "end", "all_day", "transparent")
+
+    def __init__(self, uid, summary, start, end, all_day=False, transparent=False):
+        self.uid = uid
+        self.summary = summary
+        self.start = start
+        self.end = end
+        self.all_day = all_day
+        self.transparent = transparent
+
+    def __repr__(self):
+        return f"Event({self.summary!r}, {self.start}, {self.end}, all_day={self.all_day})"
+
+    def local_bounds(self, tz):
+        """Epoch (start, end) with all-day events moved to midnights in tz"""
+        if not self.all_day:
+            return self.start, self.end
+        return _local_midnight(self.start, tz), _local_midnight(self.end, tz)
+
+
+def _local_midnight(utc_midnight, tz):
+    """Same calendar date as a UTC midnight, but at midnight in tz"""
+    day = datetime.fromtimestamp(utc_midnight, timezone.utc).replace(tzinfo=None)
+    if hasattr(tz, "localize"):
+        return int(tz.localize(day).timestamp())
+    return int(day.replace(tzinfo=tz).timestamp())
+
+
+def _parse_time(value):
+    """Parse a Cronofy time value; returns (epoch seconds, is_all_day)"""
+    if isinstance(value, dict):
+        # Cronofy can return {"time": ..., "tzid": ...} objects
+        value = value.get("time", "")
+    if "T" in value:
+        moment = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        if moment.tzinfo is None:
+            moment = moment.replace(tzinfo=timezone.utc)
+        return int(moment.timestamp()), False
+    return int(datetime.fromisoformat(value).replace(tzinfo=timezone.utc).timestamp()), True
+
+
+def parse_event(raw):
+    """Build an Event from one Cronofy event dict"""
+    start, all_day = _parse_time(raw.get("start", ""))
+    end, _ = _parse_time(raw.get("end", ""))
+    uid = raw.get("event_uid") or (raw.get("calendar_id"), raw.get("event_id"), start, raw.get("summary"))
+    return Event(
+        uid,
+        raw.get("summary") or "Untitled Event",
+        start,
+        end,
+        all_day,
+        raw.get("transparency") == "transparent"
+    )
+
+
+def parse_events(payload):
+    """Parse a Cronofy v1/events response (text, bytes or decoded dict) into Events"""
+    data = loads(payload) if isinstance(payload, (str, bytes)) else payload
+    events = []
+    for raw in data.get("events", []):
+        try:
+            events.append(parse_event(raw))
+        except Exception as e:
+            print(f"Error parsing event: {e}")
+    return events
+
+
+def parse_free_busy(payload):
+    """Parse a Cronofy v1/free_busy response into Events (one per busy block)
+
+    Blocks marked "free" are kept as transparent so they never count as busy.
+    """
+    data = loads(payload) if isinstance(payload, (str, bytes)) else payload
+    events = []
+    for raw in data.get("free_busy", []):
+        try:
+            start, all_day = _parse_time(raw.get("start", ""))
+            end, _ = _parse_time(raw.get("end", ""))
+        except Exception as e:
+            print(f"Error parsing free/busy block: {e}")
+            continue
+        status = raw.get("free_busy_status", "busy")
+        events.append(Event(
+            (raw.get("calendar_id"), start, end, status),
+            status.capitalize(),
+            start,
+            end,
+            all_day,
+            status == "free"
+        ))
+    return events
+
+
+class EventColumns:
+    """Columnar start/end epoch arrays for large calendars
+
+    Iterating yields (start, end) pairs, so it can stand in for a list of
+    busy periods.
+    """
+
+    __slots__ = ("starts", "ends")
+
+    def __init__(self, starts=None, ends=None):
+        self.starts = starts if starts is not None else array("q")
+        self.ends = ends if ends is not None else array("q")
+
+    @classmethod
+    def from_events(cls, events, tz, include_transparent=False):
+        columns = cls()
+        for event in events:
+            if event.transparent and not include_transparent:
+                continue
+            start, end = event.local_bounds(tz)
+            columns.starts.append(start)
+            columns.ends.append(end)
+        return columns
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __iter__(self):
+        return zip(self.starts, self.ends)
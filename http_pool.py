@@ -0,0 +1,153 @@
+import asyncio
+import aiohttp
+from urllib.parse import urlsplit
+
+from recorder import get_recorder
+from metrics import track_upstream, upstream_labels
+import tracing
+
+
+class _TrackedRequest:
+    """`async with` wrapper that reports a request's latency and status to metrics"""
+
+    def __init__(self, request, tracker, span):
+        self.request = request
+        self.tracker = tracker
+        self.span = span
+
+    async def __aenter__(self):
+        self.tracker.__enter__()
+        self.span.__enter__()
+        try:
+            response = await self.request.__aenter__()
+        except BaseException as e:
+            self.span.__exit__(type(e), e, None)
+            self.tracker.__exit__(type(e), e, None)
+            raise
+        self.span.set(status=response.status)
+        if response.status >= 400:
+            self.tracker.fail(str(response.status))
+            self.span.fail(response.status)
+        return response
+
+    async def __aexit__(self, exc_type, exc, tb):
+        try:
+            return await self.request.__aexit__(exc_type, exc, tb)
+        finally:
+            self.span.__exit__(exc_type, exc, tb)
+            self.tracker.__exit__(exc_type, exc, tb)
+
+
+class HttpPool:
+    """Shared keep-alive HTTP sessions for all upstream traffic, one per host.
+
+    Every Cronofy, Mistral and OAuth call goes through request() so TCP+TLS
+    connections are reused instead of being set up again for each call.
+    """
+
+    def __init__(self, limit_per_host=20, dns_ttl=300, keepalive_timeout=60, timeout=30, recorder=None):
+        self.limit_per_host = limit_per_host
+        self.dns_ttl = dns_ttl
+        self.keepalive_timeout = keepalive_timeout
+        self.timeout = timeout
+
+        # One session (and connection pool) per scheme://host
+        self.sessions = {}
+
+        # Per-host counters used to report connection reuse
+        self.stats = {}
+        
+        # Optional capture/replay of upstream traffic (off unless configured)
+        self.recorder = recorder or get_recorder()
+
+    @staticmethod
+    def host_key(url):
+        """Return the scheme://host[:port] part of a URL"""
+        parts = urlsplit(url)
+        return f"{parts.scheme}://{parts.netloc}"
+
+    def _host_stats(self, host):
+        if host not in self.stats:
+            self.stats[host] = {"requests": 0, "new_connections": 0, "reused_connections": 0}
+        return self.stats[host]
+
+    def _trace_config(self, host):
+        """Count new vs reused connections for a host"""
+        trace_config = aiohttp.TraceConfig()
+
+        async def on_create(session, context, params):
+            self._host_stats(host)["new_connections"] += 1
+
+        async def on_reuse(session, context, params):
+            self._host_stats(host)["reused_connections"] += 1
+
+        trace_config.on_connection_create_end.append(on_create)
+        trace_config.on_connection_reuseconn.append(on_reuse)
+        return trace_config
+
+    def session_for(self, url):
+        """Get (or lazily create) the pooled session for a URL's host"""
+        host = self.host_key(url)
+        session = self.sessions.get(host)
+
+        if session is None or session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit_per_host,
+                limit_per_host=self.limit_per_host,
+                ttl_dns_cache=self.dns_ttl,
+                keepalive_timeout=self.keepalive_timeout
+            )
+            session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                trace_configs=[self._trace_config(host)]
+            )
+            self.sessions[host] = session
+
+        return session
+
+    def request(self, method, url, **kwargs):
+        """Start a request on the pooled session; use with `async with`"""
+        self._host_stats(self.host_key(url))["requests"] += 1
+        request = self.recorder.wrap_http(
+            method, url, kwargs,
+            lambda: self.session_for(url).request(method, url, **kwargs)
+        )
+        service, operation = upstream_labels(url)
+        return _TrackedRequest(
+            request,
+            track_upstream(service, operation),
+            tracing.span(f"{service} {method} {operation}")
+        )
+
+    async def warm_up(self, urls):
+        """Open a connection to each URL's host ahead of the first real call"""
+        if self.recorder.replaying:
+            return
+        
+        async def touch(url):
+            try:
+                # Straight to the session: a warm-up isn't upstream traffic for metrics or traces
+                async with self.session_for(url).request("HEAD", url) as response:
+                    await response.read()
+            except Exception as e:
+                print(f"Could not warm up connection to {self.host_key(url)}: {e}")
+
+        await asyncio.gather(*(touch(url) for url in urls))
+        print(f"Warmed up HTTP pool for {len(urls)} hosts")
+
+    def get_stats(self):
+        """Return per-host request counts and connection reuse rates"""
+        report = {}
+        for host, counts in self.stats.items():
+            connections = counts["new_connections"] + counts["reused_connections"]
+            report[host] = dict(counts)
+            report[host]["reuse_rate"] = counts["reused_connections"] / connections if connections else 0.0
+        return report
+
+    async def close(self):
+        """Close every pooled session"""
+        for session in self.sessions.values():
+            if not session.closed:
+                await session.close()
+        self.sessions = {}
@@ -0,0 +1,131 @@
+import json
+import math
+import os
+import re
+from collections import Counter, defaultdict
+
+from config import get_env_variable
+
+EXAMPLES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "intent_examples.json")
+
+# Mentions all look alike to the classifier; numbers too ("30 min", "3 days")
+_MENTION = re.compile(r"<@!?\w+>")
+_TOKEN = re.compile(r"[a-z]+(?:'[a-z]+)?|\d+")
+
+
+def tokenize(text):
+    """Words plus word bigrams of a message"""
+    words = []
+    for token in _TOKEN.findall(_MENTION.sub(" mention ", text.lower())):
+        words.append("<num>" if token.isdigit() else token)
+    return words + [f"{first} {second}" for first, second in zip(words, words[1:])]
+
+
+def _normalize(vector):
+    norm = math.sqrt(sum(weight * weight for weight in vector.values()))
+    if not norm:
+        return {}
+    return {term: weight / norm for term, weight in vector.items()}
+
+
+class IntentClassifier:
+    """TF-IDF nearest-centroid classifier over a small labeled example set
+
+    Each intent is the normalized mean of its examples' TF-IDF vectors, and a
+    message gets the intent whose centroid has the highest cosine similarity.
+    predict() only answers when that similarity clears `threshold` and beats
+    the runner-up by `margin`; otherwise the caller should ask Mistral.
+    """
+
+    def __init__(self, examples, threshold=0.3, margin=0.1):
+        self.threshold = threshold
+        self.margin = margin
+        self.intents = sorted(examples)
+        self.stats = {"local": 0, "fallback": 0}
+
+        documents = [(intent, Counter(tokenize(text))) for intent in self.intents for text in examples[intent]]
+        document_frequency = Counter(term for _, terms in documents for term in terms)
+        total = len(documents)
+        self.idf = {
+            term: math.log((1 + total) / (1 + count)) + 1
+            for term, count in document_frequency.items()
+        }
+
+        sums = defaultdict(lambda: defaultdict(float))
+        for intent, terms in documents:
+            for term, weight in self._vector(terms).items():
+                sums[intent][term] += weight
+
+        # Inverted index: term -> [(intent, centroid weight)], so scoring a
+        # message only touches the terms it contains
+        self.index = defaultdict(list)
+        for intent in self.intents:
+            for term, weight in _normalize(sums[intent]).items():
+                self.index[term].append((intent, weight))
+
+    def _vector(self, terms):
+        """Normalized TF-IDF vector for term counts; unseen terms are dropped"""
+        return _normalize({
+            term: (1 + math.log(count)) * self.idf[term]
+            for term, count in terms.items() if term in self.idf
+        })
+
+    def scores(self, text):
+        """Cosine similarity of a message with every intent"""
+        scores = dict.fromkeys(self.intents, 0.0)
+        for term, weight in self._vector(Counter(tokenize(text))).items():
+            for intent, centroid_weight in self.index[term]:
+                scores[intent] += weight * centroid_weight
+        return scores
+
+    def classify(self, text):
+        """(best intent, similarity, margin over the runner-up)"""
+        ranked = sorted(self.scores(text).items(), key=lambda item: item[1], reverse=True) + [(None, 0.0)] * 2
+        (intent, best), (_, second) = ranked[0], ranked[1]
+        return intent, best, best - second
+
+    def predict(self, text):
+        """Intent if confident enough, or None to fall back to Mistral"""
+        intent, confidence, margin = self.classify(text)
+        if confidence >= self.threshold and margin >= self.margin:
+            self.stats["local"] += 1
+            return intent, confidence
+        self.stats["fallback"] += 1
+        return None, confidence
+
+    @property
+    def llm_calls_avoided(self):
+        return self.stats["local"]
+
+
+def load_examples(path=EXAMPLES_PATH):
+    """{intent: [example messages]} from the bundled JSON file"""
+    with open(path) as f:
+        return json.load(f)
+
+
+_classifier = None
+
+
+def get_classifier():
+    """Process-wide classifier; INTENT_CONFIDENCE <= 0 switches it off"""
+    global _classifier
+    if _classifier is None:
+        try:
+            threshold = float(get_env_variable('INTENT_CONFIDENCE', 0.3))
+            margin = float(get_env_variable('INTENT_MARGIN', 0.1))
+        except ValueError:
+            print("Invalid INTENT_CONFIDENCE / INTENT_MARGIN, using defaults")
+            threshold, margin = 0.3, 0.1
+        if threshold <= 0:
+            # Never confident, so every message still goes to Mistral
+            threshold = float("inf")
+
+        path = get_env_variable('INTENT_EXAMPLES_PATH', EXAMPLES_PATH)
+        try:
+            examples = load_examples(path)
+        except (OSError, ValueError) as e:
+            print(f"Could not load intent examples from {path}: {e}")
+            examples = {}
+        _classifier = IntentClassifier(examples, threshold, margin)
+    return _classifier
@@ -0,0 +1,79 @@
+import heapq
+from datetime import timedelta
+
+# Adjacent common windows closer than this are merged into a single slot
+DEFAULT_MERGE_GAP = timedelta(minutes=5)
+
+
+def _coalesce(periods):
+    """Yield one user's sorted free periods with overlapping/touching ones joined"""
+    current_start = current_end = None
+
+    for start, end in periods:
+        if start >= end:
+            continue
+
+        if current_start is None:
+            current_start, current_end = start, end
+        elif start <= current_end:
+            current_end = max(current_end, end)
+        else:
+            yield current_start, current_end
+            current_start, current_end = start, end
+
+    if current_start is not None:
+        yield current_start, current_end
+
+
+def _boundaries(periods):
+    """Turn one user's free periods into (time, delta) sweep events"""
+    for start, end in _coalesce(periods):
+        # Ends sort before starts at the same instant (-1 < +1), so back-to-back
+        # periods from different users never produce a zero-length window
+        yield start, 1
+        yield end, -1
+
+
+def merge_periods(periods, merge_gap=DEFAULT_MERGE_GAP):
+    """Merge sorted periods that overlap or are separated by at most merge_gap"""
+    merged = []
+
+    for start, end in periods:
+        if merged and start <= merged[-1][1] + merge_gap:
+            # Extend the current period
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+
+    return merged
+
+
+def find_common_free_periods(free_period_lists, min_duration, merge_gap=DEFAULT_MERGE_GAP):
+    """Find the windows where every participant is free.
+
+    free_period_lists holds one list of (start, end) tuples per participant,
+    each sorted by start time. All lists are swept together in a single
+    heap-based k-way merge, so the cost is O(N log k) for N periods across
+    k participants. Windows shorter than min_duration minutes are dropped and
+    the remaining ones are merged, matching what !findtime displays.
+    """
+    participant_count = len(free_period_lists)
+    if participant_count == 0:
+        return []
+
+    min_length = timedelta(minutes=min_duration)
+    common_periods = []
+    free_count = 0
+    window_start = None
+
+    for moment, delta in heapq.merge(*(_boundaries(periods) for periods in free_period_lists)):
+        if delta > 0:
+            free_count += 1
+            if free_count == participant_count:
+                window_start = moment
+        else:
+            if free_count == participant_count and moment > window_start and moment - window_start >= min_length:
+                common_periods.append((window_start, moment))
+            free_count -= 1
+
+    return merge_periods(common_periods, merge_gap)
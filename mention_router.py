@@ -0,0 +1,230 @@
+import re
+
+# FIND TIME INTENT - detects various ways to ask about finding time
+FIND_TIME_KEYWORDS = [
+    "when can", "when are", "when is", "schedule", "meeting", "meet",
+    "find time", "common time", "available time", "free time", "free slot",
+    "when are we free", "when are you free", "when can we meet",
+    "set up a meeting", "setup a meeting", "arrange a meeting",
+    "time to meet", "time to talk", "time slot"
+]
+
+# VIEW CALENDAR INTENT
+VIEW_CAL_KEYWORDS = [
+    "show calendar", "view calendar", "see calendar", "check calendar",
+    "what's on my calendar", "what is on my calendar", "my schedule",
+    "my appointments", "my events", "what do i have", "what events",
+    "calendar for", "schedule for", "what's happening", "what is happening"
+]
+
+# FREE TIME INTENT
+FREE_TIME_KEYWORDS = [
+    "when am i free", "my free time", "my availability", "free slots",
+    "available slots", "when are they free", "their availability",
+    "their free time", "check availability", "check free time"
+]
+
+# HELP INTENT
+HELP_KEYWORDS = [
+    "help", "commands", "how do i", "how to", "what can you do",
+    "features", "capabilities", "instructions", "guide me"
+]
+
+# REGISTRATION INTENT
+REGISTER_KEYWORDS = [
+    "register", "connect", "setup calendar", "set up calendar",
+    "link calendar", "connect calendar"
+]
+
+# Words that mean the question is about a mentioned user rather than the author
+THIRD_PERSON_WORDS = ["their", "his", "her", "them"]
+
+MAX_DAYS_AHEAD = 14
+
+WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+
+# Date phrases picked out of a mention alongside the intent
+DATE_PHRASES = [
+    "today", "tonight", "tomorrow", "day after tomorrow",
+    "this week", "next week", "weekend", "this weekend", "next weekend"
+] + WEEKDAYS + [f"this {day}" for day in WEEKDAYS] + [f"next {day}" for day in WEEKDAYS]
+
+# Highest priority first; findtime only applies when someone is mentioned
+INTENT_KEYWORDS = [
+    ("findtime", FIND_TIME_KEYWORDS),
+    ("viewcal", VIEW_CAL_KEYWORDS),
+    ("freetime", FREE_TIME_KEYWORDS),
+    ("help", HELP_KEYWORDS),
+    ("register", REGISTER_KEYWORDS)
+]
+
+DURATION_PATTERN = r'(?P<duration>\d+)\s*(?P<unit>min|minute|minutes|hour|hours|hr|hrs)'
+DAYS_PATTERN = r'(?P<days>\d+)\s*(?:day|days)'
+
+
+def _trie_pattern(phrases):
+    """Regex alternation of phrases factored by common prefix, longest match first
+
+    At any position only the branch for the next character is tried, instead of
+    every phrase in turn as a flat alternation would.
+    """
+    trie = {}
+    for phrase in phrases:
+        node = trie
+        for char in phrase:
+            node = node.setdefault(char, {})
+        node[""] = True
+
+    def emit(node):
+        branches = [re.escape(char) + emit(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        # Greedy, so a longer phrase wins over one that is its prefix
+        return f"(?:{body})?" if "" in node else body
+
+    return emit(trie)
+
+
+def _build_phrase_tables(phrases):
+    """Per phrase: intents and date phrase it covers, and where to resume scanning
+
+    The scan is non-overlapping, so a matched phrase stands in for every phrase
+    inside it ("my free time" also means "free time"), and scanning restarts at
+    the earliest offset where another phrase could begin inside it and run on
+    past its end (the failure links of an Aho-Corasick automaton).
+    """
+    intents = {}
+    dates = {}
+    resume = {}
+    for phrase in phrases:
+        intents[phrase] = frozenset(
+            intent for intent, keywords in INTENT_KEYWORDS
+            if any(keyword in phrase for keyword in keywords)
+        )
+        dates[phrase] = max((date for date in DATE_PHRASES if date in phrase), key=len, default=None)
+        resume[phrase] = next(
+            (offset for offset in range(1, len(phrase))
+             if any(other.startswith(phrase[offset:]) and len(other) > len(phrase) - offset for other in phrases)),
+            len(phrase)
+        )
+    return intents, dates, resume
+
+
+# Built once at import: every keyword and date phrase in one prefix trie,
+# then duration and day counts, scanned in a single left-to-right pass
+_PHRASES = sorted({keyword for _, keywords in INTENT_KEYWORDS for keyword in keywords} | set(DATE_PHRASES))
+_PHRASE_INTENTS, _PHRASE_DATES, _PHRASE_RESUME = _build_phrase_tables(_PHRASES)
+_MATCHER = re.compile(f"(?P<phrase>{_trie_pattern(_PHRASES)})|{DURATION_PATTERN}|{DAYS_PATTERN}")
+_DURATION = re.compile(DURATION_PATTERN)
+_DAYS = re.compile(DAYS_PATTERN)
+
+
+def _minutes(amount, unit):
+    if unit.startswith('hour') or unit.startswith('hr'):
+        return amount * 60
+    return amount
+
+
+class MentionMatch:
+    """Everything the keyword matcher found in one mention"""
+
+    __slots__ = ("intents", "duration", "days_ahead", "date")
+
+    def __init__(self, intents, duration, days_ahead, date):
+        self.intents = intents
+        self.duration = duration
+        self.days_ahead = days_ahead
+        self.date = date
+
+    def intent(self, has_mentions):
+        """Highest priority intent, or None"""
+        for intent, _ in INTENT_KEYWORDS:
+            if intent in self.intents and (has_mentions or intent != "findtime"):
+                return intent
+        return None
+
+
+def match_mention(content):
+    """Intents, duration, day count and first date phrase of a lower-cased mention, in one pass"""
+    intents = set()
+    duration = None
+    days_ahead = None
+    date = None
+
+    search = _MATCHER.search
+    position = 0
+    match = search(content)
+    while match:
+        phrase = match.group("phrase")
+        if phrase is not None:
+            intents |= _PHRASE_INTENTS[phrase]
+            if date is None:
+                date = _PHRASE_DATES[phrase]
+            position = match.start() + _PHRASE_RESUME[phrase]
+        elif match.group("duration") is not None:
+            if duration is None:
+                duration = _minutes(int(match.group("duration")), match.group("unit"))
+            # Keywords have no digits, but one could start inside the unit
+            position = match.end("duration")
+        else:
+            if days_ahead is None:
+                days_ahead = min(int(match.group("days")), MAX_DAYS_AHEAD)
+            position = match.end("days")
+        match = search(content, position)
+
+    return MentionMatch(intents, duration, days_ahead, date)
+
+
+def parse_duration(content):
+    """Meeting length in minutes from text like "30 min" or "1 hour", or None"""
+    duration_match = _DURATION.search(content)
+    if not duration_match:
+        return None
+    return _minutes(int(duration_match.group("duration")), duration_match.group("unit"))
+
+
+def parse_days_ahead(content):
+    """Look-ahead in days from text like "next 5 days" (capped at 14), or None"""
+    days_match = _DAYS.search(content)
+    if not days_match:
+        return None
+    return min(int(days_match.group("days")), MAX_DAYS_AHEAD)
+
+
+def _target_command(name, content, mentioned_users, author):
+    """!viewcal / !freetime for the author, or for a mentioned user if asked about them"""
+    target_user = author
+    if mentioned_users and any(word in content for word in THIRD_PERSON_WORDS):
+        target_user = mentioned_users[0]
+    if target_user != author:
+        return f"!{name} {target_user.mention}"
+    return f"!{name}"
+
+
+def route_mention(content, mentioned_users, author):
+    """Map a lower-cased mention (bot mention removed) to a bot command by keywords
+
+    Returns (intent, command) where intent is "findtime", "viewcal",
+    "freetime", "help" or "register", or (None, None) when no keyword
+    matched and the message should go to Mistral.
+    """
+    matched = match_mention(content)
+    intent = matched.intent(bool(mentioned_users))
+
+    if intent == "findtime":
+        # Build the command with any extracted parameters
+        command = "!findtime " + " ".join(user.mention for user in mentioned_users)
+        if matched.duration:
+            command += f" duration={matched.duration}"
+        if matched.days_ahead:
+            command += f" days={matched.days_ahead}"
+        return "findtime", command
+
+    if intent in ("viewcal", "freetime"):
+        return intent, _target_command(intent, content, mentioned_users, author)
+
+    if intent in ("help", "register"):
+        return intent, f"!{intent}"
+
+    return None, None
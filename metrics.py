@@ -0,0 +1,312 @@
+import re
+import threading
+import time
+from bisect import bisect_left
+from urllib.parse import urlsplit
+
+from aiohttp import web
+
+# Latency buckets in seconds, from cache hits up to slow LLM calls
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labelnames, values, extra=None):
+    pairs = list(zip(labelnames, values)) + list(extra or [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+        # Handlers run in executor threads too (Database queries)
+        self.lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self.lock:
+            for key, value in sorted(self.values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    """Monotonic count, e.g. errors per command"""
+
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    """Value that goes up and down, e.g. requests in flight"""
+
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        with self.lock:
+            self.values[self._key(labels)] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    """Cumulative-bucket latency histogram in Prometheus format"""
+
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self.lock:
+            series = self.values.get(key)
+            if series is None:
+                # Per-bucket counts (not cumulative) + overflow, then sum
+                series = self.values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][bisect_left(self.buckets, value)] += 1
+            series[1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self.lock:
+            for key, (counts, total) in sorted(self.values.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += count
+                    labels = _format_labels(self.labelnames, key, [("le", _format_value(bound))])
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                labels = _format_labels(self.labelnames, key)
+                lines.append(f"{self.name}_sum{labels} {total!r}")
+                lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Registry:
+    """All metrics plus callbacks that report stats owned by other objects"""
+
+    def __init__(self):
+        self.metrics = []
+        self.collectors = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name, help_text, labelnames=()):
+        return self.register(Counter(name, help_text, labelnames))
+
+    def gauge(self, name, help_text, labelnames=()):
+        return self.register(Gauge(name, help_text, labelnames))
+
+    def histogram(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, help_text, labelnames, buckets))
+
+    def add_collector(self, collect):
+        """collect() returns metrics (e.g. Gauges) refreshed at scrape time"""
+        self.collectors.append(collect)
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        for collect in self.collectors:
+            try:
+                for metric in collect():
+                    lines.extend(metric.render())
+            except Exception as e:
+                print(f"Error collecting metrics: {e}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# Bot commands, including the Mistral fallback for mentions
+COMMAND_SECONDS = REGISTRY.histogram(
+    "skedge_command_seconds", "Time to handle a bot command", ["command"]
+)
+COMMAND_ERRORS = REGISTRY.counter(
+    "skedge_command_errors_total", "Bot commands that raised an error", ["command"]
+)
+COMMANDS_IN_FLIGHT = REGISTRY.gauge(
+    "skedge_commands_in_flight", "Bot commands currently running", ["command"]
+)
+
+# Upstream calls: Cronofy endpoints, Mistral, Supabase operations, token refreshes
+UPSTREAM_SECONDS = REGISTRY.histogram(
+    "skedge_upstream_seconds", "Time spent in an upstream call", ["service", "operation"]
+)
+UPSTREAM_ERRORS = REGISTRY.counter(
+    "skedge_upstream_errors_total", "Upstream calls that failed or returned an error status",
+    ["service", "operation", "status"]
+)
+UPSTREAM_IN_FLIGHT = REGISTRY.gauge(
+    "skedge_upstream_in_flight", "Upstream calls currently in progress", ["service"]
+)
+
+# Mistral chat completions per model; parse failures are replies that didn't fit the intent schema
+MISTRAL_SECONDS = REGISTRY.histogram(
+    "skedge_mistral_seconds", "Time for a Mistral chat completion", ["model"]
+)
+MISTRAL_TOKENS = REGISTRY.counter(
+    "skedge_mistral_tokens_total", "Tokens used by Mistral chat completions", ["model", "kind"]
+)
+MISTRAL_RESULTS = REGISTRY.counter(
+    "skedge_mistral_results_total", "Mistral intent calls by outcome (ok, parse_failure or a MistralError kind)",
+    ["model", "outcome"]
+)
+
+
+class Tracker:
+    """Time a block into a histogram, with an in-flight gauge and error counter
+
+    Works with both `with` and `async with`. Call .fail(status) inside the
+    block to count a failure that didn't raise (e.g. a 500 response).
+    """
+
+    def __init__(self, histogram, errors, in_flight, gauge_labels, **labels):
+        self.histogram = histogram
+        self.errors = errors
+        self.in_flight = in_flight
+        self.gauge_labels = gauge_labels
+        self.labels = labels
+        self.status = None
+
+    def fail(self, status="error"):
+        self.status = status
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        self.in_flight.inc(**self.gauge_labels)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.in_flight.dec(**self.gauge_labels)
+        self.histogram.observe(time.perf_counter() - self.started, **self.labels)
+        if exc_type is not None and self.status is None:
+            self.status = "exception"
+        if self.status is not None:
+            labels = dict(self.labels)
+            if "status" in self.errors.labelnames:
+                labels["status"] = self.status
+            self.errors.inc(**labels)
+        return False
+
+    async def __aenter__(self):
+        return self.__enter__()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return self.__exit__(exc_type, exc, tb)
+
+
+def track_command(command):
+    return Tracker(COMMAND_SECONDS, COMMAND_ERRORS, COMMANDS_IN_FLIGHT, {"command": command}, command=command)
+
+
+def track_upstream(service, operation):
+    return Tracker(UPSTREAM_SECONDS, UPSTREAM_ERRORS, UPSTREAM_IN_FLIGHT, {"service": service},
+                   service=service, operation=operation)
+
+
+# Endpoints called through HttpPool and the service behind each; any other
+# path is reported as "other" so the operation label can't grow without bound
+UPSTREAM_ENDPOINTS = {
+    "v1/chat/completions": "mistral",
+    "v1/events": "cronofy",
+    "v1/free_busy": "cronofy",
+    "v1/calendars": "cronofy",
+    "v1/channels": "cronofy",
+    "oauth/token": "cronofy"
+}
+
+# Cronofy's next_page URLs, e.g. /v1/events/pages/08a07b034306679d
+_PAGE_SUFFIX = re.compile(r"/pages/[^/]+/?$")
+
+
+def endpoint_path(url):
+    """URL path without slashes at the ends, with /pages/<token> folded into its endpoint"""
+    return _PAGE_SUFFIX.sub("", urlsplit(url).path).strip("/")
+
+
+def upstream_labels(url):
+    """(service, operation) for an HttpPool URL, e.g. ("cronofy", "v1/events")"""
+    path = endpoint_path(url)
+    for endpoint, service in UPSTREAM_ENDPOINTS.items():
+        # Suffix match so a base URL with a path prefix still counts
+        if path == endpoint or path.endswith("/" + endpoint):
+            return service, endpoint
+    return "cronofy", "other"
+
+
+def cache_metrics(caches):
+    """Gauges for a {name: stats()} mapping of cache hit/miss counters"""
+    hits = Gauge("skedge_cache_hits", "Cache hits since start", ["cache"])
+    misses = Gauge("skedge_cache_misses", "Cache misses since start", ["cache"])
+    ratio = Gauge("skedge_cache_hit_ratio", "Share of lookups served from cache", ["cache"])
+    for name, stats in caches.items():
+        hits.set(stats.get("hits", 0), cache=name)
+        misses.set(stats.get("misses", 0), cache=name)
+        ratio.set(float(stats.get("hit_ratio", 0.0)), cache=name)
+    return [hits, misses, ratio]
+
+
+class MetricsServer:
+    """Serves REGISTRY in Prometheus text format on GET /metrics"""
+
+    def __init__(self, registry=REGISTRY, host="127.0.0.1", port=9100):
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self.runner = None
+
+        self.app = web.Application()
+        self.app.router.add_get("/metrics", self.metrics)
+
+    async def metrics(self, request):
+        return web.Response(text=self.registry.render(), content_type="text/plain", charset="utf-8")
+
+    async def start(self):
+        """Start serving if not already running"""
+        if self.runner is not None:
+            return
+
+        self.runner = web.AppRunner(self.app)
+        await self.runner.setup()
+        await web.TCPSite(self.runner, self.host, self.port).start()
+        print(f"Serving metrics on http://{self.host}:{self.port}/metrics")
+
+    async def stop(self):
+        """Stop serving"""
+        if self.runner is not None:
+            await self.runner.cleanup()
+            self.runner = None
@@ -0,0 +1,235 @@
+import asyncio
+import random
+import time
+from email.utils import parsedate_to_datetime
+
+import aiohttp
+
+# Statuses worth another attempt; anything else non-200 is final
+RETRY_STATUSES = {408, 429, 500, 502, 503, 504}
+
+
+class MistralReply:
+    """A successful chat completion"""
+
+    ok = True
+
+    def __init__(self, model, content, usage):
+        self.model = model
+        self.content = content
+        self.usage = usage or {}
+
+
+class MistralError:
+    """A chat completion that didn't happen, returned (not raised) so callers can fall back at once
+
+    kind is one of:
+        no_api_key    MISTRAL_API_KEY isn't set
+        queue_full    too many calls already waiting
+        deadline      couldn't get a slot, a token or a retry in before the deadline
+        rate_limited  429s until retries ran out
+        timeout       the request itself timed out on every attempt
+        server_error  5xx until retries ran out
+        client_error  other 4xx (bad request, auth); not retried
+        network       connection errors until retries ran out
+    """
+
+    ok = False
+
+    def __init__(self, kind, status=None, message=""):
+        self.kind = kind
+        self.status = status
+        self.message = message
+
+    def __repr__(self):
+        return f"MistralError({self.kind}, status={self.status}, {self.message[:100]!r})"
+
+
+class TokenBucket:
+    """Requests-per-second limit shared by every Mistral call; a rate <= 0 means unlimited"""
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate if rate and rate > 0 else None
+        self.capacity = burst or max(1.0, self.rate or 1.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    def _refill(self, now):
+        if self.rate is None:
+            self.tokens = self.capacity
+            return
+        if now <= self.updated:
+            # Still paused
+            return
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def pause(self, seconds):
+        """Hand out nothing for a while (the server sent Retry-After)"""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        self.tokens = 0.0
+        # Tokens start accruing again when the pause ends, not during it
+        self.updated = self.paused_until
+
+    async def acquire(self, deadline):
+        """Take a token, waiting if needed; False if that would pass the deadline"""
+        while True:
+            now = time.monotonic()
+            self._refill(now)
+            if now >= self.paused_until and self.tokens >= 1:
+                self.tokens -= 1
+                return True
+
+            wait = self.paused_until - now
+            if now >= self.paused_until:
+                wait = (1 - self.tokens) / self.rate
+            if now + wait > deadline:
+                return False
+            await asyncio.sleep(wait)
+
+
+def retry_after_seconds(value):
+    """Seconds from a Retry-After header (delta seconds or an HTTP date), or None"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class MistralClient:
+    """Chat completions through HttpPool with rate limiting, a concurrency cap and retries.
+
+    Calls queue for one of `max_concurrency` slots and then a token from a
+    `rate` requests/second bucket. Every call has a deadline (`queue_timeout`
+    seconds after it was made) that also caps each attempt's HTTP timeout: if
+    it can't start, finish or retry in time it gets a MistralError straight
+    away instead of waiting out a slow failure. Retries back off exponentially
+    with full jitter, or for as long as Retry-After asks.
+    """
+
+    def __init__(self, http, api_key, base_url, rate=5.0, burst=None, max_concurrency=4, max_queue=50,
+                 queue_timeout=10.0, max_retries=3, backoff_base=0.5, backoff_max=8.0):
+        self.http = http
+        self.api_key = api_key
+        self.url = f"{base_url}/v1/chat/completions"
+        self.bucket = TokenBucket(rate, burst)
+        self.slots = asyncio.Semaphore(max_concurrency)
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        # Counters for stats()
+        self.queued = 0
+        self.in_flight = 0
+        self.retries = 0
+        self.rejected = 0
+
+    def backoff(self, attempt, retry_after=None):
+        """Delay before retry number `attempt` (0-based)"""
+        if retry_after is not None:
+            return retry_after
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    async def chat(self, payload, timeout=30):
+        """POST a chat completion; returns MistralReply or MistralError"""
+        if not self.api_key:
+            return MistralError("no_api_key", message="Mistral API key not found in environment variables")
+
+        deadline = time.monotonic() + self.queue_timeout
+        if self.queued >= self.max_queue:
+            self.rejected += 1
+            return MistralError("queue_full", message=f"{self.queued} Mistral calls already waiting")
+
+        self.queued += 1
+        try:
+            await asyncio.wait_for(self.slots.acquire(), timeout=max(0.0, deadline - time.monotonic()))
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            return MistralError("deadline", message="No free Mistral slot before the deadline")
+        finally:
+            self.queued -= 1
+
+        self.in_flight += 1
+        try:
+            return await self._attempts(payload, timeout, deadline)
+        finally:
+            self.in_flight -= 1
+            self.slots.release()
+
+    async def _attempts(self, payload, timeout, deadline):
+        headers = {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {self.api_key}"
+        }
+        model = payload.get("model")
+        error = None
+
+        for attempt in range(self.max_retries + 1):
+            if not await self.bucket.acquire(deadline):
+                self.rejected += 1
+                return error or MistralError("deadline", message="Rate limit would delay the call past its deadline")
+
+            retry_after = None
+            # No attempt may outlive the call's deadline
+            attempt_timeout = min(timeout, deadline - time.monotonic())
+            if attempt_timeout <= 0:
+                return error or MistralError("deadline", message="No time left before the deadline")
+            try:
+                async with self.http.request(
+                    "POST", self.url, headers=headers, json=payload,
+                    timeout=aiohttp.ClientTimeout(total=attempt_timeout)
+                ) as response:
+                    if response.status == 200:
+                        data = await response.json()
+                        return MistralReply(model, data["choices"][0]["message"]["content"], data.get("usage"))
+
+                    text = await response.text()
+                    if response.status == 429:
+                        error = MistralError("rate_limited", 429, text)
+                        retry_after = retry_after_seconds(response.headers.get("Retry-After"))
+                        if retry_after is not None:
+                            # Everyone waits, not just this call
+                            self.bucket.pause(retry_after)
+                    elif response.status >= 500:
+                        error = MistralError("server_error", response.status, text)
+                    elif response.status in RETRY_STATUSES:
+                        error = MistralError("timeout", response.status, text)
+                    else:
+                        return MistralError("client_error", response.status, text)
+            except asyncio.TimeoutError:
+                if attempt_timeout < timeout:
+                    # Cut short by the deadline rather than the request timeout
+                    return MistralError("deadline", message=f"No response before the deadline ({attempt_timeout:.1f}s left)")
+                error = MistralError("timeout", message=f"No response within {timeout}s")
+            except aiohttp.ClientError as e:
+                error = MistralError("network", message=str(e))
+
+            if attempt == self.max_retries:
+                break
+            delay = self.backoff(attempt, retry_after)
+            if time.monotonic() + delay > deadline:
+                # A retry couldn't finish in time; fail now rather than late
+                break
+            print(f"Mistral {error.kind}, retrying in {delay:.2f}s")
+            self.retries += 1
+            await asyncio.sleep(delay)
+
+        return error
+
+    def stats(self):
+        """Queue depth, calls in flight, retries and calls turned away"""
+        return {
+            "queued": self.queued,
+            "in_flight": self.in_flight,
+            "retries": self.retries,
+            "rejected": self.rejected
+        }
@@ -0,0 +1,171 @@
+import json
+import re
+import sqlite3
+import threading
+import time
+
+from mention_router import match_mention
+
+# Discord user mentions, and the placeholders that stand in for them in the cache
+_MENTION = re.compile(r"<@!?(\d+)>")
+_PLACEHOLDER = re.compile(r"<@user(\d+)>")
+_SPACE = re.compile(r"\s+")
+_TRAILING_PUNCTUATION = re.compile(r"[\s?!.,]+$")
+
+# Dates written out in the message: "may 15th", "15 may", "10/23", "2026-10-23", "the 23rd"
+_MONTH = r"(?:jan|feb|mar|apr|may|jun|jul|aug|sep|sept|oct|nov|dec)[a-z]*\.?"
+_EXPLICIT_DATE = re.compile(
+    rf"\b{_MONTH}\s+\d{{1,2}}(?:st|nd|rd|th)?\b"
+    rf"|\b\d{{1,2}}(?:st|nd|rd|th)?\s+(?:of\s+)?{_MONTH}"
+    r"|\b\d{1,4}[/-]\d{1,2}(?:[/-]\d{1,4})?\b"
+    r"|\b\d{1,2}(?:st|nd|rd|th)\b"
+)
+
+
+def normalize_message(content):
+    """(cache key, mentioned user IDs in order of appearance)
+
+    Mentions become positional placeholders so "when can <@1> and <@2> meet"
+    and "when can <@3> and <@4> meet" share an entry. Relative dates are left
+    as written ("tomorrow", "friday"), never resolved to a calendar day.
+    """
+    user_ids = []
+
+    def placeholder(match):
+        user_id = match.group(1)
+        if user_id not in user_ids:
+            user_ids.append(user_id)
+        return f"<@user{user_ids.index(user_id)}>"
+
+    key = _MENTION.sub(placeholder, content.lower())
+    key = _TRAILING_PUNCTUATION.sub("", _SPACE.sub(" ", key).strip())
+    return key, user_ids
+
+
+def _map_strings(value, replace):
+    if isinstance(value, str):
+        return replace(value)
+    if isinstance(value, list):
+        return [_map_strings(item, replace) for item in value]
+    if isinstance(value, dict):
+        return {key: _map_strings(item, replace) for key, item in value.items()}
+    return value
+
+
+def unbind(parsed, user_ids):
+    """Parsed result with this message's mentions swapped for placeholders"""
+    positions = {user_id: index for index, user_id in enumerate(user_ids)}
+    return _map_strings(parsed, lambda text: _MENTION.sub(
+        lambda match: f"<@user{positions[match.group(1)]}>" if match.group(1) in positions else match.group(0),
+        text
+    ))
+
+
+def bind(parsed, user_ids):
+    """Cached result with placeholders swapped for this message's mentions"""
+    return _map_strings(parsed, lambda text: _PLACEHOLDER.sub(
+        lambda match: f"<@{user_ids[int(match.group(1))]}>" if int(match.group(1)) < len(user_ids) else match.group(0),
+        text
+    ))
+
+
+class NLPCache:
+    """Mistral's parsed intent JSON per normalized message, persisted to SQLite.
+
+    Entries expire `ttl` seconds after they were stored, and once there are
+    more than `maxsize` the least recently used are evicted. Lookups are
+    local SQLite reads (well under a millisecond), so they run inline.
+    """
+
+    def __init__(self, path="nlp_cache.db", maxsize=5000, ttl=7 * 24 * 3600):
+        self.path = path
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._lock = threading.Lock()
+
+        # Counters for stats()
+        self.hits = 0
+        self.misses = 0
+
+        self.connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS nlp_cache ("
+            " key TEXT PRIMARY KEY,"
+            " result TEXT NOT NULL,"
+            " stored_at REAL NOT NULL,"
+            " used_at REAL NOT NULL)"
+        )
+        self.connection.execute("CREATE INDEX IF NOT EXISTS nlp_cache_used_at ON nlp_cache (used_at)")
+        self.connection.execute("DELETE FROM nlp_cache WHERE stored_at <= ?", (time.time() - ttl,))
+
+    def get(self, content):
+        """Cached parse for a message, bound to its mentions, or None"""
+        key, user_ids = normalize_message(content)
+        now = time.time()
+        with self._lock:
+            row = self.connection.execute(
+                "SELECT result, stored_at FROM nlp_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or row[1] <= now - self.ttl:
+                if row is not None:
+                    self.connection.execute("DELETE FROM nlp_cache WHERE key = ?", (key,))
+                self.misses += 1
+                return None
+
+            # Mark as most recently used
+            self.connection.execute("UPDATE nlp_cache SET used_at = ? WHERE key = ?", (now, key))
+            self.hits += 1
+        return bind(json.loads(row[0]), user_ids)
+
+    def set(self, content, parsed):
+        """Store Mistral's parse for a message"""
+        key, user_ids = normalize_message(content)
+        parsed = unbind(parsed, user_ids)
+        # A date or day count worked out from a relative phrase ("friday",
+        # "this week") would go stale; keep only what the message spells out
+        # and leave the phrase in date_reference
+        text = _PLACEHOLDER.sub("", key)
+        stale = []
+        if not _EXPLICIT_DATE.search(text):
+            stale.append("specific_date")
+        if match_mention(text).days_ahead is None:
+            stale.append("days_ahead")
+        parsed = {name: value for name, value in parsed.items() if name not in stale}
+
+        now = time.time()
+        with self._lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO nlp_cache (key, result, stored_at, used_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(parsed), now, now)
+            )
+
+            # Evict least recently used entries
+            count = self.connection.execute("SELECT COUNT(*) FROM nlp_cache").fetchone()[0]
+            if count > self.maxsize:
+                self.connection.execute(
+                    "DELETE FROM nlp_cache WHERE key IN (SELECT key FROM nlp_cache ORDER BY used_at LIMIT ?)",
+                    (count - self.maxsize,)
+                )
+
+    def clear(self):
+        """Drop everything"""
+        with self._lock:
+            self.connection.execute("DELETE FROM nlp_cache")
+
+    def stats(self):
+        """Return hit/miss counters and the current size"""
+        with self._lock:
+            size = self.connection.execute("SELECT COUNT(*) FROM nlp_cache").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "size": size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0
+        }
+
+    def close(self):
+        with self._lock:
+            self.connection.close()
@@ -0,0 +1,55 @@
+from aiohttp import web
+
+
+class NotificationListener:
+    """Small HTTP listener inside the bot process for calendar change events.
+
+    oauth_server.py receives Cronofy push notifications and forwards them here
+    as {"discord_id": ..., "type": ..., "changes_since": ...}. Each change
+    drops that user's cached events so the next command fetches fresh data.
+    """
+
+    def __init__(self, agent, host="127.0.0.1", port=8081, api_key=None):
+        self.agent = agent
+        self.host = host
+        self.port = port
+        self.api_key = api_key
+        self.runner = None
+
+        self.app = web.Application()
+        self.app.router.add_post("/calendar-changed", self.calendar_changed)
+
+    async def calendar_changed(self, request):
+        """Handle a forwarded Cronofy change notification"""
+        if self.api_key and request.headers.get("X-API-Key") != self.api_key:
+            return web.json_response({"error": "Unauthorized"}, status=401)
+
+        try:
+            payload = await request.json()
+        except Exception:
+            return web.json_response({"error": "Invalid JSON"}, status=400)
+
+        discord_id = payload.get("discord_id")
+        if not discord_id:
+            return web.json_response({"error": "Missing discord_id"}, status=400)
+
+        if payload.get("type", "change") == "change":
+            self.agent.handle_calendar_change(discord_id, payload.get("changes_since"))
+
+        return web.json_response({"status": "ok"})
+
+    async def start(self):
+        """Start listening if not already running"""
+        if self.runner is not None:
+            return
+
+        self.runner = web.AppRunner(self.app)
+        await self.runner.setup()
+        await web.TCPSite(self.runner, self.host, self.port).start()
+        print(f"Listening for calendar notifications on {self.host}:{self.port}")
+
+    async def stop(self):
+        """Stop the listener"""
+        if self.runner is not None:
+            await self.runner.cleanup()
+            self.runner = None
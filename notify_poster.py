@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for Cronofy push notifications.
+
+Posts a Cronofy-shaped change notification to oauth_server.py's
+/notifications route (or straight to the bot's listener with --direct),
+so cache invalidation can be tested without the real service. Notifications
+for oauth_server.py are signed with CRONOFY_CLIENT_SECRET like Cronofy's.
+
+    python notify_poster.py 123456789012345678
+    python notify_poster.py 123456789012345678 --url http://localhost:5000/notifications
+    python notify_poster.py 123456789012345678 --direct --url http://127.0.0.1:8081/calendar-changed
+"""
+
+import argparse
+import base64
+import hashlib
+import hmac
+import json
+import os
+import uuid
+from datetime import datetime, timezone
+
+import requests
+from dotenv import load_dotenv
+
+
+def cronofy_signature(body, client_secret):
+    """Cronofy-HMAC-SHA256 header value: base64 HMAC-SHA256 of the raw body"""
+    return base64.b64encode(hmac.new(client_secret.encode(), body, hashlib.sha256).digest()).decode()
+
+
+def cronofy_notification(discord_id, url, notification_type, changes_since, client_secret):
+    """(body bytes, headers) for a signed Cronofy-shaped change notification
+
+    The body is serialized once so the signature covers exactly the bytes sent.
+    """
+    body = json.dumps({
+        "notification": {"type": notification_type, "changes_since": changes_since},
+        "channel": {
+            "channel_id": f"chn_{uuid.uuid4().hex[:24]}",
+            "callback_url": f"{url}?discord_id={discord_id}",
+            "filters": {}
+        }
+    }).encode()
+    headers = {
+        "Content-Type": "application/json",
+        "Cronofy-HMAC-SHA256": cronofy_signature(body, client_secret)
+    }
+    return body, headers
+
+
+def main():
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description="Send a fake Cronofy change notification")
+    parser.add_argument("discord_id", help="Discord user ID whose calendar changed")
+    parser.add_argument("--url", default="http://localhost:5000/notifications", help="Where to post the notification")
+    parser.add_argument("--direct", action="store_true", help="Post the forwarded format straight to the bot listener")
+    parser.add_argument("--type", default="change", choices=["change", "verification"], help="Notification type")
+    args = parser.parse_args()
+
+    changes_since = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+    if args.direct:
+        response = requests.post(
+            args.url,
+            json={"discord_id": args.discord_id, "type": args.type, "changes_since": changes_since},
+            headers={"X-API-Key": os.getenv("OAUTH_SERVER_API_KEY", "")},
+            timeout=5
+        )
+    else:
+        # Same shape Cronofy posts to a channel's callback URL, signed the same way
+        client_secret = os.getenv("CRONOFY_CLIENT_SECRET")
+        if not client_secret:
+            print("CRONOFY_CLIENT_SECRET is needed to sign the notification")
+            return
+        body, headers = cronofy_notification(args.discord_id, args.url, args.type, changes_since, client_secret)
+        response = requests.post(
+            args.url,
+            params={"discord_id": args.discord_id},
+            data=body,
+            headers=headers,
+            timeout=5
+        )
+
+    print(f"{response.status_code}: {response.text}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,8 @@
 from flask import Flask, request, jsonify
 import requests
+import base64
+import hashlib
+import hmac
 import json
 import os
 from dotenv import load_dotenv
@@ -45,6 +48,63 @@ def callback():
     </html>
     """
 
+def valid_cronofy_signature(body, header, client_secret):
+    """Check a Cronofy-HMAC-SHA256 header against the raw request body
+
+    The header is the base64 HMAC-SHA256 of the body keyed with the client
+    secret. While a secret is being rotated Cronofy sends one signature per
+    secret, comma separated; any of them matching is enough.
+    """
+    if not header or not client_secret:
+        return False
+    expected = base64.b64encode(hmac.new(client_secret.encode(), body, hashlib.sha256).digest()).decode()
+    return any(hmac.compare_digest(expected, signature.strip()) for signature in header.split(","))
+
+@app.route('/notifications', methods=['POST'])
+def notifications():
+    """Receive Cronofy push notifications and forward them to the bot"""
+    client_secret = os.getenv("CRONOFY_CLIENT_SECRET")
+    if not client_secret:
+        return jsonify({"error": "CRONOFY_CLIENT_SECRET not configured"}), 503
+    
+    # Only Cronofy knows the client secret, so anything unsigned is dropped here
+    if not valid_cronofy_signature(request.get_data(), request.headers.get("Cronofy-HMAC-SHA256"), client_secret):
+        return jsonify({"error": "Invalid signature"}), 401
+    
+    payload = request.get_json(silent=True) or {}
+    notification = payload.get("notification", {})
+    notification_type = notification.get("type")
+    
+    # Cronofy sends a verification ping when a channel is created
+    if notification_type == "verification":
+        return jsonify({"status": "ok"})
+    
+    # The channel's callback URL carries the Discord user ID
+    discord_id = request.args.get("discord_id")
+    if not discord_id:
+        return jsonify({"error": "Missing discord_id"}), 400
+    
+    bot_notify_url = os.getenv("BOT_NOTIFY_URL")
+    if not bot_notify_url:
+        return jsonify({"error": "BOT_NOTIFY_URL not configured"}), 503
+    
+    try:
+        requests.post(
+            bot_notify_url,
+            json={
+                "discord_id": discord_id,
+                "type": notification_type or "change",
+                "changes_since": notification.get("changes_since")
+            },
+            headers={"X-API-Key": os.getenv("OAUTH_SERVER_API_KEY", "")},
+            timeout=5
+        )
+    except requests.RequestException as e:
+        print(f"Could not forward notification for {discord_id}: {e}")
+        return jsonify({"error": "Bot unreachable"}), 502
+    
+    return jsonify({"status": "ok"})
+
 @app.route('/get_code/<uuid>')
 def get_code(uuid):
     """API endpoint for the Discord bot to retrieve codes by UUID"""
@@ -0,0 +1,283 @@
+import asyncio
+import json
+import threading
+import time
+from collections import defaultdict, deque
+from urllib.parse import urlencode, urlsplit
+
+from config import get_env_variable
+from metrics import endpoint_path
+
+# Keys whose values never get written to a recording
+SENSITIVE_KEYS = {
+    "access_token", "refresh_token", "client_secret", "code", "auth_code",
+    "authorization", "api_key", "apikey", "x-api-key", "password", "token"
+}
+REDACTED = "<redacted>"
+
+# Response headers worth keeping for replay
+KEPT_HEADERS = {"content-type", "retry-after"}
+
+
+def redact(value):
+    """Copy of a JSON-like value with secrets replaced"""
+    if isinstance(value, dict):
+        return {
+            key: REDACTED if str(key).lower() in SENSITIVE_KEYS and item else redact(item)
+            for key, item in value.items()
+        }
+    if isinstance(value, (list, tuple)):
+        return [redact(item) for item in value]
+    return value
+
+
+def redact_text(text):
+    """Redact a body that may or may not be JSON"""
+    try:
+        return redact(json.loads(text))
+    except (TypeError, ValueError):
+        return text
+
+
+def _canonical(value):
+    return json.dumps(value, sort_keys=True, default=str)
+
+
+class StoredResponse:
+    """A fully read HTTP response that behaves like the bits of aiohttp's we use"""
+
+    def __init__(self, status, body, headers=None):
+        self.status = status
+        self.body = body if isinstance(body, bytes) else (body or "").encode()
+        self.headers = headers or {}
+
+    async def read(self):
+        return self.body
+
+    async def text(self):
+        return self.body.decode(errors="replace")
+
+    async def json(self):
+        return json.loads(self.body)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class StoredResult:
+    """Stand-in for a supabase APIResponse in replay mode"""
+
+    def __init__(self, data):
+        self.data = data
+        self.error = None
+
+
+class _RecordedRequest:
+    """`async with` wrapper that reads the real response and records it"""
+
+    def __init__(self, recorder, request, method, url, kwargs):
+        self.recorder = recorder
+        self.request = request
+        self.method = method
+        self.url = url
+        self.kwargs = kwargs
+
+    async def __aenter__(self):
+        began = time.perf_counter()
+        async with self.request as response:
+            body = await response.read()
+            status = response.status
+            headers = {key: value for key, value in response.headers.items() if key.lower() in KEPT_HEADERS}
+        self.recorder.record_http(self.method, self.url, self.kwargs, status, body, headers, time.perf_counter() - began)
+        return StoredResponse(status, body, headers)
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class Recorder:
+    """Opt-in capture and replay of upstream traffic as JSONL.
+
+    mode "record" appends every HTTP call made through HttpPool and every
+    Database query, with secrets redacted, to `path`. mode "replay" answers
+    the same calls from that file instead of the network: exact matches are
+    served in recorded order, then anything for the same endpoint, and the
+    last answer repeats once a sequence runs out.
+    """
+
+    def __init__(self, mode="off", path="recordings.jsonl", replay_delay=False):
+        self.mode = mode
+        self.path = path
+        self.replay_delay = replay_delay
+        self._lock = threading.Lock()
+        self._file = None
+        self.exact = defaultdict(deque)
+        self.by_endpoint = defaultdict(deque)
+        self.stats = {"recorded": 0, "replayed": 0, "missed": 0}
+
+        if mode == "record":
+            self._file = open(path, "a", buffering=1)
+            print(f"Recording upstream traffic to {path}")
+        elif mode == "replay":
+            self._load(path)
+            print(f"Replaying upstream traffic from {path} ({len(self.by_endpoint)} endpoints)")
+
+    @property
+    def recording(self):
+        return self.mode == "record"
+
+    @property
+    def replaying(self):
+        return self.mode == "replay"
+
+    # --- keys ---
+
+    @staticmethod
+    def _http_endpoint(method, url):
+        # Paging URLs share their endpoint so a replay can fall back across pages
+        return f"http {method} /{endpoint_path(url)}"
+
+    @staticmethod
+    def _http_key(method, url, kwargs):
+        parts = urlsplit(url)
+        params = kwargs.get("params")
+        query = urlencode(params, doseq=True) if params else parts.query
+        body = kwargs.get("json", kwargs.get("data"))
+        return f"http {method} {parts.path}?{query} {_canonical(redact(body))}"
+
+    @staticmethod
+    def _db_key(operation, params):
+        return f"db {operation} {_canonical(redact(params))}"
+
+    # --- recording ---
+
+    def _write(self, entry):
+        with self._lock:
+            self._file.write(json.dumps(entry, default=str) + "\n")
+            self.stats["recorded"] += 1
+
+    def record_http(self, method, url, kwargs, status, body, headers, elapsed):
+        self._write({
+            "ts": time.time(),
+            "kind": "http",
+            "key": self._http_key(method, url, kwargs),
+            "endpoint": self._http_endpoint(method, url),
+            "host": urlsplit(url).netloc,
+            "request": redact(kwargs.get("json", kwargs.get("data"))),
+            "status": status,
+            "headers": headers,
+            "response": redact_text(body.decode(errors="replace")),
+            "elapsed_ms": round(elapsed * 1000, 3)
+        })
+
+    def record_db(self, operation, params, data, elapsed):
+        self._write({
+            "ts": time.time(),
+            "kind": "db",
+            "key": self._db_key(operation, params),
+            "endpoint": f"db {operation}",
+            "request": redact(params),
+            "response": redact(data),
+            "elapsed_ms": round(elapsed * 1000, 3)
+        })
+
+    # --- replay ---
+
+    def _load(self, path):
+        try:
+            with open(path) as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    entry = json.loads(line)
+                    if entry["kind"] == "http":
+                        # Recordings made before paging URLs were folded together
+                        _, method, path = entry["endpoint"].split(" ", 2)
+                        entry["endpoint"] = self._http_endpoint(method, path)
+                    self.exact[entry["key"]].append(entry)
+                    self.by_endpoint[entry["endpoint"]].append(entry)
+        except FileNotFoundError:
+            print(f"No recordings found at {path}; every upstream call will miss")
+
+    def _next(self, key, endpoint):
+        """Next recorded entry for a call, repeating the last one when exhausted"""
+        for index, lookup in ((self.exact, key), (self.by_endpoint, endpoint)):
+            entries = index.get(lookup)
+            if entries:
+                entry = entries.popleft() if len(entries) > 1 else entries[0]
+                self.stats["replayed"] += 1
+                return entry
+        self.stats["missed"] += 1
+        return None
+
+    async def _delay(self, entry):
+        if self.replay_delay and entry:
+            await asyncio.sleep(entry.get("elapsed_ms", 0) / 1000)
+
+    def _replay_http(self, method, url, kwargs):
+        recorder = self
+
+        class _Replayed:
+            async def __aenter__(self):
+                entry = recorder._next(recorder._http_key(method, url, kwargs), recorder._http_endpoint(method, url))
+                await recorder._delay(entry)
+                if entry is None:
+                    return StoredResponse(404, json.dumps({"error": "no recording for this request"}))
+                response = entry["response"]
+                body = response if isinstance(response, str) else json.dumps(response)
+                return StoredResponse(entry["status"], body, entry.get("headers"))
+
+            async def __aexit__(self, *exc):
+                return False
+
+        return _Replayed()
+
+    # --- hooks ---
+
+    def wrap_http(self, method, url, kwargs, send):
+        """Hook for HttpPool.request; `send()` starts the real request"""
+        if self.replaying:
+            return self._replay_http(method, url, kwargs)
+        if self.recording and method != "HEAD":
+            return _RecordedRequest(self, send(), method, url, kwargs)
+        return send()
+
+    async def run_db(self, operation, params, run):
+        """Hook for Database queries; `run()` awaits the real supabase call"""
+        if self.replaying:
+            entry = self._next(self._db_key(operation, params), f"db {operation}")
+            await self._delay(entry)
+            return StoredResult(entry["response"] if entry else [])
+
+        began = time.perf_counter()
+        response = await run()
+        if self.recording:
+            self.record_db(operation, params, getattr(response, "data", None), time.perf_counter() - began)
+        return response
+
+    def close(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+
+
+_recorder = None
+
+
+def get_recorder():
+    """Process-wide recorder configured from UPSTREAM_RECORD_MODE / UPSTREAM_RECORD_PATH"""
+    global _recorder
+    if _recorder is None:
+        mode = (get_env_variable('UPSTREAM_RECORD_MODE', 'off') or 'off').lower()
+        if mode not in ("off", "record", "replay"):
+            print(f"Unknown UPSTREAM_RECORD_MODE {mode!r}, recording is off")
+            mode = "off"
+        _recorder = Recorder(
+            mode,
+            get_env_variable('UPSTREAM_RECORD_PATH', 'recordings.jsonl'),
+            replay_delay=str(get_env_variable('UPSTREAM_REPLAY_DELAY', 'false')).lower() in ("1", "true", "yes")
+        )
+    return _recorder
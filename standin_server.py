@@ -0,0 +1,504 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for Cronofy, Mistral and Supabase.
+
+Serves the endpoints MistralAgent and Database use so the bot can run (and be
+load tested) without the live services:
+
+    Cronofy   GET  /oauth/authorize, POST /oauth/token, GET /v1/calendars,
+              GET  /v1/events, GET /v1/free_busy, POST /v1/channels
+    Mistral   POST /v1/chat/completions
+    Supabase  GET/POST/PATCH/DELETE /rest/v1/users
+
+Calendars are synthetic and stable per account (see synthetic_calendar.py).
+Each service can get its own latency distribution, random 401/429/500
+responses and a requests-per-second limit. Point the bot at it with:
+
+    CRONOFY_API_URL=http://127.0.0.1:8090
+    CRONOFY_APP_URL=http://127.0.0.1:8090
+    MISTRAL_API_URL=http://127.0.0.1:8090
+    SUPABASE_URL=http://127.0.0.1:8090
+    SUPABASE_KEY=standin.standin.standin
+
+Examples:
+    python standin_server.py --users 50
+    python standin_server.py --latency cronofy=lognormal:80:0.5 --latency mistral=lognormal:900:0.3
+    python standin_server.py --fail cronofy:429=0.05 --fail 500=0.01 --rate-limit mistral=5
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import re
+import time
+import uuid
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+
+import pytz
+from aiohttp import web
+from multidict import MultiDict
+
+import synthetic_calendar
+
+SERVICES = ("cronofy", "mistral", "supabase")
+
+# Defaults roughly matching what the real services feel like from a laptop
+DEFAULT_LATENCY = {
+    "cronofy": "lognormal:60:0.4",
+    "mistral": "lognormal:800:0.3",
+    "supabase": "lognormal:25:0.3",
+}
+
+
+def service_for(path):
+    """Which upstream a request path belongs to"""
+    if path.startswith("/rest/v1/"):
+        return "supabase"
+    if path.startswith("/v1/chat/"):
+        return "mistral"
+    return "cronofy"
+
+
+def parse_latency(spec):
+    """Turn "fixed:20", "uniform:10:100", "normal:50:10" or "lognormal:60:0.4"
+    (median ms, sigma) into a function returning a delay in seconds"""
+    kind, *args = spec.split(":")
+    args = [float(arg) for arg in args]
+    if kind == "fixed":
+        return lambda rng: args[0] / 1000
+    if kind == "uniform":
+        return lambda rng: rng.uniform(args[0], args[1]) / 1000
+    if kind == "normal":
+        return lambda rng: max(0.0, rng.gauss(args[0], args[1])) / 1000
+    if kind == "lognormal":
+        return lambda rng: args[0] * rng.lognormvariate(0, args[1]) / 1000
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+
+def _split_service(value):
+    """Split an optional "service=" or "service:" prefix off a CLI value"""
+    for separator in ("=", ":"):
+        service, found, rest = value.partition(separator)
+        if found and service in SERVICES:
+            return [service], rest
+    return list(SERVICES), value
+
+
+class TokenBucket:
+    """Requests-per-second limit; take() returns seconds to wait or 0"""
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def take(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / self.rate
+
+
+class StandinState:
+    """Accounts, tokens, users table and request stats shared by the handlers"""
+
+    def __init__(self, args):
+        self.rng = random.Random(args.seed)
+        self.tz = pytz.timezone(args.tz)
+        self.page_size = args.page_size
+        self.meetings_per_day = args.meetings_per_day
+        self.token_ttl = args.token_ttl
+        self.fenced_rate = args.fenced_replies
+        self.truncated_rate = args.truncated_replies
+
+        self.latency = {service: parse_latency(spec) for service, spec in DEFAULT_LATENCY.items()}
+        for value in args.latency:
+            services, spec = _split_service(value)
+            for service in services:
+                self.latency[service] = parse_latency(spec)
+
+        # service -> [(status, probability)]
+        self.faults = defaultdict(list)
+        for value in args.fail:
+            services, rule = _split_service(value)
+            status, _, rate = rule.partition("=")
+            for service in services:
+                self.faults[service].append((int(status), float(rate)))
+
+        self.buckets = {}
+        for value in args.rate_limit:
+            services, rate = _split_service(value)
+            for service in services:
+                self.buckets[service] = TokenBucket(float(rate))
+
+        # access token -> (account, issued at); refresh token -> account
+        self.access_tokens = {}
+        self.refresh_tokens = {}
+        self.users = {}
+        self.stats = defaultdict(Counter)
+
+        for i in range(args.users):
+            discord_id = str(100000000000000000 + i)
+            access_token, refresh_token = self.issue_tokens(discord_id, expires=False)
+            self.users[discord_id] = {
+                "discord_id": discord_id,
+                "discord_name": f"standin{i}",
+                "auth_code": "",
+                "access_token": access_token,
+                "refresh_token": refresh_token,
+                "email": f"user{discord_id}@example.com",
+                "token_expiry": (datetime.now(pytz.UTC) + timedelta(days=365)).isoformat(),
+                "data": "{}"
+            }
+
+    def issue_tokens(self, account, expires=True):
+        access_token = f"sa_{account}_{uuid.uuid4().hex[:12]}"
+        refresh_token = f"sr_{account}_{uuid.uuid4().hex[:12]}"
+        self.access_tokens[access_token] = (account, time.time() if expires else None)
+        self.refresh_tokens[refresh_token] = account
+        return access_token, refresh_token
+
+    def account_for(self, request):
+        """Account behind a bearer token, or None if it's expired
+
+        Tokens the stand-in didn't issue are accepted, each as its own account,
+        so rows copied from a real database still get calendars.
+        """
+        token = request.headers.get("Authorization", "").replace("Bearer ", "", 1)
+        if token not in self.access_tokens:
+            return token or "anonymous"
+        account, issued = self.access_tokens[token]
+        if issued is not None and self.token_ttl and time.time() - issued > self.token_ttl:
+            return None
+        return account
+
+
+def error(status, message):
+    return web.json_response({"error": message}, status=status)
+
+
+@web.middleware
+async def upstream_behaviour(request, handler):
+    """Apply throttling, fault injection and latency per service"""
+    state = request.app["state"]
+    if request.path.startswith("/_standin"):
+        return await handler(request)
+
+    service = service_for(request.path)
+    stats = state.stats[service]
+    stats["requests"] += 1
+
+    bucket = state.buckets.get(service)
+    if bucket:
+        wait = bucket.take()
+        if wait:
+            stats["throttled"] += 1
+            stats["429"] += 1
+            response = error(429, "rate limited")
+            response.headers["Retry-After"] = f"{max(1, round(wait))}"
+            return response
+
+    await asyncio.sleep(state.latency[service](state.rng))
+
+    for status, probability in state.faults.get(service, []):
+        if state.rng.random() < probability:
+            stats[str(status)] += 1
+            response = error(status, "injected fault")
+            if status == 429:
+                response.headers["Retry-After"] = "1"
+            return response
+
+    response = await handler(request)
+    stats[str(response.status)] += 1
+    return response
+
+
+# --- Cronofy ---
+
+async def oauth_authorize(request):
+    """Skip the consent screen and redirect straight back with a code"""
+    redirect_uri = request.query.get("redirect_uri", "")
+    state = request.query.get("state", uuid.uuid4().hex[:8])
+    separator = "&" if "?" in redirect_uri else "?"
+    raise web.HTTPFound(f"{redirect_uri}{separator}code=sc_{state}&state={state}")
+
+
+async def oauth_token(request):
+    state = request.app["state"]
+    if request.content_type == "application/json":
+        body = await request.json()
+    else:
+        body = dict(await request.post())
+
+    grant_type = body.get("grant_type")
+    if grant_type == "authorization_code":
+        code = body.get("code", "")
+        account = code[3:] if code.startswith("sc_") else code
+    elif grant_type == "refresh_token":
+        account = state.refresh_tokens.get(body.get("refresh_token"))
+        if account is None:
+            return error(400, "invalid_grant")
+    else:
+        return error(400, "unsupported_grant_type")
+
+    access_token, refresh_token = state.issue_tokens(account)
+    return web.json_response({
+        "token_type": "bearer",
+        "access_token": access_token,
+        "expires_in": state.token_ttl or 10800,
+        "refresh_token": refresh_token,
+        "scope": "read_events read_free_busy",
+        "account_id": f"acc_{account}",
+        "sub": f"acc_{account}"
+    })
+
+
+def _paginate(request, key, items, page_size):
+    """Cronofy-style pages with an absolute next_page URL"""
+    page = int(request.query.get("page", 1))
+    total = max(1, -(-len(items) // page_size))
+    pages = {"current": page, "total": total}
+    if page < total:
+        query = MultiDict(request.query)
+        query["page"] = str(page + 1)
+        pages["next_page"] = str(request.url.with_query(query))
+    return web.json_response({"pages": pages, key: items[(page - 1) * page_size:page * page_size]})
+
+
+def _calendar_events(request, account):
+    state = request.app["state"]
+    start = datetime.strptime(request.query["from"], "%Y-%m-%d").date()
+    end = datetime.strptime(request.query["to"], "%Y-%m-%d").date()
+    return synthetic_calendar.make_events(account, start, end, state.tz, state.meetings_per_day)
+
+
+async def calendars(request):
+    account = request.app["state"].account_for(request)
+    if account is None:
+        return error(401, "token expired")
+    return web.json_response({"calendars": synthetic_calendar.calendars_for(account)})
+
+
+async def events(request):
+    account = request.app["state"].account_for(request)
+    if account is None:
+        return error(401, "token expired")
+    return _paginate(request, "events", _calendar_events(request, account), request.app["state"].page_size)
+
+
+async def free_busy(request):
+    account = request.app["state"].account_for(request)
+    if account is None:
+        return error(401, "token expired")
+    blocks = synthetic_calendar.to_free_busy(
+        _calendar_events(request, account),
+        request.query.getall("calendar_ids[]", [])
+    )
+    return _paginate(request, "free_busy", blocks, request.app["state"].page_size)
+
+
+async def channels(request):
+    if request.app["state"].account_for(request) is None:
+        return error(401, "token expired")
+    body = await request.json()
+    return web.json_response({
+        "channel": {
+            "channel_id": f"chn_{uuid.uuid4().hex[:24]}",
+            "callback_url": body.get("callback_url"),
+            "filters": body.get("filters", {})
+        }
+    })
+
+
+# --- Mistral ---
+
+INTENT_KEYWORDS = [
+    ("check_free_time", ("free", "available", "availability")),
+    ("schedule_meeting", ("meet", "schedule", "find time", "findtime", "overlap")),
+    ("view_calendar", ("calendar", "schedule for", "events", "agenda")),
+    ("register", ("register", "connect")),
+    ("get_help", ("help", "commands")),
+]
+WEEKDAYS = ("monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday", "weekend")
+
+
+def guess_intent(message):
+    """Cheap keyword stand-in for the model's JSON answer"""
+    text = message.lower()
+    result = {"intent": "unknown", "target_users": "author"}
+    for intent, keywords in INTENT_KEYWORDS:
+        if any(keyword in text for keyword in keywords):
+            result["intent"] = intent
+            break
+
+    if "<@" in message:
+        result["target_users"] = re.findall(r"<@!?\d+>", message)
+
+    duration = re.search(r"(\d+)\s*(h|hour|hours|min|mins|minutes)\b", text)
+    if duration:
+        amount = int(duration.group(1))
+        result["duration_minutes"] = amount * 60 if duration.group(2).startswith("h") else amount
+
+    days = re.search(r"next\s+(\d+)\s+days", text)
+    if days:
+        result["days_ahead"] = int(days.group(1))
+
+    for reference in ("today", "tomorrow") + WEEKDAYS:
+        if reference in text:
+            result["date_reference"] = reference
+            break
+
+    return result
+
+
+async def chat_completions(request):
+    body = await request.json()
+    messages = body.get("messages") or [{}]
+    prompt = messages[-1].get("content", "")
+    # Older prompts quote the user's text on a "Message:" line; newer ones send it as the user turn
+    match = re.search(r"Message:\s*(.*)", prompt)
+    content = json.dumps(guess_intent(match.group(1) if match else prompt))
+    state = request.app["state"]
+    roll = state.rng.random()
+    if roll < state.fenced_rate:
+        # What a model does when it ignores JSON mode
+        content = f"Here is the JSON:\n```json\n{content}\n```"
+    elif roll < state.fenced_rate + state.truncated_rate:
+        # Cut off mid-object, e.g. by max_tokens
+        content = content[:len(content) // 2]
+    prompt_tokens = sum(len(message.get("content", "")) for message in messages) // 4
+    completion_tokens = len(content) // 4
+    return web.json_response({
+        "id": f"cmpl-{uuid.uuid4().hex[:16]}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "mistral-medium"),
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": "stop"
+        }],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens
+        }
+    })
+
+
+# --- Supabase (PostgREST subset for the users table) ---
+
+def _matches(row, query):
+    """Apply PostgREST eq./in. filters from the query string"""
+    for column, condition in query.items():
+        if column in ("select", "on_conflict", "columns", "order", "limit", "offset"):
+            continue
+        operator, _, value = condition.partition(".")
+        if operator == "eq" and str(row.get(column)) != value:
+            return False
+        if operator == "in":
+            values = [item.strip().strip('"') for item in value.strip("()").split(",")]
+            if str(row.get(column)) not in values:
+                return False
+    return True
+
+
+async def users_table(request):
+    users = request.app["state"].users
+
+    if request.method == "GET":
+        return web.json_response([row for row in users.values() if _matches(row, request.query)])
+
+    if request.method == "POST":
+        body = await request.json()
+        rows = body if isinstance(body, list) else [body]
+        saved = []
+        for row in rows:
+            discord_id = str(row.get("discord_id"))
+            # Upsert: merge into the existing row
+            users.setdefault(discord_id, {}).update(row)
+            saved.append(users[discord_id])
+        return web.json_response(saved, status=201)
+
+    if request.method == "PATCH":
+        body = await request.json()
+        updated = []
+        for row in users.values():
+            if _matches(row, request.query):
+                row.update(body)
+                updated.append(row)
+        return web.json_response(updated)
+
+    if request.method == "DELETE":
+        deleted = [row for row in users.values() if _matches(row, request.query)]
+        for row in deleted:
+            users.pop(str(row.get("discord_id")), None)
+        return web.json_response(deleted)
+
+    return error(405, "method not allowed")
+
+
+# --- Introspection ---
+
+async def standin_stats(request):
+    state = request.app["state"]
+    return web.json_response({
+        "stats": {service: dict(counts) for service, counts in state.stats.items()},
+        "users": len(state.users),
+        "access_tokens": len(state.access_tokens)
+    })
+
+
+def make_app(args):
+    app = web.Application(middlewares=[upstream_behaviour])
+    app["state"] = StandinState(args)
+    app.router.add_get("/oauth/authorize", oauth_authorize)
+    app.router.add_post("/oauth/token", oauth_token)
+    app.router.add_get("/v1/calendars", calendars)
+    app.router.add_get("/v1/events", events)
+    app.router.add_get("/v1/free_busy", free_busy)
+    app.router.add_post("/v1/channels", channels)
+    app.router.add_post("/v1/chat/completions", chat_completions)
+    app.router.add_route("*", "/rest/v1/users", users_table)
+    app.router.add_get("/_standin/stats", standin_stats)
+    return app
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Local stand-in for Cronofy, Mistral and Supabase")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--seed", type=int, default=42, help="Seed for latency and fault sampling")
+    parser.add_argument("--tz", default="America/Los_Angeles", help="Timezone synthetic working days are placed in")
+    parser.add_argument("--users", type=int, default=0, help="Pre-register this many users in the users table")
+    parser.add_argument("--meetings-per-day", type=int, default=5)
+    parser.add_argument("--page-size", type=int, default=100, help="Cronofy page size")
+    parser.add_argument("--token-ttl", type=int, default=0, help="Seconds until issued access tokens return 401 (0 = never)")
+    parser.add_argument("--latency", action="append", default=[], metavar="[SERVICE=]SPEC",
+                        help="fixed:MS, uniform:LO:HI, normal:MEAN:SD or lognormal:MEDIAN:SIGMA")
+    parser.add_argument("--fail", action="append", default=[], metavar="[SERVICE:]STATUS=RATE",
+                        help="Answer this fraction of requests with STATUS, e.g. cronofy:429=0.05")
+    parser.add_argument("--rate-limit", action="append", default=[], metavar="[SERVICE=]RPS",
+                        help="Throttle to RPS requests per second, with 429 + Retry-After beyond it")
+    parser.add_argument("--fenced-replies", type=float, default=0.0, metavar="RATE",
+                        help="Fraction of chat completions wrapped in prose and a code fence")
+    parser.add_argument("--truncated-replies", type=float, default=0.0, metavar="RATE",
+                        help="Fraction of chat completions cut off halfway through the JSON")
+    return parser
+
+
+def main():
+    args = build_parser().parse_args()
+    app = make_app(args)
+    print(f"Stand-in server on http://{args.host}:{args.port} ({args.users} users pre-registered)")
+    web.run_app(app, host=args.host, port=args.port, print=None)
+
+
+if __name__ == "__main__":
+    main()
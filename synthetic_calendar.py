@@ -0,0 +1,115 @@
+import random
+from datetime import datetime, time, timedelta
+
+import pytz
+
+# Shape of a generated working day (local time)
+DAY_START_HOUR = 8
+DAY_END_HOUR = 19
+MEETING_MINUTES = [15, 30, 30, 45, 60, 60, 90, 120]
+
+
+def _day_rng(seed, day):
+    """Deterministic RNG for one user and day, so any date range is reproducible"""
+    return random.Random(f"{seed}:{day.toordinal()}")
+
+
+def _iso(moment):
+    return moment.astimezone(pytz.UTC).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def events_for_day(seed, day, tz=pytz.UTC, meetings_per_day=5, calendars=3):
+    """Cronofy-shaped event dicts for one local day
+
+    Weekends are mostly empty. About 1 in 20 days gets an all-day event and
+    some meetings are marked transparent ("show as free").
+    """
+    rng = _day_rng(seed, day)
+    events = []
+    weekend = day.weekday() >= 5
+    count = rng.randint(0, 1) if weekend else max(0, int(rng.gauss(meetings_per_day, meetings_per_day / 3)))
+
+    if rng.random() < 0.05:
+        events.append({
+            "calendar_id": f"cal_{seed}_0",
+            "event_uid": f"evt_{seed}_{day.isoformat()}_allday",
+            "summary": rng.choice(["Out of office", "Conference", "Team offsite"]),
+            "description": "",
+            "start": day.isoformat(),
+            "end": (day + timedelta(days=1)).isoformat(),
+            "transparency": "opaque",
+            "attendees": []
+        })
+
+    minute_slots = list(range(DAY_START_HOUR * 4, DAY_END_HOUR * 4))
+    for i in range(count):
+        start_quarter = rng.choice(minute_slots)
+        naive = datetime.combine(day, time()) + timedelta(minutes=start_quarter * 15)
+        start = tz.localize(naive) if hasattr(tz, "localize") else naive.replace(tzinfo=tz)
+        end = start + timedelta(minutes=rng.choice(MEETING_MINUTES))
+        attendees = [
+            {"email": f"person{rng.randrange(500)}@example.com", "display_name": f"Person {j}", "status": "accepted"}
+            for j in range(rng.randint(1, 8))
+        ]
+        events.append({
+            "calendar_id": f"cal_{seed}_{rng.randrange(calendars)}",
+            "event_uid": f"evt_{seed}_{day.isoformat()}_{i}",
+            "summary": f"{rng.choice(['Sync', 'Review', '1:1', 'Planning', 'Standup', 'Lunch'])} {rng.randrange(100)}",
+            "description": "Agenda:\n" + "\n".join(f"- item {k}" for k in range(rng.randint(1, 6))),
+            "start": _iso(start),
+            "end": _iso(end),
+            "location": {"description": f"Room {rng.randrange(40)}"},
+            "transparency": "transparent" if rng.random() < 0.05 else "opaque",
+            "status": "confirmed",
+            "attendees": attendees,
+            "organizer": {"email": "organizer@example.com", "display_name": "Organizer"}
+        })
+
+    return events
+
+
+def make_events(seed, start_date, end_date, tz=pytz.UTC, meetings_per_day=5, calendars=3):
+    """All synthetic events for days in [start_date, end_date), sorted by start"""
+    if isinstance(start_date, datetime):
+        start_date = start_date.date()
+    if isinstance(end_date, datetime):
+        end_date = end_date.date()
+
+    events = []
+    day = start_date
+    while day < end_date:
+        events.extend(events_for_day(seed, day, tz, meetings_per_day, calendars))
+        day += timedelta(days=1)
+
+    events.sort(key=lambda event: event["start"] if "T" in event["start"] else event["start"] + "T00:00:00Z")
+    return events
+
+
+def to_free_busy(events, calendar_ids=None):
+    """The same calendar as v1/free_busy blocks"""
+    return [
+        {
+            "calendar_id": event["calendar_id"],
+            "start": event["start"],
+            "end": event["end"],
+            "free_busy_status": "free" if event.get("transparency") == "transparent" else "busy"
+        }
+        for event in events
+        if not calendar_ids or event["calendar_id"] in calendar_ids
+    ]
+
+
+def calendars_for(seed, calendars=3):
+    """v1/calendars entries matching the calendar IDs used by the generated events"""
+    return [
+        {
+            "provider_name": "google",
+            "profile_id": f"pro_{seed}",
+            "profile_name": f"user{seed}@example.com",
+            "calendar_id": f"cal_{seed}_{i}",
+            "calendar_name": ["Work", "Personal", "Team"][i % 3],
+            "calendar_readonly": False,
+            "calendar_deleted": False
+        }
+        for i in range(calendars)
+    ]
@@ -0,0 +1,88 @@
+import random
+from datetime import datetime, timedelta
+
+import pytest
+import pytz
+
+from availability_index import AvailabilityBitmap, at_least, find_common_free_periods_bitset, intersect_all
+from intersection import find_common_free_periods
+
+BASE = datetime(2026, 10, 19, 9, tzinfo=pytz.UTC)
+
+
+def at(minutes):
+    return BASE + timedelta(minutes=minutes)
+
+
+def periods(*pairs):
+    return [(at(start), at(end)) for start, end in pairs]
+
+
+def bitmap(*pairs, slot_minutes=15, slots=16):
+    return AvailabilityBitmap.from_periods(periods(*pairs), BASE, slot_minutes, slots)
+
+
+def test_only_whole_slots_are_free():
+    # 10-50 covers the 15-30 and 30-45 slots only
+    free = bitmap((10, 50))
+    assert free.bits == 0b110
+    assert free.free_minutes() == 30
+    assert free.to_periods() == periods((15, 45))
+
+
+def test_periods_outside_the_horizon_are_clipped():
+    free = bitmap((-30, 30), (225, 300))
+    assert free.to_periods() == periods((0, 30), (225, 240))
+
+
+def test_and_or_invert():
+    alice = bitmap((0, 60))
+    bob = bitmap((30, 90))
+    assert (alice & bob).to_periods() == periods((30, 60))
+    assert (alice | bob).to_periods() == periods((0, 90))
+    assert (~alice).to_periods() == periods((60, 240))
+
+
+def test_bitmaps_must_line_up():
+    with pytest.raises(ValueError):
+        bitmap((0, 60)) & bitmap((0, 60), slot_minutes=30)
+
+
+def test_runs_and_min_duration():
+    free = bitmap((0, 15), (60, 120))
+    assert list(free.runs()) == [(0, 1), (4, 4)]
+    assert free.to_periods(min_duration=30) == periods((60, 120))
+
+
+def test_at_least():
+    users = [bitmap((0, 60)), bitmap((30, 90)), bitmap((45, 120))]
+    assert at_least(users, 3).to_periods() == periods((45, 60))
+    assert at_least(users, 2).to_periods() == periods((30, 90))
+    assert at_least(users, 1).to_periods() == periods((0, 120))
+    assert at_least(users, 0).free_minutes() == 240
+    assert at_least(users, 4).free_minutes() == 0
+    assert at_least(users, 3).bits == intersect_all(users).bits
+
+
+def test_at_least_matches_counting_slot_by_slot():
+    rng = random.Random(3)
+    for _ in range(50):
+        users = [AvailabilityBitmap(BASE, 1, 200, rng.getrandbits(200)) for _ in range(rng.randint(1, 9))]
+        required = rng.randint(0, len(users) + 1)
+        expected = sum(
+            1 << slot for slot in range(200)
+            if sum((user.bits >> slot) & 1 for user in users) >= required
+        )
+        assert at_least(users, required).bits == expected
+
+
+def test_matches_the_sweep_on_the_slot_grid():
+    rng = random.Random(11)
+    for _ in range(100):
+        users = []
+        for _ in range(rng.randint(1, 4)):
+            starts = sorted(rng.sample(range(0, 20 * 60, 5), rng.randint(0, 8)))
+            users.append(periods(*[(start, start + rng.choice([5, 15, 30, 60, 120])) for start in starts]))
+        min_duration = rng.choice([0, 15, 30])
+        assert find_common_free_periods_bitset(users, min_duration, BASE, at(24 * 60)) == \
+            find_common_free_periods(users, min_duration)
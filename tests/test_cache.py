@@ -0,0 +1,65 @@
+import cache
+from cache import MISSING, TTLCache
+
+
+class Clock:
+    """Stand-in for time.monotonic that only moves when told to"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_cache(monkeypatch, **options):
+    clock = Clock()
+    monkeypatch.setattr(cache.time, "monotonic", clock)
+    return TTLCache(**options), clock
+
+
+def test_hit_and_miss(monkeypatch):
+    users, _ = make_cache(monkeypatch)
+    assert users.get("1") is MISSING
+    users.set("1", {"discord_id": "1"})
+    assert users.get("1") == {"discord_id": "1"}
+    assert users.stats() == {"size": 1, "hits": 1, "misses": 1, "hit_ratio": 0.5}
+
+
+def test_entries_expire(monkeypatch):
+    users, clock = make_cache(monkeypatch, ttl=300)
+    users.set("1", "row")
+    clock.now += 299
+    assert users.get("1") == "row"
+    clock.now += 1
+    assert users.get("1") is MISSING
+    assert users.stats()["size"] == 0
+
+
+def test_none_is_a_shorter_lived_negative_entry(monkeypatch):
+    users, clock = make_cache(monkeypatch, ttl=300, negative_ttl=60)
+    users.set("unregistered", None)
+    assert users.get("unregistered") is None
+    clock.now += 60
+    assert users.get("unregistered") is MISSING
+
+
+def test_least_recently_used_is_evicted(monkeypatch):
+    users, _ = make_cache(monkeypatch, maxsize=2)
+    users.set("a", 1)
+    users.set("b", 2)
+    users.get("a")
+    users.set("c", 3)
+    assert users.get("b") is MISSING
+    assert users.get("a") == 1 and users.get("c") == 3
+
+
+def test_invalidate_and_clear(monkeypatch):
+    users, _ = make_cache(monkeypatch)
+    users.set("a", 1)
+    users.set("b", 2)
+    users.invalidate("a")
+    users.invalidate("missing")
+    assert users.get("a") is MISSING and users.get("b") == 2
+    users.clear()
+    assert users.get("b") is MISSING
@@ -0,0 +1,70 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytz
+
+from availability import busy_periods_from_events, compute_free_periods
+from event_cache import EventCache
+from events import parse_free_busy
+
+LOS_ANGELES = pytz.timezone("America/Los_Angeles")
+TOKYO = pytz.timezone("Asia/Tokyo")
+
+# Cronofy's free/busy for the user: an all-day block on the 17th and a timed meeting
+CALENDAR = parse_free_busy({"free_busy": [
+    {"calendar_id": "cal", "start": "2026-10-17", "end": "2026-10-18", "free_busy_status": "busy"},
+    {"calendar_id": "cal", "start": "2026-10-19T16:00:00Z", "end": "2026-10-19T17:00:00Z", "free_busy_status": "busy"}
+]})
+
+
+class FakeCronofy:
+    """Answers like v1/free_busy with tzid=UTC: anything overlapping the requested UTC days"""
+
+    def __init__(self, events):
+        self.events = events
+        self.requests = []
+
+    async def fetch(self, access_token, start, end):
+        self.requests.append((start, end))
+        start_ts, end_ts = start.timestamp(), end.timestamp()
+        return 200, [event for event in self.events if event.start < end_ts and event.end > start_ts]
+
+
+def get_events(cache, start, end, tz):
+    return asyncio.run(cache.get_events("1", "token", start, end, tz=tz))
+
+
+def test_all_day_block_west_of_utc():
+    # 6PM on the 17th in Los Angeles is already the 18th in UTC
+    cache = EventCache(FakeCronofy(CALENDAR).fetch)
+    start = LOS_ANGELES.localize(datetime(2026, 10, 17, 18))
+    end = start + timedelta(days=3)
+
+    status, events = get_events(cache, start, end, LOS_ANGELES)
+    assert status == 200
+    assert [event.all_day for event in events] == [True, False]
+
+    free = compute_free_periods(busy_periods_from_events(events, LOS_ANGELES), start, 3, LOS_ANGELES)
+    assert all(period_start.date() != start.date() for period_start, _ in free)
+
+
+def test_all_day_block_east_of_utc_only_covers_its_own_day():
+    cache = EventCache(FakeCronofy(CALENDAR).fetch)
+    # The 18th in Tokyo starts while it's still the 17th in UTC
+    start = TOKYO.localize(datetime(2026, 10, 18))
+    status, events = get_events(cache, start, start + timedelta(days=1), TOKYO)
+    assert status == 200 and events == []
+
+    start = TOKYO.localize(datetime(2026, 10, 17, 20))
+    status, events = get_events(cache, start, start + timedelta(hours=2), TOKYO)
+    assert [event.all_day for event in events] == [True]
+
+
+def test_sub_ranges_are_served_from_memory():
+    cronofy = FakeCronofy(CALENDAR)
+    cache = EventCache(cronofy.fetch)
+    start = LOS_ANGELES.localize(datetime(2026, 10, 17))
+    get_events(cache, start, start + timedelta(days=7), LOS_ANGELES)
+    get_events(cache, start + timedelta(days=1), start + timedelta(days=2), LOS_ANGELES)
+    assert len(cronofy.requests) == 1
+    assert cache.stats()["hits"] == 1
@@ -0,0 +1,52 @@
+import asyncio
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytz
+
+import bot
+
+
+class FakeMessage:
+    async def delete(self):
+        pass
+
+
+class FakeContext:
+    """The bits of a commands.Context that !findtime uses; keeps what was sent"""
+
+    def __init__(self, author, mentions):
+        self.author = author
+        self.message = SimpleNamespace(mentions=mentions)
+        self.sent = []
+
+    async def send(self, content=None, embed=None):
+        self.sent.append(embed if embed is not None else content)
+        return FakeMessage()
+
+
+def user(user_id, name):
+    return SimpleNamespace(id=user_id, mention=f"<@{user_id}>", display_name=name)
+
+
+def test_left_out_participants_arent_reported_free(monkeypatch):
+    alice, bob, carol = user(1, "alice"), user(2, "bob"), user(3, "carol")
+    start = datetime.now(pytz.timezone(bot.DEFAULT_TIMEZONE)) + timedelta(hours=1)
+    free = [(start, start + timedelta(hours=2))]
+
+    async def gather(participants, start_date, end_date, days_ahead):
+        # carol's calendar timed out
+        return {"1": free, "2": free}, [], [carol.mention]
+
+    monkeypatch.setattr(bot, "gather_participant_free_periods", gather)
+    monkeypatch.setattr(bot.bot._connection, "user", SimpleNamespace(id=999))
+
+    ctx = FakeContext(alice, [bob, carol])
+    asyncio.run(bot.find_time.callback(ctx))
+
+    assert any(isinstance(sent, str) and "Couldn't load calendars for <@3>" in sent for sent in ctx.sent)
+    embed = ctx.sent[-1]
+    assert embed.description == "Found times when all 2 participants are available:"
+    fields = {field.name: field.value for field in embed.fields}
+    assert fields["Participants"] == "• alice\n• bob"
+    assert fields["⚠️ Not included (calendar couldn't be loaded)"] == "• carol"
@@ -0,0 +1,66 @@
+import intent_classifier
+from intent_classifier import IntentClassifier, get_classifier, load_examples, tokenize
+
+EXAMPLES = {
+    "view_calendar": ["what's on my agenda", "show me my day", "what am i doing today"],
+    "get_help": ["how does this work", "what can i ask you", "show me examples"],
+    "register": ["sign me up", "link my account", "add my calendar"]
+}
+
+
+def test_tokenize():
+    assert tokenize("Book 30 min with <@123>") == [
+        "book", "<num>", "min", "with", "mention",
+        "book <num>", "<num> min", "min with", "with mention"
+    ]
+    assert tokenize("what's up") == ["what's", "up", "what's up"]
+
+
+def test_confident_answers_are_local():
+    classifier = IntentClassifier(EXAMPLES, threshold=0.3, margin=0.1)
+    intent, confidence = classifier.predict("what's on my agenda today")
+    assert intent == "view_calendar" and confidence >= 0.3
+    assert classifier.llm_calls_avoided == 1
+
+
+def test_unfamiliar_or_ambiguous_messages_fall_back():
+    classifier = IntentClassifier(EXAMPLES, threshold=0.3, margin=0.1)
+    assert classifier.predict("order me a pizza")[0] is None
+    # "show me" is shared by two intents
+    intent, best, margin = classifier.classify("show me")
+    assert margin < 0.1
+    assert classifier.predict("show me")[0] is None
+    assert classifier.stats == {"local": 0, "fallback": 2}
+
+
+def test_scores_are_cosine_similarities():
+    classifier = IntentClassifier(EXAMPLES)
+    scores = classifier.scores("sign me up")
+    assert set(scores) == set(EXAMPLES)
+    assert all(0.0 <= score <= 1.0 + 1e-9 for score in scores.values())
+    assert max(scores, key=scores.get) == "register"
+
+
+def test_no_examples_never_answers():
+    classifier = IntentClassifier({})
+    assert classifier.classify("anything") == (None, 0.0, 0.0)
+    assert classifier.predict("anything") == (None, 0.0)
+
+
+def test_bundled_examples_are_never_answered_wrongly():
+    examples = load_examples()
+    classifier = IntentClassifier(examples)
+    for intent, texts in examples.items():
+        for text in texts:
+            # A few sit near a neighbouring intent; those go to Mistral instead
+            assert classifier.predict(text)[0] in (intent, None), text
+    assert classifier.stats["local"] >= 0.5 * sum(len(texts) for texts in examples.values())
+
+
+def test_zero_confidence_turns_the_classifier_off(monkeypatch):
+    monkeypatch.setattr(intent_classifier, "_classifier", None)
+    monkeypatch.setenv("INTENT_CONFIDENCE", "0")
+    try:
+        assert get_classifier().predict("sign me up")[0] is None
+    finally:
+        intent_classifier._classifier = None
@@ -0,0 +1,77 @@
+import random
+from datetime import datetime, timedelta
+
+import pytz
+
+from intersection import find_common_free_periods, merge_periods
+
+BASE = datetime(2026, 10, 19, 9, tzinfo=pytz.UTC)
+
+
+def at(minutes):
+    return BASE + timedelta(minutes=minutes)
+
+
+def periods(*pairs):
+    return [(at(start), at(end)) for start, end in pairs]
+
+
+def test_overlap_of_two_users():
+    alice = periods((0, 60), (120, 180))
+    bob = periods((30, 150))
+    assert find_common_free_periods([alice, bob], 15) == periods((30, 60), (120, 150))
+
+
+def test_back_to_back_periods_share_no_window():
+    assert find_common_free_periods([periods((0, 60)), periods((60, 120))], 0) == []
+
+
+def test_short_windows_are_dropped():
+    alice = periods((0, 10), (20, 80))
+    bob = periods((0, 200))
+    assert find_common_free_periods([alice, bob], 30) == periods((20, 80))
+
+
+def test_close_windows_are_merged():
+    alice = periods((0, 30), (33, 60), (90, 120))
+    assert find_common_free_periods([alice], 0) == periods((0, 60), (90, 120))
+    assert merge_periods(periods((0, 30), (40, 60)), timedelta(minutes=10)) == periods((0, 60))
+
+
+def test_a_users_overlapping_periods_count_once():
+    alice = periods((0, 60), (30, 90))
+    bob = periods((45, 120))
+    assert find_common_free_periods([alice, bob], 0) == periods((45, 90))
+
+
+def test_nobody():
+    assert find_common_free_periods([], 30) == []
+    assert find_common_free_periods([periods((0, 60)), []], 0) == []
+
+
+def brute_force(free_period_lists, min_duration):
+    """Minute-by-minute reference, merged the same way"""
+    free = set(range(26 * 60))
+    for user in free_period_lists:
+        minutes = set()
+        for start, end in user:
+            minutes.update(range(int((start - BASE).total_seconds() // 60), int((end - BASE).total_seconds() // 60)))
+        free &= minutes
+    runs = []
+    for minute in sorted(free):
+        if runs and runs[-1][1] == minute:
+            runs[-1][1] = minute + 1
+        else:
+            runs.append([minute, minute + 1])
+    return merge_periods([(at(start), at(end)) for start, end in runs if end - start >= max(min_duration, 1)])
+
+
+def test_matches_brute_force_on_random_calendars():
+    rng = random.Random(7)
+    for _ in range(200):
+        users = []
+        for _ in range(rng.randint(1, 4)):
+            starts = sorted(rng.sample(range(0, 24 * 60, 5), rng.randint(0, 8)))
+            users.append(periods(*[(start, start + rng.choice([5, 15, 30, 60, 120])) for start in starts]))
+        min_duration = rng.choice([0, 15, 30])
+        assert find_common_free_periods(users, min_duration) == brute_force(users, min_duration)
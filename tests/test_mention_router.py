@@ -0,0 +1,80 @@
+import random
+from types import SimpleNamespace
+
+from mention_router import (
+    DATE_PHRASES, INTENT_KEYWORDS, MAX_DAYS_AHEAD, match_mention, parse_days_ahead, parse_duration, route_mention
+)
+
+AUTHOR = SimpleNamespace(mention="<@1>")
+FRIEND = SimpleNamespace(mention="<@2>")
+
+
+def test_find_time_with_duration_and_days():
+    intent, command = route_mention("when can we meet <@2> for 30 minutes in the next 5 days", [FRIEND], AUTHOR)
+    assert (intent, command) == ("findtime", "!findtime <@2> duration=30 days=5")
+
+
+def test_find_time_needs_someone_mentioned():
+    # "meeting" alone without a mention isn't a findtime
+    assert route_mention("schedule a meeting", [], AUTHOR) == (None, None)
+
+
+def test_calendar_for_the_author_or_a_mentioned_user():
+    assert route_mention("show calendar", [], AUTHOR) == ("viewcal", "!viewcal")
+    assert route_mention("check their availability <@2>", [FRIEND], AUTHOR) == ("freetime", "!freetime <@2>")
+    # Someone is mentioned, but the question is about the author
+    assert route_mention("when am i free <@2>", [FRIEND], AUTHOR) == ("freetime", "!freetime")
+
+
+def test_help_and_register():
+    assert route_mention("help", [], AUTHOR) == ("help", "!help")
+    assert route_mention("how do i connect my calendar", [], AUTHOR) == ("help", "!help")
+    assert route_mention("register", [], AUTHOR) == ("register", "!register")
+
+
+def test_nothing_matched_goes_to_mistral():
+    assert route_mention("can you move my dentist appointment", [], AUTHOR) == (None, None)
+
+
+def test_match_mention_details():
+    matched = match_mention("find time with <@2> for 1 hour next friday over 30 days")
+    assert matched.intent(True) == "findtime"
+    assert matched.duration == 60
+    assert matched.days_ahead == MAX_DAYS_AHEAD
+    assert matched.date == "next friday"
+
+
+def test_first_date_phrase_wins():
+    assert match_mention("what do i have tomorrow or friday").date == "tomorrow"
+    assert match_mention("what do i have the day after tomorrow").date == "day after tomorrow"
+
+
+def test_parse_helpers():
+    assert parse_duration("for 2 hrs") == 120
+    assert parse_duration("45 minutes") == 45
+    assert parse_duration("soon") is None
+    assert parse_days_ahead("next 3 days") == 3
+    assert parse_days_ahead("next 30 days") == MAX_DAYS_AHEAD
+    assert parse_days_ahead("next week") is None
+
+
+def chain_intent(content, has_mentions):
+    """Keyword-by-keyword reference for the precompiled scan"""
+    for intent, keywords in INTENT_KEYWORDS:
+        if (has_mentions or intent != "findtime") and any(keyword in content for keyword in keywords):
+            return intent
+    return None
+
+
+def test_scan_agrees_with_keyword_chain():
+    rng = random.Random(5)
+    words = [keyword for _, keywords in INTENT_KEYWORDS for keyword in keywords] + DATE_PHRASES + [
+        "30 min", "1 hour", "2 hrs", "3 days", "20 days", "<@2>", "the", "team", "ok", "a", "me", "tim", "e"
+    ]
+    for _ in range(2000):
+        content = rng.choice([" ", ""]).join(rng.choice(words) for _ in range(rng.randint(1, 6)))
+        has_mentions = rng.random() < 0.5
+        matched = match_mention(content)
+        assert matched.intent(has_mentions) == chain_intent(content, has_mentions), content
+        assert matched.duration == parse_duration(content), content
+        assert matched.days_ahead == parse_days_ahead(content), content
@@ -0,0 +1,130 @@
+import asyncio
+import json
+import time
+
+import pytest
+
+import mistral_client
+from mistral_client import MistralClient, TokenBucket, retry_after_seconds
+from recorder import StoredResponse
+
+REPLY = json.dumps({"choices": [{"message": {"content": "{}"}}], "usage": {"total_tokens": 3}})
+
+
+class FakeHttp:
+    """Hands out the queued responses in order and notes each attempt's timeout"""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.timeouts = []
+
+    def request(self, method, url, **kwargs):
+        self.timeouts.append(kwargs["timeout"].total)
+        response = self.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+
+def make_client(http, **options):
+    options.setdefault("backoff_base", 0.01)
+    return MistralClient(http, "key", "http://mistral.test", **options)
+
+
+def test_zero_or_negative_rate_is_unlimited():
+    for rate in (0, -1, None):
+        bucket = TokenBucket(rate)
+        deadline = time.monotonic() + 0.1
+        assert all(asyncio.run(bucket.acquire(deadline)) for _ in range(100))
+
+
+def test_bucket_gives_up_when_the_wait_passes_the_deadline():
+    bucket = TokenBucket(1.0)
+    assert asyncio.run(bucket.acquire(time.monotonic() + 0.1))
+    # The next token is a second away
+    assert not asyncio.run(bucket.acquire(time.monotonic() + 0.1))
+
+
+def test_unlimited_bucket_still_honors_pause():
+    bucket = TokenBucket(0)
+    bucket.pause(5)
+    assert not asyncio.run(bucket.acquire(time.monotonic() + 0.1))
+
+
+def test_no_burst_right_after_a_pause(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(mistral_client.time, "monotonic", lambda: clock[0])
+    bucket = TokenBucket(5.0)
+    bucket.tokens = 0.0
+    bucket.pause(10)
+    clock[0] += 10.1
+    bucket._refill(clock[0])
+    # Only what accrued in the 0.1s since the pause ended, not a full burst of 5
+    assert bucket.tokens == pytest.approx(0.5)
+
+
+def test_retry_after_seconds():
+    assert retry_after_seconds("2") == 2.0
+    assert retry_after_seconds("-3") == 0.0
+    assert retry_after_seconds("soon") is None
+    assert retry_after_seconds(None) is None
+    assert retry_after_seconds("Thu, 01 Jan 1970 00:00:00 GMT") == 0.0
+
+
+def test_retries_a_429_then_succeeds():
+    http = FakeHttp(StoredResponse(429, "slow down", {"Retry-After": "0"}), StoredResponse(200, REPLY))
+    client = make_client(http)
+    reply = asyncio.run(client.chat({"model": "small"}))
+    assert reply.ok and reply.content == "{}" and reply.usage == {"total_tokens": 3}
+    assert client.stats()["retries"] == 1
+
+
+def test_client_errors_are_not_retried():
+    http = FakeHttp(StoredResponse(401, "bad key"), StoredResponse(200, REPLY))
+    error = asyncio.run(make_client(http).chat({"model": "small"}))
+    assert not error.ok and error.kind == "client_error" and error.status == 401
+    assert len(http.responses) == 1
+
+
+def test_server_errors_until_retries_run_out():
+    http = FakeHttp(*[StoredResponse(503, "down") for _ in range(3)])
+    error = asyncio.run(make_client(http, max_retries=2).chat({"model": "small"}))
+    assert error.kind == "server_error" and error.status == 503
+    assert not http.responses
+
+
+def test_retry_after_past_the_deadline_fails_at_once():
+    http = FakeHttp(StoredResponse(429, "slow down", {"Retry-After": "60"}), StoredResponse(200, REPLY))
+    client = make_client(http, queue_timeout=1.0)
+    began = time.monotonic()
+    error = asyncio.run(client.chat({"model": "small"}))
+    assert error.kind == "rate_limited"
+    assert time.monotonic() - began < 0.5
+
+
+def test_attempt_timeout_is_capped_at_the_deadline():
+    http = FakeHttp(StoredResponse(200, REPLY))
+    asyncio.run(make_client(http, queue_timeout=2.0).chat({"model": "small"}, timeout=30))
+    assert 0 < http.timeouts[0] <= 2.0
+
+
+def test_timeout_cut_short_by_the_deadline_is_a_deadline_error():
+    http = FakeHttp(asyncio.TimeoutError(), StoredResponse(200, REPLY))
+    error = asyncio.run(make_client(http, queue_timeout=2.0).chat({"model": "small"}, timeout=30))
+    assert error.kind == "deadline"
+    assert len(http.responses) == 1
+
+
+def test_no_api_key():
+    error = asyncio.run(MistralClient(FakeHttp(), None, "http://mistral.test").chat({}))
+    assert error.kind == "no_api_key"
+
+
+def test_zero_rate_client_sends_everything():
+    # MISTRAL_RPS=0 used to divide by zero on the first wait
+    client = make_client(FakeHttp(*[StoredResponse(200, REPLY) for _ in range(10)]), rate=0)
+
+    async def burst():
+        return await asyncio.gather(*[client.chat({"model": "small"}) for _ in range(10)])
+
+    assert all(reply.ok for reply in asyncio.run(asyncio.wait_for(burst(), timeout=5)))
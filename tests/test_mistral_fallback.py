@@ -0,0 +1,35 @@
+from agent import MistralAgent
+from intent_classifier import IntentClassifier, load_examples
+
+
+def make_agent(fallback_confidence=0.15):
+    # Only the classifier bits; no HTTP pool or database
+    agent = MistralAgent.__new__(MistralAgent)
+    agent.intent_classifier = IntentClassifier(load_examples())
+    agent.fallback_confidence = fallback_confidence
+    return agent
+
+
+def test_fallback_guess_for_a_clear_request():
+    parsed = make_agent().best_local_guess("is <@1> free on friday", None, [])
+    assert parsed["intent"] == "check_free_time"
+    assert parsed["date_reference"] == "friday"
+
+
+def test_fallback_needs_the_margin_over_the_runner_up():
+    agent = make_agent()
+    for text in ("delete my 3pm event", "remind me to call mom"):
+        _, confidence, margin = agent.intent_classifier.classify(text)
+        assert confidence >= agent.fallback_confidence and margin < agent.intent_classifier.margin
+        assert agent.best_local_guess(text, None, []) is None
+
+
+def test_fallback_never_registers():
+    agent = make_agent()
+    intent, confidence, margin = agent.intent_classifier.classify("sign me up")
+    assert intent == "register" and confidence >= agent.fallback_confidence
+    assert agent.best_local_guess("sign me up", None, []) is None
+
+
+def test_fallback_below_confidence():
+    assert make_agent(fallback_confidence=0.99).best_local_guess("is <@1> free on friday", None, []) is None
@@ -0,0 +1,85 @@
+import time
+
+from nlp_cache import NLPCache, bind, normalize_message, unbind
+
+
+def make_cache(tmp_path, **options):
+    return NLPCache(str(tmp_path / "nlp_cache.db"), **options)
+
+
+def test_normalize_message():
+    assert normalize_message("When can <@1> and <@!2> meet?!  ") == ("when can <@user0> and <@user1> meet", ["1", "2"])
+    assert normalize_message("<@5> or <@5>") == ("<@user0> or <@user0>", ["5"])
+
+
+def test_unbind_and_bind_round_trip():
+    parsed = {"intent": "schedule_meeting", "mentioned_users": ["<@1>", "<@2>", "<@9>"]}
+    stored = unbind(parsed, ["1", "2"])
+    assert stored["mentioned_users"] == ["<@user0>", "<@user1>", "<@9>"]
+    assert bind(stored, ["3", "4"])["mentioned_users"] == ["<@3>", "<@4>", "<@9>"]
+
+
+def test_same_phrasing_about_other_people_hits(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.set("when can <@1> and <@2> meet", {"intent": "schedule_meeting", "mentioned_users": ["<@1>", "<@2>"]})
+    assert cache.get("When can <@3> and <@4> meet?") == {"intent": "schedule_meeting", "mentioned_users": ["<@3>", "<@4>"]}
+    assert cache.get("when can <@3> meet") is None
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_relative_dates_keep_only_the_phrase(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.set("is <@1> free this week", {
+        "intent": "check_free_time", "days_ahead": 4, "specific_date": "2026-10-17", "date_reference": "this week"
+    })
+    assert cache.get("is <@1> free this week") == {"intent": "check_free_time", "date_reference": "this week"}
+
+
+def test_a_duration_doesnt_keep_relative_dates(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.set("when can <@1> and <@2> meet friday for 30 min", {
+        "intent": "schedule_meeting", "duration_minutes": 30, "days_ahead": 3,
+        "specific_date": "2026-10-23", "date_reference": "friday"
+    })
+    assert cache.get("when can <@3> and <@4> meet friday for 30 min") == {
+        "intent": "schedule_meeting", "duration_minutes": 30, "date_reference": "friday"
+    }
+
+
+def test_explicit_day_counts_and_dates_are_kept(tmp_path):
+    cache = make_cache(tmp_path)
+    parsed = {"intent": "check_free_time", "days_ahead": 3}
+    cache.set("is <@1> free in the next 3 days", dict(parsed, specific_date="2026-10-20"))
+    assert cache.get("is <@1> free in the next 3 days") == parsed
+
+    parsed = {"intent": "view_calendar", "specific_date": "2026-05-15"}
+    cache.set("what do i have on may 15th", dict(parsed, days_ahead=1))
+    assert cache.get("what do i have on may 15th") == parsed
+
+
+def test_least_recently_used_is_evicted(tmp_path):
+    cache = make_cache(tmp_path, maxsize=2)
+    cache.set("a", {"intent": "get_help"})
+    time.sleep(0.01)
+    cache.set("b", {"intent": "get_help"})
+    time.sleep(0.01)
+    cache.get("a")
+    time.sleep(0.01)
+    cache.set("c", {"intent": "get_help"})
+    assert cache.get("b") is None
+    assert cache.get("a") and cache.get("c")
+
+
+def test_entries_expire(tmp_path):
+    cache = make_cache(tmp_path, ttl=0.05)
+    cache.set("hi", {"intent": "unknown"})
+    time.sleep(0.1)
+    assert cache.get("hi") is None
+    assert cache.stats()["size"] == 0
+
+
+def test_entries_survive_a_restart(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.set("what's on my agenda", {"intent": "view_calendar"})
+    cache.close()
+    assert make_cache(tmp_path).get("what's on my agenda") == {"intent": "view_calendar"}
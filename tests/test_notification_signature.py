@@ -0,0 +1,69 @@
+import base64
+import hashlib
+import hmac
+import json
+
+import pytest
+
+import oauth_server
+from notify_poster import cronofy_notification
+
+SECRET = "client-secret"
+
+
+def sign(body, secret=SECRET):
+    return base64.b64encode(hmac.new(secret.encode(), body, hashlib.sha256).digest()).decode()
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setenv("CRONOFY_CLIENT_SECRET", SECRET)
+    monkeypatch.delenv("BOT_NOTIFY_URL", raising=False)
+    return oauth_server.app.test_client()
+
+
+def post(client, body, signature):
+    headers = {"Content-Type": "application/json"}
+    if signature is not None:
+        headers["Cronofy-HMAC-SHA256"] = signature
+    return client.post("/notifications?discord_id=42", data=body, headers=headers)
+
+
+def test_signed_notification_is_accepted(client):
+    body = json.dumps({"notification": {"type": "verification"}}).encode()
+    assert post(client, body, sign(body)).status_code == 200
+
+
+def test_any_signature_during_secret_rotation(client):
+    body = json.dumps({"notification": {"type": "verification"}}).encode()
+    assert post(client, body, f"{sign(body, 'old-secret')},{sign(body)}").status_code == 200
+
+
+def test_unsigned_or_forged_notifications_are_rejected(client):
+    body = json.dumps({"notification": {"type": "change"}}).encode()
+    assert post(client, body, None).status_code == 401
+    assert post(client, body, sign(body, "guess")).status_code == 401
+    # Signed, but for a different body
+    assert post(client, body, sign(body + b" ")).status_code == 401
+
+
+def test_signature_is_checked_before_forwarding(client):
+    body = json.dumps({"notification": {"type": "change"}}).encode()
+    # Gets as far as the missing BOT_NOTIFY_URL
+    assert post(client, body, sign(body)).status_code == 503
+
+
+def test_no_client_secret_rejects_everything(client, monkeypatch):
+    monkeypatch.delenv("CRONOFY_CLIENT_SECRET")
+    body = json.dumps({"notification": {"type": "verification"}}).encode()
+    assert post(client, body, sign(body)).status_code == 503
+
+
+def test_poster_notifications_are_accepted(client):
+    body, headers = cronofy_notification("42", "http://localhost/notifications", "verification", "2026-10-17T00:00:00Z", SECRET)
+    response = client.post("/notifications?discord_id=42", data=body, headers=headers)
+    assert response.status_code == 200
+
+    # A change gets past the signature check and stops at the missing BOT_NOTIFY_URL
+    body, headers = cronofy_notification("42", "http://localhost/notifications", "change", "2026-10-17T00:00:00Z", SECRET)
+    assert client.post("/notifications?discord_id=42", data=body, headers=headers).status_code == 503
@@ -0,0 +1,112 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+from agent import MistralAgent
+from database import Database
+from recorder import StoredResponse
+
+
+class FakeQuery:
+    """The slice of supabase's query builder that Database uses, over a dict of rows"""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.action = None
+        self.filters = {}
+
+    def upsert(self, row):
+        self.action = ("upsert", row)
+        return self
+
+    def select(self, columns):
+        self.action = ("select", columns)
+        return self
+
+    def eq(self, column, value):
+        self.filters[column] = value
+        return self
+
+    def execute(self):
+        kind, value = self.action
+        if kind == "upsert":
+            self.rows[value["discord_id"]] = dict(value)
+            return SimpleNamespace(data=[value], error=None)
+        data = [dict(row) for row in self.rows.values()
+                if all(row.get(column) == wanted for column, wanted in self.filters.items())]
+        return SimpleNamespace(data=data, error=None)
+
+
+class FakeSupabase:
+    def __init__(self):
+        self.rows = {}
+
+    def table(self, name):
+        return FakeQuery(self.rows)
+
+
+class FakeHttp:
+    def __init__(self, body):
+        self.body = body
+
+    def request(self, method, url, **kwargs):
+        return StoredResponse(200, json.dumps(self.body))
+
+
+def make_agent(token_response):
+    db = Database()
+    db.client = FakeSupabase()
+    agent = SimpleNamespace(
+        db=db, http=FakeHttp(token_response),
+        cronofy_client_id="id", cronofy_client_secret="secret"
+    )
+    return agent, db
+
+
+def test_refresh_keeps_the_rest_of_the_row():
+    agent, db = make_agent({"access_token": "new-access", "expires_in": 3600})
+
+    async def scenario():
+        await db.save_user({
+            "discord_id": "42",
+            "discord_name": "ada",
+            "auth_code": "code",
+            "email": "ada@example.com",
+            "access_token": "old-access",
+            "refresh_token": "old-refresh",
+            "token_expiry": 1.0,
+            "user_uuid": "abc",
+            "calendar_ids": ["cal_1"],
+        })
+        expiry = await MistralAgent.refresh_access_token(agent, "42", "old-refresh")
+        return expiry, await db.get_user("42")
+
+    expiry, user = asyncio.run(scenario())
+
+    assert expiry is not None
+    assert user["access_token"] == "new-access"
+    # Cronofy didn't rotate it, so the old refresh token is kept
+    assert user["refresh_token"] == "old-refresh"
+    assert user["discord_name"] == "ada"
+    assert user["auth_code"] == "code"
+    assert user["email"] == "ada@example.com"
+    assert user["user_uuid"] == "abc"
+    assert user["calendar_ids"] == ["cal_1"]
+
+
+def test_saving_a_row_read_back_from_get_user():
+    """Rows from get_user carry an ISO token_expiry and the raw data column"""
+    agent, db = make_agent({})
+
+    async def scenario():
+        await db.save_user({"discord_id": "7", "token_expiry": 1700000000.0, "calendar_ids": ["a"]})
+        user = await db.get_user("7")
+        user["calendar_ids"] = ["b"]
+        saved = await db.save_user(user)
+        return saved, await db.get_user("7")
+
+    saved, user = asyncio.run(scenario())
+
+    assert saved
+    assert user["calendar_ids"] == ["b"]
+    assert "data" not in json.loads(db.client.rows["7"]["data"])
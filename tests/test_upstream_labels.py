@@ -0,0 +1,57 @@
+import asyncio
+import json
+
+from metrics import REGISTRY, upstream_labels
+from recorder import Recorder
+
+
+def test_known_endpoints():
+    assert upstream_labels("https://api.cronofy.com/v1/events?tzid=UTC") == ("cronofy", "v1/events")
+    assert upstream_labels("https://api.cronofy.com/oauth/token") == ("cronofy", "oauth/token")
+    assert upstream_labels("https://api.mistral.ai/v1/chat/completions") == ("mistral", "v1/chat/completions")
+    assert upstream_labels("http://proxy.local/mistral/v1/chat/completions") == ("mistral", "v1/chat/completions")
+
+
+def test_pages_fold_into_their_endpoint():
+    assert upstream_labels("https://api.cronofy.com/v1/events/pages/08a07b034306679d") == ("cronofy", "v1/events")
+    assert upstream_labels("https://api.cronofy.com/v1/free_busy/pages/abc/") == ("cronofy", "v1/free_busy")
+
+
+def test_anything_else_is_other():
+    assert upstream_labels("https://api.cronofy.com/") == ("cronofy", "other")
+    assert upstream_labels("https://api.cronofy.com/v1/secret/12345") == ("cronofy", "other")
+
+
+def test_replay_falls_back_across_pages(tmp_path):
+    path = tmp_path / "recordings.jsonl"
+    # Written before pages were folded, so the endpoint still has the token
+    path.write_text(json.dumps({
+        "kind": "http",
+        "key": "http GET /v1/events/pages/first? null",
+        "endpoint": "http GET /v1/events/pages/first",
+        "status": 200,
+        "response": {"events": []}
+    }) + "\n")
+    recorder = Recorder("replay", str(path))
+
+    async def replay():
+        async with recorder.wrap_http("GET", "https://api.cronofy.com/v1/events/pages/second", {}, None) as response:
+            return response.status
+
+    assert asyncio.run(replay()) == 200
+    assert recorder.stats == {"recorded": 0, "replayed": 1, "missed": 0}
+
+
+def test_warm_up_is_not_an_upstream_call():
+    from http_pool import HttpPool
+
+    pool = HttpPool(recorder=Recorder())
+    before = REGISTRY.render()
+
+    async def warm_up():
+        # Nothing listens on port 9, so the HEAD fails without leaving the machine
+        await pool.warm_up(["http://127.0.0.1:9"])
+        await pool.close()
+
+    asyncio.run(warm_up())
+    assert REGISTRY.render() == before
@@ -0,0 +1,172 @@
+import asyncio
+import heapq
+from datetime import datetime
+import pytz
+
+from metrics import track_upstream
+import tracing
+
+
+def parse_token_expiry(token_expiry):
+    """Turn a stored token_expiry (timestamp or ISO string) into a UTC timestamp
+
+    Returns 0 when the value can't be parsed so the token is treated as expired.
+    """
+    if not token_expiry:
+        return 0
+
+    if isinstance(token_expiry, str):
+        try:
+            # First try direct float conversion (for legacy timestamps)
+            return float(token_expiry)
+        except ValueError:
+            try:
+                # If that fails, try parsing as ISO datetime with timezone
+                return datetime.fromisoformat(token_expiry.replace('Z', '+00:00')).timestamp()
+            except Exception:
+                print(f"Could not parse token expiry: {token_expiry}")
+                return 0
+
+    try:
+        return float(token_expiry)
+    except (TypeError, ValueError):
+        return 0
+
+
+class TokenRefresher:
+    """Keep Cronofy access tokens fresh in the background.
+
+    Upcoming expiries are kept in a min-heap and each token is renewed
+    `lead_time` seconds before it runs out. Refreshes are single-flight per
+    user: concurrent callers await the same in-flight refresh instead of
+    spending the refresh token twice.
+    """
+
+    def __init__(self, agent, lead_time=300, idle_interval=600):
+        self.agent = agent
+        self.lead_time = lead_time
+        self.idle_interval = idle_interval
+
+        # (expiry timestamp, discord_id) min-heap; stale entries are skipped lazily
+        self.schedule = []
+        self.expiries = {}
+
+        # discord_id -> task for the refresh currently in progress
+        self.in_flight = {}
+
+        self.task = None
+        self.wakeup = asyncio.Event()
+
+    def track(self, discord_id, token_expiry):
+        """Schedule a user's token to be renewed before token_expiry"""
+        discord_id = str(discord_id)
+        expiry = parse_token_expiry(token_expiry)
+        self.expiries[discord_id] = expiry
+        heapq.heappush(self.schedule, (expiry, discord_id))
+        self.wakeup.set()
+
+    def forget(self, discord_id):
+        """Stop refreshing a user's token (e.g. after !unregister)"""
+        self.expiries.pop(str(discord_id), None)
+
+    def needs_refresh(self, user_data):
+        """Check whether a user's access token has expired"""
+        token_expiry = parse_token_expiry(user_data.get("token_expiry", 0))
+        return datetime.now(pytz.UTC).timestamp() > token_expiry
+
+    async def refresh(self, discord_id, refresh_token=None):
+        """Refresh a user's token, sharing any refresh already in progress"""
+        discord_id = str(discord_id)
+
+        task = self.in_flight.get(discord_id)
+        if task is None:
+            task = asyncio.ensure_future(self._refresh(discord_id, refresh_token))
+            self.in_flight[discord_id] = task
+            task.add_done_callback(lambda _: self.in_flight.pop(discord_id, None))
+
+        # Shield so one caller being cancelled doesn't cancel the shared refresh
+        return await asyncio.shield(task)
+
+    async def ensure_fresh(self, discord_id, user_data):
+        """Return user_data with a valid access token, refreshing if it has expired
+
+        Returns None if the token couldn't be refreshed.
+        """
+        if not self.needs_refresh(user_data):
+            return user_data
+
+        if not await self.refresh(discord_id, user_data.get("refresh_token")):
+            return None
+        return await self.agent.db.get_user(str(discord_id))
+
+    async def _refresh(self, discord_id, refresh_token):
+        if refresh_token is None:
+            user_data = await self.agent.db.get_user(discord_id)
+            if not user_data or not user_data.get("refresh_token"):
+                return False
+            refresh_token = user_data.get("refresh_token")
+
+        with track_upstream("cronofy", "token_refresh") as tracker, tracing.span("token_refresh"):
+            token_expiry = await self.agent.refresh_access_token(discord_id, refresh_token)
+            if token_expiry is None:
+                tracker.fail()
+                return False
+
+        self.track(discord_id, token_expiry)
+        return True
+
+    async def load(self):
+        """Schedule every registered user's token"""
+        for user_data in await self.agent.db.get_all_users():
+            if user_data.get("refresh_token"):
+                self.track(user_data.get("discord_id"), user_data.get("token_expiry", 0))
+        print(f"Token refresher tracking {len(self.expiries)} users")
+
+    async def run(self):
+        """Refresh tokens shortly before they expire, soonest first"""
+        await self.load()
+
+        while True:
+            self.wakeup.clear()
+
+            # Drop entries superseded by a newer expiry or forgotten users
+            while self.schedule and self.expiries.get(self.schedule[0][1]) != self.schedule[0][0]:
+                heapq.heappop(self.schedule)
+
+            if self.schedule:
+                expiry, discord_id = self.schedule[0]
+                delay = expiry - self.lead_time - datetime.now(pytz.UTC).timestamp()
+            else:
+                delay = self.idle_interval
+
+            if delay > 0:
+                # Sleep until the next token is due, or until a new one is tracked
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            heapq.heappop(self.schedule)
+            self.expiries.pop(discord_id, None)
+
+            try:
+                if not await self.refresh(discord_id):
+                    print(f"Background token refresh failed for user {discord_id}")
+            except Exception as e:
+                print(f"Error in background token refresh for user {discord_id}: {e}")
+
+    def start(self):
+        """Start the background loop if it isn't running yet"""
+        if self.task is None or self.task.done():
+            self.task = asyncio.ensure_future(self.run())
+
+    async def stop(self):
+        """Cancel the background loop"""
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
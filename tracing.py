@@ -0,0 +1,180 @@
+import contextvars
+import json
+import random
+import threading
+import time
+import uuid
+
+from config import get_env_variable
+
+# Span of the code currently running (None outside a sampled trace)
+_current_span = contextvars.ContextVar("skedge_current_span", default=None)
+
+
+class _NoopSpan:
+    """Returned when nothing is being traced, so instrumentation costs ~nothing"""
+
+    def set(self, **attrs):
+        pass
+
+    def fail(self, error="error"):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return False
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Span:
+    """One timed step of a trace; usable with `with` and `async with`"""
+
+    __slots__ = ("trace", "span_id", "parent_id", "name", "attrs", "start", "duration", "error", "_token")
+
+    def __init__(self, trace, name, parent_id, attrs):
+        self.trace = trace
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.name = name
+        self.attrs = attrs
+        self.start = None
+        self.duration = None
+        self.error = None
+        self._token = None
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def fail(self, error="error"):
+        self.error = str(error)
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.duration = time.perf_counter() - self.start
+        if exc_type is not None and self.error is None:
+            self.error = f"{exc_type.__name__}: {exc}"
+        _current_span.reset(self._token)
+        self.trace.finished(self)
+        return False
+
+    async def __aenter__(self):
+        return self.__enter__()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return self.__exit__(exc_type, exc, tb)
+
+    def to_dict(self, origin):
+        return {
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_ms": round((self.start - origin) * 1000, 3),
+            "duration_ms": round(self.duration * 1000, 3),
+            "attrs": self.attrs,
+            "error": self.error
+        }
+
+
+class Trace:
+    """Spans of one request, written out when the root span finishes"""
+
+    def __init__(self, tracer, name):
+        self.tracer = tracer
+        self.trace_id = uuid.uuid4().hex
+        self.name = name
+        self.started_at = time.time()
+        self.spans = []
+        self.root = None
+        self.exported = False
+
+    def finished(self, span):
+        if self.exported:
+            # Background work that outlived the request
+            return
+        self.spans.append(span)
+        if span is self.root:
+            self.exported = True
+            self.tracer.export(self)
+
+    def to_dict(self):
+        origin = self.root.start
+        return {
+            "trace_id": self.trace_id,
+            "name": self.name,
+            "timestamp": self.started_at,
+            "duration_ms": round(self.root.duration * 1000, 3),
+            "error": self.root.error,
+            "spans": [span.to_dict(origin) for span in sorted(self.spans, key=lambda span: span.start)]
+        }
+
+
+class Tracer:
+    """Samples requests and appends finished traces to a JSONL file"""
+
+    def __init__(self, sample_rate=0.0, path="traces.jsonl"):
+        self.sample_rate = sample_rate
+        self.path = path
+        self._file = None
+        self._lock = threading.Lock()
+        self.exported = 0
+
+    def trace(self, name, **attrs):
+        """Root span for a new request, or a no-op span if not sampled"""
+        if self.sample_rate <= 0 or random.random() >= self.sample_rate:
+            return NOOP_SPAN
+        trace = Trace(self, name)
+        trace.root = Span(trace, name, None, attrs)
+        return trace.root
+
+    def export(self, trace):
+        line = json.dumps(trace.to_dict(), default=str)
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.path, "a", buffering=1)
+            self._file.write(line + "\n")
+            self.exported += 1
+
+
+def span(name, **attrs):
+    """Child span of whatever is running now; a no-op outside a sampled trace"""
+    parent = _current_span.get()
+    if parent is None:
+        return NOOP_SPAN
+    return Span(parent.trace, name, parent.span_id, attrs)
+
+
+def current_span():
+    """The running span, or a no-op span outside a sampled trace"""
+    return _current_span.get() or NOOP_SPAN
+
+
+_tracer = None
+
+
+def get_tracer():
+    """Process-wide tracer configured from TRACE_SAMPLE_RATE / TRACE_PATH"""
+    global _tracer
+    if _tracer is None:
+        try:
+            sample_rate = float(get_env_variable('TRACE_SAMPLE_RATE', 0) or 0)
+        except ValueError:
+            print("Invalid TRACE_SAMPLE_RATE, tracing is off")
+            sample_rate = 0.0
+        _tracer = Tracer(sample_rate, get_env_variable('TRACE_PATH', 'traces.jsonl'))
+        if sample_rate > 0:
+            print(f"Tracing {sample_rate:.0%} of messages to {_tracer.path}")
+    return _tracer